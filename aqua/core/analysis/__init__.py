@@ -1,5 +1,8 @@
 from .analysis import run_diagnostic_func
 from .analysis import run_command, get_aqua_paths
+from .scheduler import ToolScheduler, ToolTask
+from .runner import DiagnosticPool
 
 __all__ = ['run_diagnostic_func',
-           'run_command', 'get_aqua_paths']
+           'run_command', 'get_aqua_paths',
+           'ToolScheduler', 'ToolTask', 'DiagnosticPool']
@@ -6,10 +6,12 @@ AQUA analysis module for running diagnostics and handling configurations.
 import os
 import sys
 import subprocess
+from functools import partial
 from importlib import resources as pypath
 
 from aqua.core.util import create_folder, to_list
 from aqua.core.configurer import ConfigPath
+from .scheduler import ToolScheduler, ToolTask
 
 
 def run_command(cmd: str, log_file: str, logger=None) -> int:
@@ -41,9 +43,11 @@ def run_command(cmd: str, log_file: str, logger=None) -> int:
 
 
 def run_diagnostic(diagnostic: str, script_path: str, extra_args: str,
-                   loglevel: str = 'INFO', logger=None, logfile: str = 'diagnostic.log'):
+                   loglevel: str = 'INFO', logger=None, logfile: str = 'diagnostic.log') -> int:
     """
     Run the diagnostic script with specified arguments.
+    The output is written to the logfile while the script is running,
+    and streamed to the logger at debug level prefixed by the diagnostic name.
 
     Args:
         diagnostic (str): Name of the diagnostic.
@@ -52,26 +56,37 @@ def run_diagnostic(diagnostic: str, script_path: str, extra_args: str,
         loglevel (str): Log level to use.
         logger: Logger instance for logging messages.
         logfile (str): Path to the logfile for capturing the command output.
-        cluster (str): Dask cluster address.
+
+    Returns:
+        int: The exit code of the script, -1 if it could not be started.
     """
     try:
         logfile = os.path.expandvars(logfile)
         create_folder(os.path.dirname(logfile))
 
-        cmd = f"python {script_path} {extra_args} -l {loglevel} > {logfile} 2>&1"
+        cmd = f"python {script_path} {extra_args} -l {loglevel}"
         logger.info(f"Running diagnostic {diagnostic}")
         logger.debug(f"Command: {cmd}")
 
-        process = subprocess.run(
-            cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=False
-        )
-
-        if process.returncode != 0:
-            logger.error(f"Error running diagnostic {diagnostic}: {process.stderr}")
+        tail = []
+        with open(logfile, 'w', encoding='utf-8') as log:
+            with subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                  text=True, bufsize=1) as process:
+                for line in process.stdout:
+                    log.write(line)
+                    log.flush()
+                    logger.debug("[%s] %s", diagnostic, line.rstrip())
+                    tail = (tail + [line])[-10:]
+                returncode = process.wait()
+
+        if returncode != 0:
+            logger.error(f"Error running diagnostic {diagnostic}, see {logfile}: {''.join(tail)}")
         else:
             logger.info(f"Diagnostic {diagnostic} completed successfully.")
+        return returncode
     except (OSError, subprocess.SubprocessError) as e:
         logger.error(f"Failed to run diagnostic {diagnostic}: {e}")
+        return -1
 
 
 def _build_extra_args(**kwargs):
@@ -89,9 +104,11 @@ def run_diagnostic_func(diagnostic: str, parallel: bool = False,
                         source='default_source', source_oce=None,
                         startdate=None, enddate=None, realization=None,
                         output_dir='./output', loglevel='INFO',
-                        logger=None, cluster=None):
+                        logger=None, cluster=None, scheduler=None, pool=None, serial_tools=True):
     """
     Run the diagnostic and log the output, handling parallel processing if required.
+    The tools are added to the scheduler, if provided, and run when the scheduler is run,
+    otherwise they are run serially in order.
 
     Args:
         diagnostic (str): Name of the diagnostic to run.
@@ -111,6 +128,11 @@ def run_diagnostic_func(diagnostic: str, parallel: bool = False,
         loglevel (str): Log level for the diagnostic.
         logger: Logger instance for logging messages.
         cluster: Dask cluster scheduler address.
+        scheduler (ToolScheduler, optional): Scheduler the tools are added to. Defaults to None.
+        pool (DiagnosticPool, optional): Pool of warm workers running the tools in-process.
+                                         Defaults to None, running each tool in a new python process.
+        serial_tools (bool, optional): Run the tools of the diagnostic one after the other, in the order
+                                       of the configuration. Defaults to True.
     """
 
     # Internal naming scheme:
@@ -120,11 +142,17 @@ def run_diagnostic_func(diagnostic: str, parallel: bool = False,
     output_dir = os.path.expandvars(output_dir)
     create_folder(output_dir)
 
-    # run individual tools in serial mode
+    # without a scheduler, run individual tools in serial mode
+    run_now = scheduler is None
+    runner = pool.run if pool is not None else run_diagnostic
+    if run_now:
+        scheduler = ToolScheduler(max_tasks=1, loglevel=loglevel)
+    previous = None
+
     for tool, tool_config in diag_config.items():
 
-        logger.info(f"Running tool: {tool} for diagnostic: {diagnostic}")
-        
+        logger.info(f"Preparing tool: {tool} for diagnostic: {diagnostic}")
+
         cli_path = cli.get(tool)
         if cli_path is None:
             logger.error("CLI path for tool '%s' not found, skipping.", tool)
@@ -173,14 +201,21 @@ def run_diagnostic_func(diagnostic: str, parallel: bool = False,
             else:
                 logfile = f"{output_dir}/{diagnostic}-{tool}-{i}.log"
 
-            run_diagnostic(
-                diagnostic=diagnostic,
-                script_path=cli_path,
-                extra_args=args,
-                loglevel=loglevel,
-                logger=logger,
-                logfile=logfile
-            )
+            name = os.path.splitext(os.path.basename(logfile))[0]
+            scheduler.add(ToolTask(
+                diagnostic=diagnostic, tool=tool, name=name,
+                func=partial(runner, diagnostic=name, script_path=cli_path,
+                             extra_args=args, loglevel=loglevel, logger=logger, logfile=logfile),
+                nworkers=tool_config.get('nworkers', 1) if parallel else 1,
+                memory=tool_config.get('memory', 0),
+                depends=to_list(tool_config.get('depends')),
+                after=[previous] if serial_tools and previous else None
+            ))
+            previous = name
+
+    if run_now:
+        scheduler.run()
+
 
 def get_aqua_paths(*, args, logger):
     """
@@ -0,0 +1,235 @@
+"""
+Pool of warm worker processes running the diagnostic tools in-process,
+to amortize the interpreter startup and the AQUA imports across the tools.
+"""
+
+import os
+import sys
+import shlex
+import runpy
+import logging
+import traceback
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from aqua.core.util import create_folder
+from aqua.core.logger import log_configure
+
+# modules imported by each worker when started
+WARM_MODULES = ['aqua.core', 'aqua.diagnostics']
+
+# tools run by a worker before being replaced, to bound the memory it accumulates
+TASKS_PER_PROCESS = 10
+
+
+def _init_worker(modules):
+    """Import the modules and fill the configuration caches once per worker"""
+    for module in modules:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+    try:
+        from aqua.core.util import warm_units_cache
+        warm_units_cache()
+    except Exception:  # pylint: disable=broad-except
+        pass  # the tools will fill the caches themselves
+
+
+@contextlib.contextmanager
+def _isolated():
+    """
+    Restore the state of the worker changed by a tool: arguments, environment,
+    working directory, logging configuration and matplotlib figures and settings,
+    so that the following tools run by the same worker start from the same state.
+    """
+    saved_argv = sys.argv
+    saved_environ = dict(os.environ)
+    saved_cwd = os.getcwd()
+    loggers = [logging.getLogger()] + [logger for logger in logging.root.manager.loggerDict.values()
+                                       if isinstance(logger, logging.Logger)]
+    saved_loggers = {logger: (list(logger.handlers), logger.level, logger.propagate) for logger in loggers}
+    with contextlib.ExitStack() as stack:
+        if 'matplotlib' in sys.modules:
+            stack.enter_context(sys.modules['matplotlib'].rc_context())
+        try:
+            yield
+        finally:
+            if 'matplotlib.pyplot' in sys.modules:
+                sys.modules['matplotlib.pyplot'].close('all')
+            sys.argv = saved_argv
+            os.environ.clear()
+            os.environ.update(saved_environ)
+            os.chdir(saved_cwd)
+            for logger in [logging.getLogger()] + list(logging.root.manager.loggerDict.values()):
+                if not isinstance(logger, logging.Logger):
+                    continue
+                handlers, level, propagate = saved_loggers.get(logger, ([], logging.NOTSET, True))
+                for handler in logger.handlers:
+                    if handler not in handlers:
+                        handler.close()
+                logger.handlers = handlers
+                logger.setLevel(level)
+                logger.propagate = propagate
+
+
+def _run_script(script_path, argv, logfile):
+    """
+    Run a script as __main__ in the current process, with its output redirected to logfile.
+    The file descriptors are redirected, so that also the output of the loggers
+    and of the compiled libraries ends up in the logfile.
+    The state of the worker changed by the script is restored afterwards.
+
+    Returns:
+        int: the exit code of the script
+    """
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = (os.dup(1), os.dup(2))
+    # the file is created by the caller, which follows it while the script runs
+    with open(logfile, 'a', encoding='utf-8') as log, _isolated():
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        sys.argv = [script_path, *argv]
+        try:
+            runpy.run_path(script_path, run_name='__main__')
+            returncode = 0
+        except SystemExit as err:
+            if err.code is None:
+                returncode = 0
+            elif isinstance(err.code, int):
+                returncode = err.code
+            else:
+                print(err.code, file=sys.stderr)
+                returncode = 1
+        except Exception:  # pylint: disable=broad-except
+            traceback.print_exc()
+            returncode = 1
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved[0], 1)
+            os.dup2(saved[1], 2)
+            os.close(saved[0])
+            os.close(saved[1])
+    return returncode
+
+
+def _follow(future, logfile, diagnostic, logger, interval=0.5):
+    """
+    Stream the lines written to logfile to the logger at debug level, prefixed by the diagnostic name,
+    until the future is done, as run_diagnostic does with the output of the script.
+
+    Returns:
+        list: the last 10 lines of the logfile
+    """
+    tail = []
+    partial = ''
+    with open(logfile, encoding='utf-8', errors='replace') as log:
+        while True:
+            # checked before reading, so that the lines written at the end are read too
+            finished = future.done()
+            for line in iter(log.readline, ''):
+                line = partial + line
+                if not line.endswith('\n') and not finished:
+                    partial = line
+                    break
+                partial = ''
+                logger.debug("[%s] %s", diagnostic, line.rstrip())
+                tail = (tail + [line])[-10:]
+            if finished:
+                return tail
+            wait([future], timeout=interval)
+
+
+class DiagnosticPool():
+    """
+    Run the diagnostic scripts in a pool of warm worker processes.
+    Each worker imports AQUA and fills the configuration caches when started,
+    then runs the scripts as __main__ one after the other, so that each tool
+    pays only its own work. Each tool still runs in a separate process from the caller.
+
+    A worker runs several tools, so that only the first tools wait for the workers to start.
+    The state changed by a tool (environment, working directory, logging and matplotlib)
+    is restored after it, while module globals are shared by the tools of a worker.
+    A worker is replaced after tasks_per_process tools, the replacement being started
+    and warmed up while the other tools run.
+
+    Args:
+        processes (int, optional): the number of worker processes, i.e. of the tools running at the same time.
+                                   Defaults to the number of CPUs.
+        modules (list, optional): the modules imported by each worker. Defaults to WARM_MODULES.
+        tasks_per_process (int, optional): the number of tools run by a worker before being replaced,
+                                           0 or None to never replace it. Requires python 3.11.
+                                           Defaults to TASKS_PER_PROCESS.
+        loglevel (str, optional): the log level. Defaults to 'WARNING'.
+    """
+
+    def __init__(self, processes=None, modules=None, tasks_per_process=TASKS_PER_PROCESS, loglevel='WARNING'):
+        self.logger = log_configure(loglevel, 'DiagnosticPool')
+        self.processes = processes if processes and processes > 0 else (os.cpu_count() or 1)
+
+        kwargs = {}
+        if tasks_per_process:
+            if sys.version_info >= (3, 11):
+                kwargs['max_tasks_per_child'] = tasks_per_process
+            else:
+                self.logger.warning('tasks_per_process requires python 3.11, workers will not be replaced')
+
+        # spawn avoids forking the threads of the caller (e.g. a dask cluster)
+        self.executor = ProcessPoolExecutor(max_workers=self.processes,
+                                            mp_context=multiprocessing.get_context('spawn'),
+                                            initializer=_init_worker,
+                                            initargs=(modules or WARM_MODULES,), **kwargs)
+        self.logger.info('Started a pool of %d warm workers', self.processes)
+
+    def run(self, diagnostic: str, script_path: str, extra_args: str,
+            loglevel: str = 'INFO', logger=None, logfile: str = 'diagnostic.log') -> int:
+        """
+        Run the diagnostic script in a worker, with the same arguments as run_diagnostic.
+        The output is written to the logfile while the script is running,
+        and streamed to the logger at debug level prefixed by the diagnostic name.
+
+        Args:
+            diagnostic (str): Name of the diagnostic.
+            script_path (str): Path to the diagnostic script.
+            extra_args (str): Additional arguments for the script.
+            loglevel (str): Log level to use.
+            logger: Logger instance for logging messages. Defaults to the pool logger.
+            logfile (str): Path to the logfile for capturing the script output.
+
+        Returns:
+            int: The exit code of the script, -1 if it could not be run.
+        """
+        logger = logger or self.logger
+        logfile = os.path.expandvars(logfile)
+        create_folder(os.path.dirname(logfile))
+        open(logfile, 'w', encoding='utf-8').close()
+        argv = shlex.split(os.path.expandvars(f"{extra_args} -l {loglevel}"))
+
+        logger.info(f"Running diagnostic {diagnostic} in-process")
+        logger.debug(f"Command: {script_path} {' '.join(argv)}")
+        try:
+            future = self.executor.submit(_run_script, script_path, argv, logfile)
+            tail = _follow(future, logfile, diagnostic, logger)
+            returncode = future.result()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.error(f"Failed to run diagnostic {diagnostic}: {e}")
+            return -1
+
+        if returncode != 0:
+            logger.error(f"Error running diagnostic {diagnostic}, see {logfile}: {''.join(tail)}")
+        else:
+            logger.info(f"Diagnostic {diagnostic} completed successfully.")
+        return returncode
+
+    def close(self):
+        """Shut down the worker processes"""
+        self.executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,202 @@
+"""
+Scheduler running the tools of aqua analysis concurrently,
+within a budget of workers and memory and honouring their dependencies.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import perf_counter
+
+from dask.utils import parse_bytes
+from aqua.core.logger import log_configure
+
+
+def total_memory():
+    """Physical memory of the machine in bytes, None if not available"""
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+class ToolTask():
+    """
+    A single run of a tool, i.e. a tool with one of its configuration files.
+
+    Args:
+        diagnostic (str): the diagnostic the tool belongs to
+        tool (str): the tool name
+        func (callable): the function running the tool, returning its exit code
+        name (str, optional): a unique name, e.g. for tools with multiple configs. Defaults to diagnostic-tool.
+        nworkers (int, optional): the workers used by the tool. Defaults to 1.
+        memory (str or int, optional): the memory used by the tool, e.g. '8GiB'. Defaults to 0.
+        depends (list, optional): the tools ('tool' of the same diagnostic or 'diagnostic.tool')
+                                  or diagnostics to be completed successfully before this one.
+        after (list, optional): the names of the tasks to be finished before this one, whatever their status.
+                                Unlike depends, this only sets the order and the task is not skipped if they fail.
+    """
+
+    def __init__(self, diagnostic, tool, func, name=None, nworkers=1, memory=0, depends=None, after=None):
+        self.diagnostic = diagnostic
+        self.tool = tool
+        self.func = func
+        self.name = name or f'{diagnostic}-{tool}'
+        self.nworkers = max(1, int(nworkers or 1))
+        self.memory = parse_bytes(memory) if isinstance(memory, str) else int(memory or 0)
+        self.depends = list(depends or [])
+        self.after = list(after or [])
+        self.status = 'pending'
+        self.returncode = None
+        self.duration = None
+
+    @property
+    def key(self):
+        """The name used to refer to the tool in dependencies"""
+        return f'{self.diagnostic}.{self.tool}'
+
+
+class ToolScheduler():
+    """
+    Run tool tasks concurrently within a budget of workers and memory.
+    A task starts when all its dependencies have completed successfully and enough budget is free;
+    tasks whose dependencies failed are skipped, as well as the tasks depending on them.
+    Tasks can also wait for other tasks to finish without depending on their success. A task requiring more than the whole
+    budget is run alone.
+
+    Args:
+        max_workers (int, optional): the total number of workers of the concurrent tasks.
+                                     Defaults to the number of CPUs.
+        max_memory (str or int, optional): the total memory of the concurrent tasks, e.g. '200GiB'.
+                                           Defaults to the physical memory of the machine.
+        max_tasks (int, optional): the maximum number of concurrent tasks. Defaults to no limit.
+        loglevel (str, optional): the log level. Defaults to 'WARNING'.
+    """
+
+    def __init__(self, max_workers=None, max_memory=None, max_tasks=None, loglevel='WARNING'):
+        self.logger = log_configure(loglevel, 'ToolScheduler')
+        self.max_workers = max_workers if max_workers and max_workers > 0 else (os.cpu_count() or 1)
+        max_memory = parse_bytes(max_memory) if isinstance(max_memory, str) else max_memory
+        self.max_memory = max_memory or total_memory()
+        self.max_tasks = max_tasks if max_tasks and max_tasks > 0 else None
+        self.tasks = []
+
+    @property
+    def max_concurrent(self):
+        """The maximum number of tasks running at the same time, each using at least one worker"""
+        return min(self.max_tasks or self.max_workers, self.max_workers)
+
+    def add(self, task):
+        """Add a ToolTask to be run"""
+        self.tasks.append(task)
+
+    def _dependencies(self, task):
+        """The tasks a task depends on"""
+        deps = []
+        for dep in task.depends:
+            key = dep if '.' in dep else f'{task.diagnostic}.{dep}'
+            found = [other for other in self.tasks
+                     if other is not task and (other.key == key or other.diagnostic == dep)]
+            if not found:
+                self.logger.warning('Dependency %s of %s not found, ignoring it', dep, task.name)
+            deps.extend(found)
+        return deps
+
+    def _predecessors(self, task):
+        """The tasks to be finished before a task, whatever their status"""
+        found = [other for other in self.tasks if other is not task and other.name in task.after]
+        for name in set(task.after) - {other.name for other in found}:
+            self.logger.warning('Task %s to be run before %s not found, ignoring it', name, task.name)
+        return found
+
+    def _skip_failed(self, pending, deps):
+        """
+        Skip the pending tasks with a failed or skipped dependency, repeating until no task is skipped
+        so that the tasks depending on a skipped one are skipped too.
+        """
+        skipped = True
+        while skipped:
+            skipped = False
+            for task in list(pending):
+                if any(dep.status in ('failed', 'skipped') for dep in deps[task]):
+                    self.logger.warning('Skipping %s since a dependency failed', task.name)
+                    task.status = 'skipped'
+                    pending.remove(task)
+                    skipped = True
+
+    def _fits(self, task, workers, memory, running):
+        """If a task can start with the budget in use"""
+        if not running:
+            return True
+        if self.max_tasks and len(running) >= self.max_tasks:
+            return False
+        if workers + task.nworkers > self.max_workers:
+            return False
+        return not (self.max_memory and task.memory and memory + task.memory > self.max_memory)
+
+    def _execute(self, task):
+        """Run a task, recording its exit code and duration"""
+        tstart = perf_counter()
+        try:
+            task.returncode = task.func()
+        except Exception as err:  # pylint: disable=broad-except
+            self.logger.error('Tool %s raised an exception: %s', task.name, err)
+            task.returncode = -1
+        task.duration = perf_counter() - tstart
+        task.status = 'done' if task.returncode == 0 else 'failed'
+        return task
+
+    def run(self):
+        """
+        Run all the tasks.
+
+        Returns:
+            list: the tasks, with their status ('done', 'failed' or 'skipped'), exit code and duration
+        """
+        deps = {task: self._dependencies(task) for task in self.tasks}
+        before = {task: self._predecessors(task) for task in self.tasks}
+        pending = list(self.tasks)
+        running = {}
+        workers = memory = 0
+        self.logger.info('Running %d tools with %d workers%s', len(pending), self.max_workers,
+                         f' and {self.max_memory / 2**30:.1f} GiB' if self.max_memory else '')
+
+        with ThreadPoolExecutor(max_workers=max(1, len(pending))) as executor:
+            while pending or running:
+                self._skip_failed(pending, deps)
+                for task in list(pending):
+                    ready = all(dep.status == 'done' for dep in deps[task])
+                    ready = ready and all(prev.status in ('done', 'failed', 'skipped') for prev in before[task])
+                    if ready and self._fits(task, workers, memory, running):
+                        self.logger.info('Starting %s (%d workers)', task.name, task.nworkers)
+                        task.status = 'running'
+                        workers += task.nworkers
+                        memory += task.memory
+                        running[executor.submit(self._execute, task)] = task
+                        pending.remove(task)
+
+                if not running:
+                    if pending:  # circular dependencies
+                        for task in pending:
+                            self.logger.error('Cannot run %s: circular dependencies', task.name)
+                            task.status = 'skipped'
+                        pending = []
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    workers -= task.nworkers
+                    memory -= task.memory
+                    self.logger.info('Tool %s %s in %.1f s', task.name, task.status, task.duration)
+
+        self.summary()
+        return self.tasks
+
+    def summary(self):
+        """Log the timing summary of the tasks"""
+        self.logger.info('%-40s %-8s %10s', 'tool', 'status', 'time [s]')
+        for task in sorted(self.tasks, key=lambda task: -(task.duration or 0)):
+            duration = f'{task.duration:.1f}' if task.duration is not None else '-'
+            self.logger.info('%-40s %-8s %10s', task.name, task.status, duration)
+        total = sum(task.duration or 0 for task in self.tasks)
+        self.logger.info('Total tool time %.1f s', total)
@@ -2,11 +2,12 @@
 
 import os
 import sys
+import shutil
 import argparse
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
 from dask.distributed import LocalCluster
-from aqua.core.analysis import run_diagnostic_func, run_command, get_aqua_paths
+from aqua.core.analysis import run_diagnostic_func, run_command, get_aqua_paths, ToolScheduler, DiagnosticPool
+from aqua.core.analysis.runner import TASKS_PER_PROCESS
 from aqua.core.util import load_yaml, create_folder, format_realization
 from aqua.core.configurer import ConfigPath
 from aqua.core.util import expand_env_vars
@@ -41,7 +42,15 @@ def analysis_parser(parser=None):
     parser.add_argument("--local_clusters", action="store_true",
                         help="Use separate local clusters instead of single global one")
     parser.add_argument("-p", "--parallel", action="store_true", help="Run diagnostics in parallel with a cluster")
-    parser.add_argument("-t", "--threads", type=int, default=-1, help="Maximum number of threads")
+    parser.add_argument("-t", "--threads", type=int, default=-1, help="Maximum number of tools running concurrently")
+    parser.add_argument("--max_workers", type=int,
+                        help="Total workers of the tools running concurrently (default: number of CPUs)")
+    parser.add_argument("--max_memory", type=str,
+                        help="Total memory of the tools running concurrently, e.g. 200GiB (default: physical memory)")
+    parser.add_argument("--inprocess", action="store_true",
+                        help="Run the tools in a pool of warm python processes instead of a new process per tool")
+    parser.add_argument("--product_cache", action="store_true",
+                        help="Share the time and field statistics computed by the tools through a run-scoped cache")
     parser.add_argument("--startdate", type=str, help="Start date (YYYY-MM-DD)")
     parser.add_argument("--enddate", type=str, help="End date (YYYY-MM-DD)")
     parser.add_argument("-l", "--loglevel", type=str.upper,
@@ -105,6 +114,8 @@ def analysis_execute(args):
 
     outputdir = os.path.expandvars(args.outputdir or config.get('job', {}).get('outputdir', './output'))
     max_threads = args.threads
+    max_workers = args.max_workers or config.get('job', {}).get('max_workers')
+    max_memory = args.max_memory or config.get('job', {}).get('max_memory')
 
     logger.debug("outputdir: %s", outputdir)
     logger.debug("max_threads: %d", max_threads)
@@ -135,6 +146,13 @@ def analysis_execute(args):
     # expand the environment variables in the entire config
     config = expand_env_vars(config)
 
+    # the Readers of the tools share their products through the environment
+    product_cache = None
+    if args.product_cache or config.get('job', {}).get('product_cache', False):
+        product_cache = os.path.join(output_dir, 'product_cache')
+        os.environ["AQUA_PRODUCT_CACHE"] = product_cache
+        logger.info("Sharing the products of the tools in %s", product_cache)
+
     run_checker = config.get('job', {}).get('run_checker', False)
     if run_checker:
         logger.info("Running setup checker")
@@ -194,47 +212,60 @@ def analysis_execute(args):
         for diag in cli:
             cli[diag] = os.path.join(script_dir, cli[diag])
 
+    # the pool is started after the environment is set, since the workers inherit it,
+    # with as many workers as the tools the scheduler can run at the same time
+    budget = {'max_workers': max_workers, 'max_memory': max_memory, 'max_tasks': max_threads}
+    pool = None
+    if args.inprocess or config.get('job', {}).get('inprocess', False):
+        pool = DiagnosticPool(processes=ToolScheduler(**budget).max_concurrent,
+                              tasks_per_process=config.get('job', {}).get('tasks_per_process', TASKS_PER_PROCESS),
+                              loglevel=loglevel)
+
     # Internal naming scheme:
     # diagnostic: the name of the wrapper metadiagnostic, e.g. atmosphere2d, climate_metrics, etc.
     # tool: the name of the individual command-line tool being run, e.g. biases, ecmean, etc.
     for diag_group in run:
 
-        with ThreadPoolExecutor(max_workers=max_threads if max_threads > 0 else None) as executor:
-            futures = []
-            for diagnostic in diag_group:
-
-                logger.info("Starting diagnostic: %s", diagnostic)
-                diag_config = config.get('diagnostics', {}).get(diagnostic)
-                if diag_config is None:
-                    logger.error("Diagnostic '%s' not found in the configuration, skipping.", diagnostic)
-                    continue
-
-                futures.append(executor.submit(
-                    run_diagnostic_func,
-                    diagnostic=diagnostic,
-                    parallel=args.parallel,
-                    diag_config=diag_config,
-                    cli=cli,
-                    catalog=catalog,
-                    model=model,
-                    exp=exp,
-                    source=source,
-                    source_oce=source_oce,
-                    realization=realization,
-                    startdate=startdate,
-                    enddate=enddate,
-                    regrid=regrid,
-                    output_dir=output_dir,
-                    loglevel=loglevel,
-                    logger=logger,
-                    cluster=cluster_address
-                ))
-
-            for future in as_completed(futures):
-                try:
-                    result = future.result()
-                except Exception as e:
-                    logger.error("Diagnostic raised an exception: %s", e)
+        # tools of the group run concurrently, respecting their dependencies
+        scheduler = ToolScheduler(**budget, loglevel=loglevel)
+        for diagnostic in diag_group:
+
+            logger.info("Starting diagnostic: %s", diagnostic)
+            diag_config = config.get('diagnostics', {}).get(diagnostic)
+            if diag_config is None:
+                logger.error("Diagnostic '%s' not found in the configuration, skipping.", diagnostic)
+                continue
+
+            run_diagnostic_func(
+                diagnostic=diagnostic,
+                parallel=args.parallel,
+                diag_config=diag_config,
+                cli=cli,
+                catalog=catalog,
+                model=model,
+                exp=exp,
+                source=source,
+                source_oce=source_oce,
+                realization=realization,
+                startdate=startdate,
+                enddate=enddate,
+                regrid=regrid,
+                output_dir=output_dir,
+                loglevel=loglevel,
+                logger=logger,
+                cluster=cluster_address,
+                scheduler=scheduler,
+                pool=pool,
+                serial_tools=not config.get('job', {}).get('concurrent_tools', False)
+            )
+
+        scheduler.run()
+
+    if pool:
+        pool.close()
+
+    if product_cache and not config.get('job', {}).get('keep_product_cache', False):
+        shutil.rmtree(product_cache, ignore_errors=True)
 
     if cluster:
         cluster.close()
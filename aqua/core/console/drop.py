@@ -150,7 +150,7 @@ def drop_cli(args, config, catalog=None, resolution=None, frequency=None, fix=No
              only_catalog=False):
     """
     Running the default DROP from CLI, looping on all the configuration model/exp/source/var combination
-    Optional feature for each source can be defined as `zoom`, `workers` and `realizations`
+    Optional feature for each source can be defined as `zoom`, `pyramid`, `workers` and `realizations`
     Options for dry run and overwriting, as well as monitoring and zarr creation, are available
 
     Args:
@@ -205,6 +205,9 @@ def drop_cli(args, config, catalog=None, resolution=None, frequency=None, fix=No
                         zoom = config['data'][model][exp][source].get('zoom', None)
                         if zoom is not None:
                             extra_args = {**extra_args, **{'zoom': zoom}}
+
+                        # coarser HEALPix zoom levels produced in the same pass
+                        pyramid = config['data'][model][exp][source].get('pyramid', None)
                         
                         # disabling rebuild if we are not in the first realization and first varname
                         if varname != varnames[0] or realization != loop_realizations[0]:
@@ -222,6 +225,7 @@ def drop_cli(args, config, catalog=None, resolution=None, frequency=None, fix=No
                                         performance_reporting=monitoring,
                                         exclude_incomplete=True,
                                         engine=engine,
+                                        pyramid=pyramid,
                                         **extra_args)
 
 
@@ -1,10 +1,11 @@
 from .coordidentifier import CoordIdentifier
-from .coordtransformer import CoordTransformer, counter_reverse_coordinate
+from .coordtransformer import CoordTransformer, counter_reverse_coordinate, apply_pending_flip
 from .datamodel import DataModel
 
 __all__ = [
     "CoordIdentifier",
     "CoordTransformer",
     "DataModel",
-    "counter_reverse_coordinate"
+    "counter_reverse_coordinate",
+    "apply_pending_flip"
 ]
@@ -13,13 +13,15 @@ class CoordTransformer:
     a standard format.
     """
 
-    def __init__(self, data, loglevel="WARNING"):
+    def __init__(self, data, loglevel="WARNING", src_coords=None):
         """
         Constructor of the CoordTransator class.
 
         Args:
             data (xr.Dataset or xr.DataArray): Xarray Dataset or DataArray object.
             loglevel (str, optional): Log level. Defaults to 'WARNING'.
+            src_coords (dict, optional): Coordinates already identified by CoordIdentifier
+                                         on the same coordinates. Defaults to None (identify them).
         """
         if not isinstance(data, (xr.Dataset, xr.DataArray)):
             raise TypeError("data must be an Xarray Dataset or DataArray object.")
@@ -28,9 +30,11 @@ class CoordTransformer:
 
         self.data = data
 
-        self.src_coords = CoordIdentifier(
-            data.coords, loglevel=loglevel
-        ).identify_coords()
+        if src_coords is None:
+            src_coords = CoordIdentifier(
+                data.coords, loglevel=loglevel
+            ).identify_coords()
+        self.src_coords = src_coords
         self.tgt_coords = None
         self.gridtype = self._info_grid(data.coords)
         self.logger.info("Grid type: %s", self.gridtype)
@@ -66,7 +70,9 @@ class CoordTransformer:
         Args:
             tgt_coords (dict, optional): Target coordinates dictionary. Defaults to None.
             name (str, optional): Name of the target data model. Defaults to "aqua".
-            flip_coords (bool, optional): Whether to flip coordinates if necessary. Defaults to True.
+            flip_coords (bool or str, optional): Whether to flip coordinates if necessary. Defaults to True.
+                If 'lazy', the data are not reordered and the flip is only recorded in the coordinate
+                attributes, to be applied later with apply_pending_flip.
         Returns:
             xr.Dataset or xr.DataArray: The transformed dataset or dataarray.
         """
@@ -92,7 +98,8 @@ class CoordTransformer:
                 # self.logger.info("Transforming coordinate %s to %s", src_coord, tgt_coord)
                 data = self.rename_coordinate(data, src_coord, tgt_coord)
                 if flip_coords:
-                    data = self.flip_coordinate(data, src_coord, tgt_coord)
+                    data = self.flip_coordinate(data, src_coord, tgt_coord,
+                                                lazy=flip_coords == "lazy")
                 data = self.convert_units(data, src_coord, tgt_coord)
                 data = self.assign_attributes(data, tgt_coord)
             else:
@@ -167,7 +174,7 @@ class CoordTransformer:
                 self.logger.info("Bounds %s not found in data.", src_coord["bounds"])
         return data
 
-    def flip_coordinate(self, data, src_coord, tgt_coord):
+    def flip_coordinate(self, data, src_coord, tgt_coord, lazy=False):
         """
         Flip coordinate if necessary.
 
@@ -175,6 +182,8 @@ class CoordTransformer:
             data (xr.Dataset or xr.DataArray): The Xarray object.
             src_coord (dict): Source coordinate dictionary.
             tgt_coord (dict): Target coordinate dictionary.
+            lazy (bool, optional): Only record the flip in the coordinate attributes,
+                                   keeping the data in their native order. Defaults to False.
 
         Returns:
             xr.Dataset or xr.DataArray: The Xarray object with possibly flipped coordinate.
@@ -192,7 +201,15 @@ class CoordTransformer:
             )
             return data
         if src_coord["stored_direction"] != tgt_coord["stored_direction"]:
-            if self.gridtype == "Regular":
+            if self.gridtype == "Regular" and lazy:
+                self.logger.info(
+                    "Deferring flip of coordinate %s from %s to %s",
+                    tgt_coord["name"],
+                    src_coord["stored_direction"],
+                    tgt_coord["stored_direction"],
+                )
+                data[tgt_coord["name"]].attrs["flip_pending"] = 1
+            elif self.gridtype == "Regular":
                 self.logger.info(
                     "Flipping coordinate %s from %s to %s",
                     tgt_coord["name"],
@@ -315,4 +332,28 @@ def counter_reverse_coordinate(data):
         if "flipped" in data.coords[coord].attrs:
             data = data.isel({coord: slice(None, None, -1)})
             del data.coords[coord].attrs["flipped"]
+        elif "flip_pending" in data.coords[coord].attrs:
+            # data are still in their native order
+            data = data.copy(deep=False)
+            del data.coords[coord].attrs["flip_pending"]
+    return data
+
+
+def apply_pending_flip(data):
+    """
+    Flip the coordinates whose flip has been deferred by the data model
+    with flip_coords='lazy'. The result is the same as the one of a non-lazy flip.
+
+    Args:
+        data (xr.Dataset or xr.DataArray): The Xarray object.
+
+    Returns:
+        xr.Dataset or xr.DataArray: The Xarray object in the data model orientation.
+    """
+    for coord in data.coords:
+        if "flip_pending" in data.coords[coord].attrs and coord in data.dims:
+            data = data.isel({coord: slice(None, None, -1)})
+            del data.coords[coord].attrs["flip_pending"]
+            data.coords[coord].attrs["flipped"] = 1
+            log_history(data, f"Flipped coordinate {coord} by datamodel")
     return data
@@ -2,11 +2,16 @@
 DataModel class for applying base coordinate transformations.
 Provides a clean interface to CoordTransformer with caching.
 """
+import copy
+import numpy as np
 import xarray as xr
 from aqua.core.logger import log_configure
+from .coordidentifier import CoordIdentifier
 from .coordtransformer import CoordTransformer
 from .coord_utils import get_data_model
 
+# maximum number of coordinate identifications kept by each DataModel
+MAX_PLANS = 32
 
 class DataModel:
     """
@@ -45,6 +50,9 @@ class DataModel:
         # Load data model config (cached)
         self.logger.debug("Initializing DataModel: %s", self.name)
         self.config = get_data_model(self.name)
+
+        # identified coordinates by coordinates signature
+        self._plans = {}
     
     def apply(self, data: xr.Dataset, flip_coords=True) -> xr.Dataset:
         """
@@ -52,13 +60,26 @@ class DataModel:
         
         Args:
             data (xr.Dataset): Input dataset
-            flip_coords (bool): Whether to flip coordinate directions as per data model.
+            flip_coords (bool or str): Whether to flip coordinate directions as per data model.
+                If 'lazy', the flip is recorded but the data are not reordered (see apply_pending_flip).
         
         Returns:
             xr.Dataset: Transformed dataset with standardized coordinates
         """
         self.logger.info("Applying data model: %s", self.name)
-        return CoordTransformer(data, loglevel=self.loglevel).transform_coords(
+        signature = coords_signature(data.coords)
+        src_coords = self._plans.get(signature)
+        if src_coords is None:
+            src_coords = CoordIdentifier(data.coords, loglevel=self.loglevel).identify_coords()
+            if len(self._plans) >= MAX_PLANS:
+                self._plans.pop(next(iter(self._plans)))
+            self._plans[signature] = src_coords
+        else:
+            self.logger.debug("Reusing the coordinates identified on a previous dataset")
+
+        # the transformer updates the coordinate dictionaries, work on a copy
+        return CoordTransformer(data, loglevel=self.loglevel,
+                                src_coords=copy.deepcopy(src_coords)).transform_coords(
             name=self.name, flip_coords=flip_coords
         )
     
@@ -73,3 +94,28 @@ class DataModel:
     
     def __repr__(self):
         return f"DataModel(name='{self.name}', loglevel='{self.loglevel}')"
+
+
+def coords_signature(coords: xr.Coordinates) -> tuple:
+    """
+    Signature of the coordinates, with everything used by CoordIdentifier:
+    names, dimensions, data types, attributes and, for numeric coordinates,
+    minimum, maximum, first and last values.
+    Values of time coordinates are not used, so that consecutive
+    chunks of the same source share the same signature.
+
+    Args:
+        coords (xr.Coordinates): The coordinates to be identified.
+
+    Returns:
+        tuple: A hashable signature
+    """
+    signature = []
+    for name, coord in coords.items():
+        attrs = tuple(sorted((key, str(value)) for key, value in coord.attrs.items()))
+        entry = (name, coord.dims, str(coord.dtype), attrs)
+        if coord.size > 0 and np.issubdtype(coord.dtype, np.number):
+            values = coord.values
+            entry += (values.min(), values.max(), values.flat[0], values.flat[-1])
+        signature.append(entry)
+    return tuple(signature)
@@ -0,0 +1,189 @@
+"""
+Compaction of DROP monthly files into yearly files.
+
+The compaction can be run in a separate process, so that DROP can
+keep computing the following months while the previous year is compacted.
+When all the monthly files share the same NetCDF4/HDF5 encoding, the compressed
+chunks are copied as they are, without decompressing and compressing them again.
+"""
+import os
+import shutil
+import subprocess
+from time import time
+
+import h5py
+import netCDF4
+import numpy as np
+import xarray as xr
+
+from aqua.core.logger import log_configure
+
+COMPACT_METHODS = ['xarray', 'cdo']
+
+
+def compact_files(infiles, outfile, tmpfile, method='xarray',
+                  cdo_options=None, time_encoding=None, var_encoding=None,
+                  loglevel='WARNING'):
+    """
+    Concatenate along time a list of NetCDF files into a single file.
+    The file is first written to tmpfile and then moved to outfile,
+    while infiles are removed once the compaction succeeded.
+
+    Args:
+        infiles (list): sorted list of files to be concatenated
+        outfile (str): the final output file
+        tmpfile (str): the temporary output file
+        method (str): 'xarray' or 'cdo'. With 'xarray' the compressed chunks are
+                      copied directly when the encodings of the input files match,
+                      falling back on xarray otherwise.
+        cdo_options (list): options to be passed to cdo
+        time_encoding (dict): encoding for the time coordinate, used by xarray
+        var_encoding (dict): encoding for the variable, used by xarray
+        loglevel (str): the log level
+
+    Returns:
+        dict: statistics of the compaction with 'outfile', 'method',
+              'nbytes' (size of the output file) and 'elapsed' (seconds)
+    """
+    logger = log_configure(loglevel, 'compact_files')
+
+    if method not in COMPACT_METHODS:
+        raise KeyError(f'Please specify a valid compact method: {", ".join(COMPACT_METHODS)}.')
+
+    tstart = time()
+
+    if method == 'cdo':
+        command = ['cdo', *(cdo_options or []), 'cat', *infiles, tmpfile]
+        logger.debug("Using CDO command: %s", command)
+        subprocess.check_output(command, stderr=subprocess.STDOUT)
+    else:
+        try:
+            chunk_copy(infiles, tmpfile, time_encoding=time_encoding, loglevel=loglevel)
+            method = 'chunk-copy'
+        except (ValueError, KeyError, OSError, AttributeError, RuntimeError) as err:
+            logger.info('Chunk copy not possible (%s), using xarray to concatenate files', err)
+            if os.path.exists(tmpfile):
+                os.remove(tmpfile)
+            with xr.open_mfdataset(infiles, combine='by_coords', parallel=True) as xfield:
+                name = list(xfield.data_vars)[0]
+                xfield.to_netcdf(tmpfile, encoding={'time': time_encoding, name: var_encoding})
+
+    shutil.move(tmpfile, outfile)
+    for infile in infiles:
+        logger.info('Cleaning %s...', infile)
+        os.remove(infile)
+
+    return {'outfile': outfile, 'method': method,
+            'nbytes': os.path.getsize(outfile), 'elapsed': time() - tstart}
+
+
+def chunk_copy(infiles, outfile, time_encoding=None, loglevel='WARNING'):
+    """
+    Concatenate NetCDF4 files along time by copying the compressed HDF5 chunks.
+    The output file is created with the same encoding of the first input file,
+    then each chunk of each input file is written at its shifted time offset.
+
+    Args:
+        infiles (list): sorted list of files to be concatenated
+        outfile (str): the output file
+        time_encoding (dict): encoding for the time coordinate
+        loglevel (str): the log level
+
+    Raises:
+        ValueError: if the files cannot be concatenated chunk by chunk
+    """
+    logger = log_configure(loglevel, 'chunk_copy')
+
+    name, layout, fill_value = _chunk_layout(infiles[0])
+    ntimes = []
+    times = []
+    for infile in infiles:
+        if _chunk_layout(infile)[:2] != (name, layout):
+            raise ValueError(f'encoding of {infile} differs from {infiles[0]}')
+        with xr.open_dataset(infile) as xfield:
+            times.append(xfield['time'].values)
+            ntimes.append(xfield.sizes['time'])
+
+    # all files but the last must be aligned with the time chunking
+    tchunk = layout['chunksizes'][0]
+    if any(ntime % tchunk for ntime in ntimes[:-1]):
+        raise ValueError(f'time chunking {tchunk} not aligned with file lengths {ntimes}')
+
+    # coordinates and global attributes are written by xarray
+    with xr.open_dataset(infiles[0]) as first:
+        skeleton = first.drop_vars([name, 'time']).assign_coords(time=np.concatenate(times))
+        skeleton['time'].attrs = first['time'].attrs
+        skeleton.attrs = first.attrs
+        encoding = {'time': time_encoding} if time_encoding else None
+        skeleton.to_netcdf(outfile, encoding=encoding)
+
+    # the variable is defined with the same encoding of the input files
+    with netCDF4.Dataset(infiles[0]) as src, netCDF4.Dataset(outfile, 'a') as dst:
+        var = src.variables[name]
+        for dim, size in zip(var.dimensions, var.shape):
+            if dim not in dst.dimensions:
+                dst.createDimension(dim, size)
+        newvar = dst.createVariable(name, var.dtype, var.dimensions,
+                                    zlib=layout['zlib'], complevel=layout['complevel'],
+                                    shuffle=layout['shuffle'], fletcher32=layout['fletcher32'],
+                                    chunksizes=layout['chunksizes'], fill_value=fill_value)
+        newvar.setncatts({key: var.getncattr(key) for key in var.ncattrs() if key != '_FillValue'})
+
+    nbytes = 0
+    offset = 0
+    with h5py.File(outfile, 'r+') as fout:
+        dout = fout[name]
+        for infile, ntime in zip(infiles, ntimes):
+            with h5py.File(infile, 'r') as fin:
+                din = fin[name]
+                if (din.compression, din.compression_opts, din.shuffle) != \
+                   (dout.compression, dout.compression_opts, dout.shuffle):
+                    raise ValueError(f'filter pipeline of {infile} differs from the output file')
+                for index in range(din.id.get_num_chunks()):
+                    info = din.id.get_chunk_info(index)
+                    mask, chunk = din.id.read_direct_chunk(info.chunk_offset)
+                    dout.id.write_direct_chunk((info.chunk_offset[0] + offset, *info.chunk_offset[1:]),
+                                               chunk, filter_mask=mask)
+                    nbytes += len(chunk)
+            offset += ntime
+
+    logger.debug('Copied %d compressed bytes from %d files into %s', nbytes, len(infiles), outfile)
+
+
+def _chunk_layout(filename):
+    """
+    Describe the HDF5 layout of the single data variable of a NetCDF file
+
+    Args:
+        filename (str): the NetCDF file
+
+    Returns:
+        tuple: the variable name, a dictionary with its encoding and its fill value
+
+    Raises:
+        ValueError: if the variable cannot be copied chunk by chunk
+    """
+    with netCDF4.Dataset(filename) as src:
+        if src.data_model != 'NETCDF4':
+            raise ValueError(f'{filename} is not a NETCDF4 file')
+        datavars = [name for name, var in src.variables.items()
+                    if name not in src.dimensions and 'time' in var.dimensions]
+        if len(datavars) != 1:
+            raise ValueError(f'{filename} has {len(datavars)} time dependent variables')
+        name = datavars[0]
+        var = src.variables[name]
+        if var.dimensions[0] != 'time':
+            raise ValueError(f'time is not the leading dimension of {name}')
+        chunking = var.chunking()
+        if chunking == 'contiguous':
+            raise ValueError(f'{name} is not chunked')
+        filters = var.filters()
+        if any(filters.get(key) for key in ['szip', 'zstd', 'bzip2', 'blosc']):
+            raise ValueError(f'{name} uses a compression filter not supported for chunk copy')
+        fill_value = var.getncattr('_FillValue') if '_FillValue' in var.ncattrs() else None
+        layout = {'dtype': str(var.dtype), 'dimensions': var.dimensions[1:],
+                  'shape': var.shape[1:], 'chunksizes': tuple(chunking),
+                  'zlib': filters['zlib'], 'complevel': filters['complevel'],
+                  'shuffle': filters['shuffle'], 'fletcher32': filters['fletcher32'],
+                  'fill_value': repr(fill_value)}
+    return name, layout, fill_value
@@ -9,15 +9,18 @@ Main features:
 - Regridding to arbitrary resolutions
 - Temporal resampling with various statistics (mean, std, max, min)
 - Regional data extraction
+- HEALPix pyramids of coarser zoom levels
 - Automatic catalog entry generation
 - Parallel processing with Dask
 - Memory-efficient chunked processing
 """
 import os
 from time import time
-import subprocess
 import glob
 import shutil
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 import dask
 import xarray as xr
 import numpy as np
@@ -29,13 +32,16 @@ from dask.distributed.diagnostics import MemorySampler
 
 from aqua.core.lock import SafeFileLock
 from aqua.core.logger import log_configure, log_history
+from aqua.core.tracing import trace_span, get_tracer
 from aqua.core.reader import Reader
-from aqua.core.util.io_util import create_folder, file_is_complete
-from aqua.core.util import dump_yaml, load_yaml
+from aqua.core.fldstat import healpix_aggregate
+from aqua.core.util.io_util import create_folder, file_is_complete, INTEGRITY_MODES
+from aqua.core.util import dump_yaml, load_yaml, to_list
 from aqua.core.configurer import ConfigPath
 from aqua.core.util import create_zarr_reference, replace_intake_vars
 from aqua.core.util.string import generate_random_string
 from .drop_util import move_tmp_files, list_drop_files_complete
+from .compact import compact_files, COMPACT_METHODS
 from .catalog_entry_builder import CatalogEntryBuilder
 
 
@@ -51,6 +57,9 @@ VAR_ENCODING = {
     '_FillValue': np.nan
 }
 
+# a zoom level of the HEALPix pyramid, with its own output and catalog entry
+PyramidLevel = namedtuple('PyramidLevel', ['zoom', 'catbuilder', 'outdir', 'tmpdir'])
+
 
 class Drop():
     """
@@ -76,8 +85,11 @@ class Drop():
                  exclude_incomplete=False,
                  stat="mean",
                  compact="xarray",
+                 compact_workers=1,
                  cdo_options=["-f", "nc4", "-z", "zip_1"],
+                 check_mode="sampled",
                  engine = 'fdb',
+                 pyramid=None,
                  **kwargs):
         """
         Initialize the DROP class
@@ -123,7 +135,18 @@ class Drop():
             stat (string, opt):      Statistic to compute. Can be 'mean', 'std', 'max', 'min'.
             compact (string, opt):   Compact the data into yearly files using xarray or cdo.
                                      If set to None, no compacting is performed. Default is "xarray"
+                                     With "xarray", compressed chunks are copied without recompression
+                                     when the monthly files share the same encoding.
+            compact_workers (int, opt): Number of background processes compacting the yearly files
+                                        while the following months are computed. If 0, the compacting
+                                        is done serially. Default is 1
             cdo_options (list, opt): List of options to be passed to cdo, default is ["-f", "nc4", "-z", "zip_1"]
+            check_mode (string, opt): Integrity check mode for existing and produced files.
+                                      Can be 'metadata', 'sampled' or 'full'. Default is "sampled"
+            pyramid (int, list, opt): HEALPix zoom levels, coarser than the one of the output, produced
+                                      in the same pass by averaging the nested pixels of each computed chunk.
+                                      Each level has its own output and catalog entry (e.g. hpz5-monthly).
+                                      Requires output on a nested HEALPix grid. Default is None
             **kwargs:                kwargs to be sent to the Reader, as 'zoom' or 'realization'
         """
 
@@ -176,13 +199,19 @@ class Drop():
 
         # set up compacting method for concatenation
         self.compact = compact
-        if self.compact not in ['xarray', 'cdo', None]:
+        if self.compact not in COMPACT_METHODS + [None]:
             raise KeyError('Please specify a valid compact method: xarray, cdo or None.')
+        self.compact_workers = int(compact_workers)
 
         self.cdo_options = cdo_options
         if not isinstance(self.cdo_options, list):
             raise TypeError('cdo_options must be a list.')
 
+        # set up the integrity check for existing files
+        self.check_mode = check_mode
+        if self.check_mode not in INTEGRITY_MODES:
+            raise KeyError(f'Please specify a valid check mode: {", ".join(INTEGRITY_MODES)}.')
+
         # configure the configdir
         configpath = ConfigPath(configdir=configdir)
         self.configdir = configpath.configdir
@@ -216,11 +245,17 @@ class Drop():
         create_folder(self.outdir, loglevel=self.loglevel)
         create_folder(self.tmpdir, loglevel=self.loglevel)
 
+        # coarser HEALPix zoom levels written from the same data
+        self.pyramid = self._configure_pyramid(pyramid)
+
         # Initialize variables used by methods
         self.data = None
         self.cluster = None
         self.client = None
         self.reader = None
+        self.compact_pool = None
+        self.compact_jobs = []
+        self.compact_tstart = None
 
         # for data reading from FDB
         self.last_record = None
@@ -300,6 +335,42 @@ class Drop():
             self.region_name = None
         self.drop = drop
 
+    def _configure_pyramid(self, pyramid):
+        """
+        Configure the output and catalog entry of each zoom level of the HEALPix pyramid
+
+        Args:
+            pyramid (int, list): the zoom levels
+
+        Returns:
+            list: the PyramidLevel of each zoom, from the finest to the coarsest
+        """
+        if pyramid is None or pyramid is False:
+            return []
+        if self.region is not None:
+            raise ValueError('The HEALPix pyramid requires the full grid, it cannot be used with a region.')
+
+        levels = []
+        for zoom in sorted({int(zoom) for zoom in to_list(pyramid)}, reverse=True):
+            if zoom < 0:
+                raise ValueError(f'Invalid zoom level {zoom} for the HEALPix pyramid.')
+            # the zoom of the native data is replaced in the file names
+            kwargs = {**self.kwargs, 'zoom': zoom} if 'zoom' in self.kwargs else self.kwargs
+            catbuilder = CatalogEntryBuilder(
+                catalog=self.catalog, model=self.model,
+                exp=self.exp, resolution=f'hpz{zoom}', frequency=self.frequency,
+                region=self.region_name, stat=self.stat, loglevel=self.loglevel, **kwargs
+            )
+            level = PyramidLevel(zoom=zoom, catbuilder=catbuilder,
+                                 outdir=os.path.join(self.basedir, catbuilder.opt.build_directory()),
+                                 tmpdir=os.path.join(self.tmpdir, f'hpz{zoom}'))
+            create_folder(level.outdir, loglevel=self.loglevel)
+            create_folder(level.tmpdir, loglevel=self.loglevel)
+            levels.append(level)
+
+        self.logger.info('HEALPix pyramid active! zoom levels: %s', [level.zoom for level in levels])
+        return levels
+
     def retrieve(self):
         """
         Retrieve data from the catalog
@@ -337,6 +408,7 @@ class Drop():
 
         # Set up dask cluster
         self._set_dask()
+        self._set_compact_pool()
 
         if isinstance(self.var, list):
             for var in self.var:
@@ -345,15 +417,23 @@ class Drop():
         else:  # Only one variable
             self._write_var(self.var)
 
+        # Wait for the yearly files still being compacted
+        self._close_compact_pool()
+
         self.logger.info('Move tmp files from %s to output directory %s', self.tmpdir, self.outdir)
         # Move temporary files to output directory
         move_tmp_files(self.tmpdir, self.outdir)
+        for level in self.pyramid:
+            move_tmp_files(level.tmpdir, level.outdir)
 
         # Cleaning
         self.data.close()
         self._close_dask()
         self._remove_tmpdir()
 
+        if get_tracer().enabled:
+            get_tracer().log_summary(loglevel=self.loglevel)
+
         self.logger.info('Finished generating DROP output.')
 
     def _define_source_grid_name(self):
@@ -377,25 +457,29 @@ class Drop():
         # find the catalog of my experiment and load it
         catalogfile = os.path.join(self.configdir, 'catalogs', self.catalog,
                                    'catalog', self.model, self.exp + '.yaml')
-        
+
+        # the entry of the output and the ones of the pyramid levels, on the generic HEALPix grids
+        entries = [(self.catbuilder, self._define_source_grid_name())]
+        entries += [(level.catbuilder, f'hpz{level.zoom}-nested') for level in self.pyramid]
+
         with SafeFileLock(catalogfile + '.lock', loglevel=self.loglevel):
             cat_file = load_yaml(catalogfile)
 
-            # define the entry name
-            entry_name = self.catbuilder.create_entry_name()
-            sgn = self._define_source_grid_name()
+            for catbuilder, sgn in entries:
+                # define the entry name
+                entry_name = catbuilder.create_entry_name()
 
-            if entry_name in cat_file['sources']:
-                catblock = cat_file['sources'][entry_name]
-            else:
-                catblock = None
+                if entry_name in cat_file['sources']:
+                    catblock = cat_file['sources'][entry_name]
+                else:
+                    catblock = None
 
-            block = self.catbuilder.create_entry_details(
-                basedir=self.basedir, catblock=catblock, 
-                source_grid_name=sgn
-            )
+                block = catbuilder.create_entry_details(
+                    basedir=self.basedir, catblock=catblock,
+                    source_grid_name=sgn
+                )
 
-            cat_file['sources'][entry_name] = block
+                cat_file['sources'][entry_name] = block
 
             # dump the update file
             dump_yaml(outfile=catalogfile, cfg=cat_file)
@@ -505,6 +589,65 @@ class Drop():
             self.cluster.close()
             self.logger.info('Dask cluster closed')
 
+    def _set_compact_pool(self):
+        """
+        Set up the background pool for yearly compaction
+        """
+        if self.definitive and self.compact and self.compact_workers > 0:
+            self.logger.info('Setting up compaction pool with %s workers', self.compact_workers)
+            # spawn to avoid forking the threads of the dask client
+            self.compact_pool = ProcessPoolExecutor(max_workers=self.compact_workers,
+                                                    mp_context=multiprocessing.get_context('spawn'))
+        else:
+            self.compact_pool = None
+
+    def _close_compact_pool(self):
+        """
+        Wait for the pending compaction jobs and close the pool
+        """
+        if self.compact_pool is None:
+            return
+
+        nbytes, errors = 0, []
+        try:
+            for job, monthly_files in self.compact_jobs:
+                try:
+                    stats = job.result()
+                except Exception as err:  # pylint: disable=broad-except
+                    self.logger.error('Compaction of %s failed: %s', monthly_files[0][1], err)
+                    self._restore_monthly_files(monthly_files)
+                    errors.append(err)
+                    continue
+                self._log_compact(stats)
+                nbytes += stats['nbytes']
+            if self.compact_jobs:
+                # the jobs run concurrently, so the wall time is measured from the first submission
+                self.logger.info('Compacted %d yearly files: %.1f MiB in %.2f seconds (wall time)',
+                                 len(self.compact_jobs) - len(errors), nbytes / 2**20,
+                                 time() - self.compact_tstart)
+        finally:
+            self.compact_pool.shutdown(wait=True)
+            self.compact_pool = None
+            self.compact_jobs = []
+            self.compact_tstart = None
+
+        if errors:
+            raise errors[0]
+
+    def _restore_monthly_files(self, monthly_files):
+        """Move back the monthly files of a failed compaction to their original location"""
+        for tmp_file, monthly_file in monthly_files:
+            if os.path.exists(tmp_file):
+                shutil.move(tmp_file, monthly_file)
+        self.logger.warning('Monthly files restored, e.g. %s', monthly_files[0][1])
+
+    def _log_compact(self, stats):
+        """Report the throughput of a compaction job"""
+        self.logger.info('Compacted %s with %s: %.1f MiB in %.2f seconds (%.1f MiB/s)',
+                         os.path.basename(stats['outfile']), stats['method'],
+                         stats['nbytes'] / 2**20, stats['elapsed'],
+                         stats['nbytes'] / 2**20 / max(stats['elapsed'], 1e-6))
+
     def _remove_tmpdir(self):
         """
         Remove temporary directory
@@ -512,65 +655,75 @@ class Drop():
         self.logger.info('Removing temporary directory %s', self.tmpdir)
         shutil.rmtree(self.tmpdir)
 
-    def _concat_var_year(self, var, year):
+    def _concat_var_year(self, var, year, level=None):
         """
         To reduce the amount of files concatenate together all the files
-        from the same year
+        from the same year. If the compaction pool is active, the concatenation
+        runs in background and the method returns immediately.
+
+        Args:
+            var (str): variable name
+            year (int): the year
+            level (PyramidLevel, optional): the pyramid level, None for the output
         """
 
-        infiles_pattern = self.get_filename(var, year, month='??')
+        infiles_pattern = self.get_filename(var, year, month='??', level=level)
         monthly_files = sorted(glob.glob(infiles_pattern))
 
         if len(monthly_files) == 12:
             self.logger.info('Creating a single file for %s, year %s...', var, str(year))
-            outfile = self.get_filename(var, year)
-            tmp_outfile = self.get_filename(var, year, tmp=True)
-            
-            # Move monthly files to tmp for safety
+            outfile = self.get_filename(var, year, level=level)
+
+            # Move monthly files to a dedicated tmp folder for safety,
+            # so that they are not moved back by move_tmp_files()
+            suffix = f'_hpz{level.zoom}' if level else ''
+            workdir = os.path.join(self.tmpdir, f'compact_{var}_{year}{suffix}')
+            create_folder(workdir, loglevel=self.loglevel)
             for monthly_file in monthly_files:
-                shutil.move(monthly_file, self.tmpdir)
-            
+                shutil.move(monthly_file, workdir)
+            tmp_monthly_files = [os.path.join(workdir, os.path.basename(f)) for f in monthly_files]
+            tmp_outfile = os.path.join(workdir, os.path.basename(outfile))
+
             # Clean any existing output files
             for f in [tmp_outfile, outfile]:
                 if os.path.exists(f):
                     os.remove(f)
 
-            # Get the moved files in tmpdir - they keep the same basename
-            tmp_monthly_files = [os.path.join(self.tmpdir, os.path.basename(f)) for f in monthly_files]
-
-            # Concatenation with CDO or Xarray
-            if self.compact == 'cdo':
-                command = [
-                    'cdo',
-                    *self.cdo_options,
-                    'cat',
-                    *tmp_monthly_files,
-                    tmp_outfile
-                ]
-                self.logger.debug("Using CDO command: %s", command)
-                subprocess.check_output(command, stderr=subprocess.STDOUT)
+            kwargs = {'infiles': tmp_monthly_files, 'outfile': outfile, 'tmpfile': tmp_outfile,
+                      'method': self.compact, 'cdo_options': self.cdo_options,
+                      'time_encoding': self.time_encoding, 'var_encoding': self.var_encoding,
+                      'loglevel': self.loglevel}
+
+            # the monthly files are removed only once the yearly file is written,
+            # and moved back if the compaction fails
+            restore = list(zip(tmp_monthly_files, monthly_files))
+            if self.compact_pool is not None:
+                self.logger.debug('Submitting compaction of %s to the background pool', outfile)
+                if self.compact_tstart is None:
+                    self.compact_tstart = time()
+                self.compact_jobs.append((self.compact_pool.submit(compact_files, **kwargs), restore))
             else:
-                self.logger.debug("Using xarray to concatenate files")
-                xfield = xr.open_mfdataset(tmp_monthly_files, combine='by_coords', parallel=True)
-                name = list(xfield.data_vars)[0]
-                xfield.to_netcdf(tmp_outfile,
-                                 encoding={'time': self.time_encoding, name: self.var_encoding})
-
-            # Move back the yearly file and cleanup
-            shutil.move(tmp_outfile, outfile)
-            for tmp_file in tmp_monthly_files:
-                self.logger.info('Cleaning %s...', tmp_file)
-                os.remove(tmp_file)
-
-    def get_filename(self, var, year=None, month=None, tmp=False):
-        """Create output filenames"""
+                try:
+                    stats = compact_files(**kwargs)
+                except Exception:
+                    self._restore_monthly_files(restore)
+                    raise
+                self._log_compact(stats)
+
+    def get_filename(self, var, year=None, month=None, tmp=False, level=None):
+        """Create output filenames, of the output or of a pyramid level"""
+
+        if level is None:
+            outbuilder, outdir, tmpdir = self.outbuilder, self.outdir, self.tmpdir
+        else:
+            outbuilder, outdir, tmpdir = level.catbuilder.opt, level.outdir, level.tmpdir
 
-        filename = self.outbuilder.build_filename(var=var, year=year, month=month)
+        filename = outbuilder.build_filename(var=var, year=year, month=month)
 
         if tmp:
-            filename = os.path.join(self.tmpdir, filename)
+            filename = os.path.join(tmpdir, filename)
         else:
-            filename = os.path.join(self.outdir, filename)
+            filename = os.path.join(outdir, filename)
 
         return filename
 
@@ -579,7 +732,7 @@ class Drop():
 
         yearfiles = self.get_filename(varname)
         yearfiles = glob.glob(yearfiles)
-        checks = [file_is_complete(yearfile, loglevel=self.loglevel) for yearfile in yearfiles]
+        checks = [file_is_complete(yearfile, loglevel=self.loglevel, mode=self.check_mode) for yearfile in yearfiles]
         all_checks_true = all(checks) and len(checks) > 0
         if all_checks_true and not self.overwrite:
             self.logger.info('All the data produced seems complete for var %s...', varname)
@@ -641,18 +794,17 @@ class Drop():
         years = sorted(set(temp_data.time.dt.year.values))
         if self.performance_reporting:
             years = [years[0]]
+
+        # the output and the pyramid levels
+        targets = [None] + self.pyramid
         for year in years:
 
             self.logger.info('Processing year %s...', str(year))
-            yearfile = self.get_filename(var, year=year)
 
-            # checking if file is there and is complete
-            filecheck = file_is_complete(yearfile, loglevel=self.loglevel)
-            if filecheck:
-                if not self.overwrite:
-                    self.logger.info('Yearly file %s already exists, skipping...', yearfile)
-                    continue
-                self.logger.warning('Yearly file %s already exists, overwriting as requested...', yearfile)
+            # checking if files are there and are complete
+            year_targets = self._pending_targets(targets, var, year=year)
+            if not year_targets:
+                continue
             year_data = temp_data.sel(time=temp_data.time.dt.year == year)
 
             # Splitting data into monthly files
@@ -661,40 +813,89 @@ class Drop():
                 months = [months[0]]
             for month in months:
                 self.logger.info('Processing month %s...', str(month))
-                outfile = self.get_filename(var, year=year, month=month)
 
-                # checking if file is there and is complete
-                filecheck = file_is_complete(outfile, loglevel=self.loglevel)
-                if filecheck:
-                    if not self.overwrite:
-                        self.logger.info('Monthly file %s already exists, skipping...', outfile)
-                        continue
-                    self.logger.warning('Monthly file %s already exists, overwriting as requested...', outfile)
+                # checking if files are there and are complete
+                month_targets = self._pending_targets(year_targets, var, year=year, month=month)
+                if not month_targets:
+                    continue
 
                 month_data = year_data.sel(time=year_data.time.dt.month == month)
 
                 # real writing
                 if self.definitive:
-                    tmpfile = self.get_filename(var, year=year, month=month, tmp=True)
                     schunk = time()
-                    self.write_chunk(month_data, tmpfile)
+                    # the chunk is computed once, the pyramid levels are averaged from it
+                    job = self._compute_chunk(self.append_history(month_data))
+                    for level in month_targets:
+                        tmpfile = self.get_filename(var, year=year, month=month, tmp=True, level=level)
+                        outfile = self.get_filename(var, year=year, month=month, level=level)
+                        self._write_computed(self._aggregate_level(job, level), tmpfile)
+
+                        # check everything is correct
+                        filecheck = file_is_complete(tmpfile, loglevel=self.loglevel, mode=self.check_mode)
+                        # we can later add a retry
+                        if not filecheck:
+                            self.logger.error('Something has gone wrong in %s!', tmpfile)
+                        self.logger.info('Moving temporary file %s to %s', tmpfile, outfile)
+
+                        if level is None:
+                            move_tmp_files(self.tmpdir, self.outdir)
+                        else:
+                            move_tmp_files(level.tmpdir, level.outdir)
+                    del job
                     tchunk = time() - schunk
                     self.logger.info('Chunk execution time: %.2f', tchunk)
-
-                    # check everything is correct
-                    filecheck = file_is_complete(tmpfile, loglevel=self.loglevel)
-                    # we can later add a retry
-                    if not filecheck:
-                        self.logger.error('Something has gone wrong in %s!', tmpfile)
-                    self.logger.info('Moving temporary file %s to %s', tmpfile, outfile)
-
-                    move_tmp_files(self.tmpdir, self.outdir)
                 del month_data
             del year_data
             if self.definitive and self.compact:
-                self._concat_var_year(var, year)
+                for level in year_targets:
+                    self._concat_var_year(var, year, level=level)
         del temp_data
 
+    def _pending_targets(self, targets, var, year, month=None):
+        """
+        The output and pyramid levels whose file of a year or month has still to be written
+
+        Args:
+            targets (list): the output (None) and the pyramid levels
+            var (str): variable name
+            year (int): the year
+            month (int, optional): the month, None for the yearly file
+
+        Returns:
+            list: the targets to be written
+        """
+        kind = 'Monthly' if month else 'Yearly'
+        pending = []
+        for level in targets:
+            filename = self.get_filename(var, year=year, month=month, level=level)
+            if file_is_complete(filename, loglevel=self.loglevel, mode=self.check_mode):
+                if not self.overwrite:
+                    self.logger.info('%s file %s already exists, skipping...', kind, filename)
+                    continue
+                self.logger.warning('%s file %s already exists, overwriting as requested...', kind, filename)
+            pending.append(level)
+        return pending
+
+    def _aggregate_level(self, data, level=None):
+        """
+        Average the computed data on the zoom of a pyramid level
+
+        Args:
+            data (xr.DataArray): the computed data on a nested HEALPix grid
+            level (PyramidLevel, optional): the pyramid level, None for the output
+
+        Returns:
+            xr.DataArray: the data at the zoom of the level
+        """
+        if level is None:
+            return data
+        space_coord = self.reader.tgt_space_coord if self.resolution else self.reader.src_space_coord
+        dim = space_coord[0] if space_coord and len(space_coord) == 1 else None
+        data = healpix_aggregate(data, zoom=level.zoom, dim=dim)
+        log_history(data, f"DROP: HEALPix pyramid level, averaged to zoom {level.zoom}")
+        return data
+
     def append_history(self, data):
         """
         Append comprehensive processing history to the data attributes
@@ -733,42 +934,56 @@ class Drop():
         using dask if required and monitoring the progress"""
 
         data = self.append_history(data)
+        job = self._compute_chunk(data)
+        self._write_computed(job, outfile)
+        del job
 
-        # File to be written
-        if os.path.exists(outfile):
-            os.remove(outfile)
-            self.logger.warning('Overwriting file %s...', outfile)
+    def _compute_chunk(self, data):
+        """Compute a chunk of data using dask if required and monitoring the progress"""
 
-        self.logger.info("Computing to write file %s...", outfile)
+        self.logger.info("Computing chunk of %s...", data.name)
 
         # Compute + progress monitoring
-        if self.dask:
-            if self.performance_reporting:
-                # Full Dask dashboard to HTML
-                filename = f"dask-{self.model}-{self.exp}-{self.source}-{self.nproc}.html"
-                with performance_report(filename=filename):
-                    job = data.persist()
-                    progress(job)
-                    job = job.compute()
+        with trace_span('compute', var=data.name) as span:
+            if self.dask:
+                if self.performance_reporting:
+                    # Full Dask dashboard to HTML
+                    filename = f"dask-{self.model}-{self.exp}-{self.source}-{self.nproc}.html"
+                    with performance_report(filename=filename):
+                        job = data.persist()
+                        progress(job)
+                        job = job.compute()
+                else:
+                    # Memory monitoring always on
+                    ms = MemorySampler()
+                    with ms.sample("chunk"):
+                        job = data.persist()
+                        progress(job)
+                        job = job.compute()
+                    array_data = np.array(ms.samples["chunk"])
+                    avg_mem = np.mean(array_data[:, 1]) / 1e9
+                    max_mem = np.max(array_data[:, 1]) / 1e9
+                    self.logger.info("Avg memory used: %.2f GiB, Peak memory used: %.2f GiB", avg_mem, max_mem)
             else:
-                # Memory monitoring always on
-                ms = MemorySampler()
-                with ms.sample("chunk"):
-                    job = data.persist()
-                    progress(job)
-                    job = job.compute()
-                array_data = np.array(ms.samples["chunk"])
-                avg_mem = np.mean(array_data[:, 1]) / 1e9
-                max_mem = np.max(array_data[:, 1]) / 1e9
-                self.logger.info("Avg memory used: %.2f GiB, Peak memory used: %.2f GiB", avg_mem, max_mem)
-        else:
-            with ProgressBar():
-                job = data.compute()
+                with ProgressBar():
+                    job = data.compute()
+            # the computed chunk, so that the span is recorded in the compute phase
+            span.set(job)
+        return job
+
+    def _write_computed(self, job, outfile):
+        """Write a computed chunk of data to a specific file"""
+
+        # File to be written
+        if os.path.exists(outfile):
+            os.remove(outfile)
+            self.logger.warning('Overwriting file %s...', outfile)
 
         # Final safe NetCDF write (serial, no dask)
-        job.to_netcdf(
-            outfile,
-            encoding={"time": self.time_encoding, data.name: self.var_encoding},
-        )
-        del job
+        with trace_span('write', var=job.name) as span:
+            job.to_netcdf(
+                outfile,
+                encoding={"time": self.time_encoding, job.name: self.var_encoding},
+            )
+            span.set(nbytes=os.path.getsize(outfile))
         self.logger.info('Writing file %s successful!', outfile)
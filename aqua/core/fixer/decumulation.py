@@ -0,0 +1,160 @@
+"""State of the decumulation across consecutive retrievals."""
+
+import os
+import numpy as np
+import xarray as xr
+
+from aqua.core.logger import log_configure
+
+# states persisted to file, shared by all the readers of the same process
+_STATES = {}
+
+
+def get_decumulation_state(filename=None, loglevel=None):
+    """
+    Return the decumulation state persisted to filename, shared by all the
+    readers of the process, or a new in-memory state if no filename is given.
+
+    Args:
+        filename (str, optional): NetCDF file where the state is persisted. Defaults to None (memory only).
+        loglevel (str, optional): Log level for logging. Defaults to None.
+
+    Returns:
+        DecumulationState: the decumulation state
+    """
+    if not filename:
+        return DecumulationState(loglevel=loglevel)
+    filename = os.path.abspath(filename)
+    if filename not in _STATES:
+        _STATES[filename] = DecumulationState(filename=filename, loglevel=loglevel)
+    return _STATES[filename]
+
+
+class DecumulationState():
+    """
+    Keep the last accumulated field of each decumulated variable, so that
+    data retrieved in consecutive pieces (e.g. month by month) can be decumulated
+    exactly, without reading an overlapping time step.
+    The fixer tracks the accumulated data it decumulates, and the state is updated
+    with the last time step of the piece actually returned, after the streaming or
+    date selection. The state is kept lazily in memory and can be optionally
+    persisted to a small NetCDF file, to carry it across different processes or jobs:
+    the file is written atomically at each update, computing only the last time step
+    of each variable. Use get_decumulation_state() to share one state per file.
+
+    Args:
+        filename (str, optional): NetCDF file where the state is persisted. Defaults to None (memory only).
+        loglevel (str, optional): Log level for logging. Defaults to None.
+    """
+
+    def __init__(self, filename=None, loglevel=None):
+
+        self.filename = filename
+        self.logger = log_configure(log_level=loglevel, log_name="DecumulationState")
+        self.fields = {}
+        self.records = {}  # accumulated data of the last retrieval, before decumulation
+        self.time = None  # time axis of the last retrieval, after the fixer
+
+        if filename and os.path.exists(filename):
+            self.logger.info('Loading decumulation state from %s', filename)
+            with xr.open_dataset(filename) as state:
+                for name in state.data_vars:
+                    if name.endswith('_time'):
+                        continue
+                    field = state[name].load()
+                    self.fields[name] = field.assign_coords(time=state[f'{name}_time'].values)
+
+    def previous(self, name, data):
+        """
+        Return the accumulated field preceding the first time step of data
+
+        Args:
+            name (str): the variable name
+            data (xr.DataArray): the accumulated data to be decumulated
+
+        Returns:
+            The previous accumulated field without time coordinate,
+            or None if not available or not contiguous with data
+        """
+        field = self.fields.get(name)
+        if field is None:
+            return None
+
+        last = field['time'].values
+        first = data['time'].values[0]
+        if last >= first:
+            self.logger.debug('Decumulation state of %s does not precede the data, ignoring it', name)
+            return None
+        if data.sizes['time'] > 1 and last + (data['time'].values[1] - first) != first:
+            self.logger.warning('Decumulation state of %s at %s is not contiguous with data starting at %s, ignoring it',
+                                name, np.datetime_as_string(last, unit='s'),
+                                np.datetime_as_string(first, unit='s'))
+            return None
+
+        self.logger.debug('Using decumulation state of %s at %s', name, last)
+        return field.drop_vars('time')
+
+    def track(self, name, data):
+        """
+        Keep the accumulated data being decumulated, to update the state
+        once the piece returned to the user is known
+
+        Args:
+            name (str): the variable name
+            data (xr.DataArray): the accumulated data, before decumulation
+        """
+        self.records[name] = data
+
+    def align(self, time):
+        """
+        Set the time axis of the tracked data after the fixer,
+        which can differ from the accumulated one if the time is shifted
+
+        Args:
+            time (xr.DataArray): the time axis of the fixed data
+        """
+        self.time = time
+
+    def update(self, data):
+        """
+        Store the accumulated field at the last time step of the piece
+        returned to the user, e.g. after streaming or date selection.
+        The state is kept lazily, unless it is persisted to file.
+
+        Args:
+            data (xr.Dataset): the fixed piece of data
+        """
+        if data is None or 'time' not in data.dims or data.sizes['time'] == 0:
+            return
+        last = data['time'].values[-1]
+        for name, record in self.records.items():
+            if name not in data.data_vars:
+                continue
+            time = record['time'] if self.time is None else self.time
+            index = np.flatnonzero(time.values == last)
+            if index.size == 0:
+                self.logger.warning('Last time step of %s not found in the retrieved data, state not updated', name)
+                continue
+            self.fields[name] = record.isel(time=int(index[0]))
+        self.records = {}
+        self.time = None
+        self.save()
+
+    def save(self):
+        """
+        Persist the state to file, if a filename has been set.
+        The last time step of each variable is computed.
+        """
+        if not self.filename or not self.fields:
+            return
+
+        state = {}
+        for name, field in self.fields.items():
+            self.fields[name] = field.load()
+            state[name] = self.fields[name].drop_vars('time')
+            state[f'{name}_time'] = xr.DataArray(self.fields[name]['time'].values)
+        # written aside and moved in place, so that a concurrent reader never sees a partial file
+        tmpfile = f'{self.filename}.{os.getpid()}.tmp'
+        xr.Dataset(state).to_netcdf(tmpfile)
+        os.replace(tmpfile, self.filename)
+        self.logger.debug('Decumulation state saved to %s', self.filename)
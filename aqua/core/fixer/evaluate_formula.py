@@ -1,5 +1,6 @@
 import operator
 import re
+from functools import lru_cache
 import xarray as xr
 from aqua.core.logger import log_configure, log_history
 
@@ -9,11 +10,122 @@ from aqua.core.logger import log_configure, log_history
 OPS = {
     '^': operator.pow,      # Power operator (highest precedence)
     '/': operator.truediv,  # Division
-    "*": operator.mul,      # Multiplication  
+    "*": operator.mul,      # Multiplication
     "-": operator.sub,      # Subtraction
     "+": operator.add       # Addition (lowest precedence)
 }
 
+# binding power of each operator, following the order of OPS
+PRECEDENCE = {op: len(OPS) - i for i, op in enumerate(OPS)}
+
+
+class CompiledFormula:
+    """
+    A formula parsed once into an expression tree, evaluated as a single
+    fused function of numpy arrays (one dask layer, whatever the number of operations).
+
+    Attributes:
+        formula (str): the consolidated formula
+        variables (list): the variables used by the formula, in order of appearance
+        tree (tuple): the expression tree, with ('var', name), ('num', value),
+                      ('neg', node) and (operator, left, right) nodes
+    """
+
+    def __init__(self, formula, tree):
+        self.formula = formula
+        self.tree = tree
+        self.variables = []
+        self._collect(tree)
+        self.kernel = self._build(tree)
+
+    def _collect(self, node):
+        """Collect the variables of the tree, in order of appearance"""
+        if node[0] == 'var':
+            if node[1] not in self.variables:
+                self.variables.append(node[1])
+        elif node[0] != 'num':
+            for child in node[1:]:
+                self._collect(child)
+
+    def _build(self, node):
+        """Turn the tree into nested closures of a tuple of arrays"""
+        kind = node[0]
+        if kind == 'num':
+            value = node[1]
+            return lambda args: value
+        if kind == 'var':
+            index = self.variables.index(node[1])
+            return lambda args: args[index]
+        if kind == 'neg':
+            child = self._build(node[1])
+            return lambda args: -child(args)
+        func = OPS[kind]
+        left, right = self._build(node[1]), self._build(node[2])
+        return lambda args: func(left(args), right(args))
+
+    def __call__(self, *args):
+        return self.kernel(args)
+
+
+@lru_cache(maxsize=256)
+def compile_formula(formula: str):
+    """
+    Parse a consolidated formula into a CompiledFormula.
+    Results are cached per formula string.
+
+    Args:
+        formula (str): the formula, without spaces
+
+    Returns:
+        CompiledFormula: the compiled formula
+
+    Raises:
+        KeyError: if the formula contains an unsupported operator
+        ValueError: if the formula is malformed
+    """
+    tokens = re.findall(r'[\w.]+|[()]|[^\w.()]+', formula)
+    for token in tokens:
+        if not re.fullmatch(r'[\w.]+|[()]', token) and token not in OPS:
+            raise KeyError(f'Operator {token} not supported')
+
+    tree, pos = _parse_expression(tokens, 0, 0)
+    if pos != len(tokens):
+        raise ValueError(f'Unexpected {tokens[pos]} in formula {formula}')
+    return CompiledFormula(formula, tree)
+
+
+def _parse_expression(tokens, pos, min_precedence):
+    """
+    Precedence climbing parser: each operator has its own precedence level
+    and is left associative, as in the original pairwise evaluation.
+    """
+    left, pos = _parse_operand(tokens, pos)
+    while pos < len(tokens) and tokens[pos] in OPS and PRECEDENCE[tokens[pos]] > min_precedence:
+        op = tokens[pos]
+        right, pos = _parse_expression(tokens, pos + 1, PRECEDENCE[op])
+        left = (op, left, right)
+    return left, pos
+
+
+def _parse_operand(tokens, pos):
+    """Parse a number, a variable, a parenthesized expression or a negation"""
+    if pos >= len(tokens):
+        raise ValueError('Formula ends with an operator')
+    token = tokens[pos]
+    if token == '-':  # negation binds less than power: -a^2 is -(a^2)
+        operand, pos = _parse_expression(tokens, pos + 1, PRECEDENCE['^'] - 1)
+        return ('neg', operand), pos
+    if token == '(':
+        node, pos = _parse_expression(tokens, pos + 1, 0)
+        return node, pos + 1  # parentheses are already validated
+    if token in OPS or token == ')':
+        raise ValueError(f'Unexpected {token} in formula')
+    try:
+        return ('num', float(token)), pos + 1
+    except ValueError:
+        return ('var', token), pos + 1
+
+
 class EvaluateFormula:
     """
     Class to evaluate a formula based on a string input.
@@ -46,33 +158,31 @@ class EvaluateFormula:
         self.short_name = short_name
         self.long_name = long_name
 
-        self.token = self._extract_tokens()
+        self.compiled = compile_formula(self.formula)
 
     def _evaluate(self):
         """
-        Evaluate the formula using the provided data.
-        Handles parentheses by recursively evaluating sub-expressions.
+        Evaluate the compiled formula using the provided data.
+        All the operations are fused in a single xr.apply_ufunc call.
 
         Returns:
             xr.DataArray: The result of the evaluated formula as an xarray DataArray.
         """
         self.logger.debug('Evaluating formula: %s', self.formula)
-        
-        # Handle parentheses first by recursively evaluating sub-expressions
-        formula_with_parentheses = self._handle_parentheses(self.formula)
-        
-        # Re-tokenize after parentheses handling
-        self.token = self._extract_tokens(formula_with_parentheses)
-        
-        if not self.token:
-            self.logger.error('No tokens extracted from the formula.')
-
-        if len(self.token) > 1:
-            if self.token[0] == '-':
-                return -self.data[self.token[1]]
-            return self._operations()
-        return self.data[self.token[0]]
-    
+
+        # validate all the variables before building any graph
+        missing = [var for var in self.compiled.variables if var not in self.data]
+        if missing:
+            self.logger.error('Variables %s not found in data', missing)
+            raise KeyError(f'Variables {missing} not found in data')
+        if not self.compiled.variables:
+            raise ValueError(f'Formula {self.formula} does not contain any variable')
+
+        if self.compiled.tree[0] == 'var':
+            return self.data[self.compiled.tree[1]]
+
+        args = [self.data[var] for var in self.compiled.variables]
+        return xr.apply_ufunc(self.compiled, *args, keep_attrs=True, dask='parallelized')
 
     def evaluate(self):
         """
@@ -85,115 +195,6 @@ class EvaluateFormula:
         out = self._evaluate()
         return self._update_attributes(out)
 
-
-    def _extract_tokens(self, formula_str=None):
-        """
-        Tokenize the formula string into individual components.
-
-        Returns:
-            list: A list of tokens extracted from the formula.
-        """
-        if formula_str is None:
-            formula_str = self.formula
-
-        token = [i for i in re.split('([^\\w.]+)', formula_str) if i and i.strip()]
-        return token
-    
-    def _handle_parentheses(self, formula_str):
-        """
-        Handle parentheses in the formula by recursively evaluating sub-expressions.
-        
-        This method finds the innermost parentheses, evaluates the expression within them,
-        stores the result as a temporary variable, and replaces the parentheses expression
-        with the temporary variable name.
-
-        Args:
-            formula_str (str): The formula string potentially containing parentheses.
-
-        Returns:
-            str: The formula string with parentheses resolved.
-        """
-        temp_var_counter = 0
-        
-        while '(' in formula_str:
-            # Find the innermost parentheses (rightmost opening parenthesis)
-            start = -1
-            for i, char in enumerate(formula_str):
-                if char == '(':
-                    start = i
-                elif char == ')' and start != -1:
-                    # Found a complete parenthesis pair
-                    sub_expr = formula_str[start+1:i]
-                    
-                    # Create temporary variable name
-                    temp_var_name = f'_temp_{temp_var_counter}'
-                    temp_var_counter += 1
-                    
-                    # Recursively evaluate the sub-expression
-                    sub_evaluator = EvaluateFormula(
-                        data=self.data,
-                        formula=sub_expr,
-                        loglevel=self.loglevel
-                    )
-                    sub_result = sub_evaluator._evaluate()
-                    
-                    # Store the result in our data dictionary for later use
-                    # We'll need to modify _operations to handle temp variables
-                    self.data = self.data.copy()  # Avoid modifying original data
-                    self.data[temp_var_name] = sub_result
-                    
-                    # Replace the parentheses expression with temp variable
-                    formula_str = formula_str[:start] + temp_var_name + formula_str[i+1:]
-                    break
-                    
-        return formula_str
-    
-    def _operations(self):
-        """
-        Parsing of the operations using operator package and precedence-based evaluation.
-        Now supports power operator (^) and handles temporary variables from parentheses.
-        
-        Operations are evaluated in order of precedence:
-        1. ^ (power) - highest precedence
-        2. *, / (multiplication, division)
-        3. +, - (addition, subtraction) - lowest precedence
-
-        Returns:
-            xr.DataArray: The result of the evaluated formula as an xarray DataArray.
-        """
-
-        # use a dictionary to store xarray field and call them easily
-        dct = {}
-        for k in self.token:
-            if k not in OPS:
-                try:
-                    dct[k] = float(k)
-                except ValueError:
-                    # Handle both regular variables and temporary variables from parentheses
-                    if k in self.data:
-                        dct[k] = self.data[k]
-                    else:
-                        self.logger.error(f'Variable {k} not found in data')
-                        raise KeyError(f'Variable {k} not found in data')
-        
-        # apply operators to all occurrences, from top priority
-        # Operations are processed in order of precedence (as defined in OPS dictionary)
-        code = 0
-        for p in OPS:
-            while p in self.token:
-                code += 1
-                x = self.token.index(p)
-                name = 'op' + str(code)
-                
-                # Use apply_ufunc to maintain xarray functionality
-                replacer = xr.apply_ufunc(OPS.get(p), dct[self.token[x - 1]], dct[self.token[x + 1]],
-                                        keep_attrs=True, dask='parallelized')
-                dct[name] = replacer
-                self.token[x - 1] = name
-                del self.token[x:x + 2]
-
-        return replacer
-    
     def _update_attributes(self, out):
         """
         Update the attributes of the output DataArray.
@@ -225,7 +226,7 @@ class EvaluateFormula:
         self.logger.debug(msg)
 
         return out
-    
+
     @staticmethod
     def consolidate_formula(formula: str):
         """
@@ -237,13 +238,13 @@ class EvaluateFormula:
 
         Returns:
             str: The consolidated formula.
-            
+
         Raises:
             ValueError: If parentheses are not properly matched.
         """
         # Remove spaces and ensure proper formatting
         consolidated = re.sub(r'\s+', '', formula)
-        
+
         # Validate parentheses matching
         paren_count = 0
         for char in consolidated:
@@ -253,8 +254,8 @@ class EvaluateFormula:
                 paren_count -= 1
                 if paren_count < 0:
                     raise ValueError("Mismatched parentheses: closing parenthesis without opening")
-        
+
         if paren_count != 0:
             raise ValueError("Mismatched parentheses: unclosed opening parenthesis")
-            
+
         return consolidated
@@ -6,7 +6,8 @@ from aqua.core.logger import log_history, log_configure
 from .fixer_operator import FixerOperator
 from .fixer_datamodel import FixerDataModel
 from .fixer_configure import FixerConfigure
-from .evaluate_formula import EvaluateFormula
+from .evaluate_formula import EvaluateFormula, compile_formula
+from .decumulation import get_decumulation_state
 
 DEFAULT_DELTAT = 1
 
@@ -19,12 +20,15 @@ class Fixer():
         fixes_dictionary (dict): The dictionary of fixes
         convention (name): The convention name
         metadata (dict): The metadata dictionary
+        decumulation_state (bool or str): If True, the last accumulated fields are kept in memory
+                                          so that consecutive retrievals are decumulated exactly.
+                                          If a filename, the state is also persisted to that NetCDF file.
         loglevel (str): The log level
     
     """
 
     def __init__(self, fixer_name=None, fixes_dictionary=None,
-                 convention=None, metadata=None, loglevel='WARNING'):
+                 convention=None, metadata=None, decumulation_state=None, loglevel='WARNING'):
 
         self.fixes_dictionary = fixes_dictionary
         self.fixer_name = fixer_name
@@ -41,6 +45,15 @@ class Fixer():
         self.deltat = self._define_deltat(default=DEFAULT_DELTAT)
         self.time_correction = False
 
+        # last accumulated fields, to decumulate consecutive retrievals
+        self.decumulation_state = None
+        if decumulation_state:
+            filename = decumulation_state if isinstance(decumulation_state, str) else None
+            self.decumulation_state = get_decumulation_state(filename=filename, loglevel=loglevel)
+
+        # fix plans, cached per requested variables and names and units of the data
+        self._plans = {}
+
         # this is the fixes operator, called internally by the fixer
         self.operator = FixerOperator(self.fixes, loglevel=loglevel)
 
@@ -98,170 +111,16 @@ class Fixer():
         nanfirst_startdate = self.fixes.get("nanfirst_startdate", None)
         nanfirst_enddate = self.fixes.get("nanfirst_enddate", None)
 
-        fixd = {}  # variables dictionary for name change: only for source, done as {source: var}
-        varlist = {}  # variable dictionary for name change
-        vars_to_fix = self.fixes.get("vars", None)  # variables with available fixes
-
-        # check which variables need to be fixed among the requested ones
-        vars_to_fix = self._check_which_variables_to_fix(vars_to_fix, destvar)
-
-        if vars_to_fix:
-            for var in vars_to_fix:
-
-                # Dictionary of fixes of the single var
-                varfix = vars_to_fix[var]
-
-                # Get grib attributes if requested and fix name
-                # This can be expanded to other formats in the future
-                grib = varfix.get("grib", None)
-                # We make sure also of the case were an user saw a grib: True
-                # and decided to build a grib: False instead of just not using
-                # the block
-                if grib is not None and grib is not False:
-                    # grib: True means that we're just going to use the default grib attributes
-                    # associated with the variable name var
-                    if isinstance(grib, bool):
-                        attributes, shortname = self._get_variables_grib_attributes(var)
-                    # grib: paramid is an option, this means that the variable name may not correspond
-                    # to the shortname that it can be found within the attributes
-                    elif isinstance(grib, int):
-                        attributes, shortname = self._get_variables_grib_attributes(f"var{grib}")
-                    else:
-                        raise ValueError("grib should be either a boolean or an integer")
-                else:
-                    attributes = {}
-                    shortname = var
-
-                # Get extra attributes from fixer, leave empty dict otherwise
-                attributes.update(varfix.get("attributes", {}))
-
-                # Define the list of name changes
-                varlist[var] = shortname
-
-                # 1. source case. We want to be able to work with a list of sources to scan
-                source = to_list(varfix.get("source", None))
-                # We want to process a list of sources
-                if source:
-                    match = list(set(source) & set(data.variables))
-                    if match:
-                        # Having more than a match should be a problem for a dataset, we do not raise an error
-                        # but we warn the user
-                        if len(match) > 1:
-                            self.logger.error("Multiple matches found for variable %s: %s, the first one will be taken",
-                                              var, match)
-                        # Even if we have only a match, we make sure that source is a string
-                        source = match[0]
-
-                        # If a gribcode is the source match, convert it to shortname to access it
-                        if str(source).isdigit():
-                            self.logger.info('The source %s is a grib code, need to convert it', source)
-                            source = get_eccodes_attr(f'var{source}', loglevel=self.loglevel)['shortName']
-
-                        # Here we update the fixd dictionary with the source and the variable
-                        # The rename is done as {source: var} and at the end of the function
-                        # This because the source name could be used in the derived formula
-                        fixd.update({f"{source}": f"{var}"})
-                        if source != var:
-                            # We keep in the history the original variable name only if it is different from the target
-                            log_history(data[source], f"Variable renamed {var} from {source} by fixer")
-                    else:  # if there is no match
-                        # We do not know in advance if the source is available, so we loop over all the available in the final
-                        # merge of the fixes
-                        self.logger.debug('While fixing variable %s, no match found with sources %s', var, source)
-                        continue
-
-                # 2. derived case: let's compute the formula it and create the new variable
-                formula = varfix.get("derived", None)
-                if formula:
-                    # If the formula is the same as the variable name, we raise an error
-                    # Asking for a derived variable that is also a source variable is not allowed
-                    # since it may lead to changing how the fixer based on the source variable is applied
-                    if formula == var:
-                        self.logger.error('Derived variable %s cannot have the same name as the source variable, skipping it',
-                                          var)
-                        continue
-                    try:
-                        source = shortname
-                        data[source] = EvaluateFormula(data=data, formula=formula, short_name=shortname,
-                                                       loglevel=self.loglevel).evaluate()
-                        attributes.update({"derived": formula})
-                        self.logger.debug("Derived %s from %s", var, formula)
-                        log_history(data[source], f"Variable {var}, derived with {formula} by fixer")
-                    except KeyError:
-                        # The variable could not be computed, let's skip it
-                        if destvar is not None:
-                            # issue an error if you are asking that specific variable!
-                            self.logger.error('Requested derived variable %s cannot be computed, is it available?', shortname)
-                        else:
-                            self.logger.info('%s is defined in the fixes but cannot be computed, is it available?',
-                                             shortname)
-                        continue
-
-                # safe check debugging
-                self.logger.debug('Name of fixer var: %s', var)
-                self.logger.debug('Name of data source var: %s', source)
-                self.logger.debug('Name of target var: %s', shortname)
-
-                # fix source units
-                data = self._override_src_units(data, varfix, var, source)
-
-                # update attributes to the data but the units
-                tgt_units = None
-                if attributes:
-                    for att, value in attributes.items():
-                        # Already adjust all attributes but not yet units
-                        if att == "units":
-                            tgt_units = value
-                        else:
-                            data[source].attrs[att] = value
-
-                tgt_units = self._override_tgt_units(tgt_units, varfix, var)
-
-                if "units" not in data[source].attrs:  # Houston we have had a problem, no units!
-                    self.logger.error('Variable %s has no units!', source)
-
-                # adjust units
-                if tgt_units:
-
-                    if tgt_units.count('{'):  # WHAT IS THIS ABOUT?
-                        tgt_units = self.fixes_dictionary["defaults"]["units"]["shortname"][tgt_units.replace('{',
-                                                                                                              '').replace('}',
-                                                                                                                          '')]
-                    self.logger.info("%s: converting units %s --> %s", var, data[source].units, tgt_units)
-                    if data[source].units != tgt_units:
-                        log_history(data[source], f"Converting units of {var}: from {data[source].units} to {tgt_units}")
-                    conversion_dictionary = convert_units(data[source].units, tgt_units, deltat=self.deltat,
-                                                          var=var, loglevel=self.loglevel)
-
-                    # if some unit conversion is defined, modify the attributes and history for later usage
-                    if conversion_dictionary:
-                        data[source].attrs.update({"tgt_units": tgt_units})
-                        for key, value in conversion_dictionary.items():
-                            data[source].attrs.update({key: value})
-                            self.logger.debug("Fixing %s to %s. Unit fix: %s=%f", source, var, key, float(value))
-                            log_history(data[source], f"Fixing {source} to {var}. Unit fix: {key}={value}")
-                    elif conversion_dictionary == {} and data[source].units != tgt_units:
-                        self.logger.info("No conversion needed for %s, but units are renamed from %s to %s",
-                                         var, data[source].units, tgt_units)
-                        data[source].attrs.update({"units": tgt_units})
-
-                # Set to NaN before a certain date
-                mindate = varfix.get("mindate", None)
-                if mindate:
-                    data[source] = data[source].where(data.time >= np.datetime64(str(mindate)), np.nan)
-                    data[source].attrs.update({"mindate": mindate})
-                    self.logger.debug("Steps before %s set to NaN for variable %s", str(mindate), var)
-
-        # Only now rename everything
-        for item, value in fixd.items():
-            if not data[item].attrs.get("derived", None):
-                data = data.rename({item: value})
-            else:
-                self.logger.info("Variable %s is derived, it will not be renamed to %s", item, value)
+        # the fix plan depends only on the requested variables and on the names and units of the data
+        plan = self.get_plan(data, destvar)
+        data = self._apply_plan(data, plan)
+        vars_to_fix = plan['vars_to_fix']
+        varlist = plan['varlist']
 
         # decumulate if necessary and fix first of month if necessary
         if vars_to_fix:
-            data = self.operator.wrapper_decumulate(data, self.deltat, vars_to_fix, varlist, jump)
+            data = self.operator.wrapper_decumulate(data, self.deltat, vars_to_fix, varlist, jump,
+                                                    state=self.decumulation_state)
             if nanfirst_enddate:  # This is a temporary fix for IFS data, run ony if an end date is specified
                 data = self.operator.wrapper_nanfirst(data, vars_to_fix, varlist,
                                               startdate=nanfirst_startdate,
@@ -273,12 +132,255 @@ class Fixer():
 
         # apply time shift if necessary
         data = self.operator.timeshifter(data)
+        if self.decumulation_state and 'time' in data.coords:
+            self.decumulation_state.align(data.time)
 
         # remove variables following the fixes request
         data = self.operator.delete_variables(data)
         
         return data
 
+    def get_plan(self, data, destvar):
+        """
+        Return the fix plan for the variables and units of the dataset, building it on first use.
+        Plans are cached per requested variables and (name, units) of the data variables,
+        so that repeated retrievals (e.g. streaming) skip the walk of the fixes dictionary,
+        the ecCodes lookups and the unit conversions.
+
+        Arguments:
+            data (xr.Dataset):      the input dataset
+            destvar (list of str):  the requested variables, None for all
+
+        Returns:
+            dict: the plan, with 'steps' to be applied, the 'renames', the 'varlist'
+                  of target names and the 'vars_to_fix' fixes dictionary
+        """
+        units = {name: data[name].attrs.get('units') for name in data.variables}
+        key = (tuple(destvar) if destvar else None,
+               tuple(sorted(units.items(), key=lambda item: str(item[0]))))
+        if key not in self._plans:
+            self.logger.debug('Building fix plan for variables %s', destvar)
+            self._plans[key] = self._build_plan(units, destvar)
+        return self._plans[key]
+
+    def _build_plan(self, units, destvar):
+        """
+        Walk the fixes dictionary and record the fixes to be applied.
+        No data is accessed: the units of the data variables are tracked
+        while source units are overridden and formulas are derived.
+
+        Arguments:
+            units (dict):           the units of each data variable
+            destvar (list of str):  the requested variables, None for all
+
+        Returns:
+            dict: the plan, see get_plan
+        """
+        steps = []
+        renames = {}  # variables dictionary for name change: only for source, done as {source: var}
+        varlist = {}  # variable dictionary for name change
+        vars_to_fix = self.fixes.get("vars", None)  # variables with available fixes
+
+        # check which variables need to be fixed among the requested ones
+        vars_to_fix = self._check_which_variables_to_fix(vars_to_fix, destvar)
+
+        for var in vars_to_fix or {}:
+
+            # Dictionary of fixes of the single var
+            varfix = vars_to_fix[var]
+
+            # Get grib attributes if requested and fix name
+            # This can be expanded to other formats in the future
+            grib = varfix.get("grib", None)
+            # We make sure also of the case were an user saw a grib: True
+            # and decided to build a grib: False instead of just not using
+            # the block
+            if grib is not None and grib is not False:
+                # grib: True means that we're just going to use the default grib attributes
+                # associated with the variable name var
+                if isinstance(grib, bool):
+                    attributes, shortname = self._get_variables_grib_attributes(var)
+                # grib: paramid is an option, this means that the variable name may not correspond
+                # to the shortname that it can be found within the attributes
+                elif isinstance(grib, int):
+                    attributes, shortname = self._get_variables_grib_attributes(f"var{grib}")
+                else:
+                    raise ValueError("grib should be either a boolean or an integer")
+            else:
+                attributes = {}
+                shortname = var
+
+            # Get extra attributes from fixer, leave empty dict otherwise
+            attributes.update(varfix.get("attributes", {}))
+
+            # Define the list of name changes
+            varlist[var] = shortname
+
+            step = {'var': var, 'history': []}
+
+            # 1. source case. We want to be able to work with a list of sources to scan
+            source = to_list(varfix.get("source", None))
+            # We want to process a list of sources
+            if source:
+                match = list(set(source) & set(units))
+                if match:
+                    # Having more than a match should be a problem for a dataset, we do not raise an error
+                    # but we warn the user
+                    if len(match) > 1:
+                        self.logger.error("Multiple matches found for variable %s: %s, the first one will be taken",
+                                          var, match)
+                    # Even if we have only a match, we make sure that source is a string
+                    source = match[0]
+
+                    # If a gribcode is the source match, convert it to shortname to access it
+                    if str(source).isdigit():
+                        self.logger.info('The source %s is a grib code, need to convert it', source)
+                        source = get_eccodes_attr(f'var{source}', loglevel=self.loglevel)['shortName']
+
+                    # The rename is done as {source: var} and at the end of the fixes
+                    # This because the source name could be used in the derived formula
+                    renames.update({f"{source}": f"{var}"})
+                    if source != var:
+                        # We keep in the history the original variable name only if it is different from the target
+                        step['history'].append(f"Variable renamed {var} from {source} by fixer")
+                else:  # if there is no match
+                    # We do not know in advance if the source is available, so we loop over all the available in the final
+                    # merge of the fixes
+                    self.logger.debug('While fixing variable %s, no match found with sources %s', var, source)
+                    continue
+
+            # 2. derived case: let's compute the formula it and create the new variable
+            formula = varfix.get("derived", None)
+            if formula:
+                # If the formula is the same as the variable name, we raise an error
+                # Asking for a derived variable that is also a source variable is not allowed
+                # since it may lead to changing how the fixer based on the source variable is applied
+                if formula == var:
+                    self.logger.error('Derived variable %s cannot have the same name as the source variable, skipping it',
+                                      var)
+                    continue
+                try:
+                    compiled = compile_formula(EvaluateFormula.consolidate_formula(formula))
+                    missing = [name for name in compiled.variables if name not in units]
+                    if missing or not compiled.variables:
+                        raise KeyError(f'Variables {missing} not found in data')
+                except ValueError as err:
+                    self.logger.error('Formula %s of derived variable %s is not valid: %s', formula, var, err)
+                    continue
+                except KeyError:
+                    # The variable could not be computed, let's skip it
+                    if destvar is not None:
+                        # issue an error if you are asking that specific variable!
+                        self.logger.error('Requested derived variable %s cannot be computed, is it available?', shortname)
+                    else:
+                        self.logger.info('%s is defined in the fixes but cannot be computed, is it available?',
+                                         shortname)
+                    continue
+                source = shortname
+                step['formula'] = formula
+                # the derived variable keeps the attributes of the first variable of the formula
+                units[source] = units[compiled.variables[0]]
+                attributes.update({"derived": formula})
+                self.logger.debug("Derived %s from %s", var, formula)
+                step['history'].append(f"Variable {var}, derived with {formula} by fixer")
+
+            if not source:  # neither source nor derived: nothing to fix
+                self.logger.debug('Variable %s has neither source nor derived in the fixes, skipping it', var)
+                continue
+
+            # safe check debugging
+            self.logger.debug('Name of fixer var: %s', var)
+            self.logger.debug('Name of data source var: %s', source)
+            self.logger.debug('Name of target var: %s', shortname)
+            step['source'] = source
+
+            # fix source units
+            fixer_src_units = varfix.get("src_units", None)
+            if fixer_src_units:
+                self.logger.debug('Variable %s: Overriding source units "%s" with "%s"',
+                                  var, units[source], fixer_src_units)
+                step['src_units'] = fixer_src_units
+                units[source] = fixer_src_units
+
+            # update attributes to the data but the units
+            tgt_units = attributes.pop("units", None)
+            step['attributes'] = attributes
+
+            tgt_units = self._override_tgt_units(tgt_units, varfix, var)
+
+            if units[source] is None:  # Houston we have had a problem, no units!
+                self.logger.error('Variable %s has no units!', source)
+
+            # adjust units
+            if tgt_units:
+
+                if tgt_units.count('{'):  # WHAT IS THIS ABOUT?
+                    tgt_units = self.fixes_dictionary["defaults"]["units"]["shortname"][tgt_units.replace('{',
+                                                                                                          '').replace('}',
+                                                                                                                      '')]
+                self.logger.info("%s: converting units %s --> %s", var, units[source], tgt_units)
+                if units[source] != tgt_units:
+                    step['history'].append(f"Converting units of {var}: from {units[source]} to {tgt_units}")
+                conversion_dictionary = convert_units(units[source], tgt_units, deltat=self.deltat,
+                                                      var=var, loglevel=self.loglevel)
+
+                # if some unit conversion is defined, modify the attributes and history for later usage
+                if conversion_dictionary:
+                    step['unit_attrs'] = {"tgt_units": tgt_units, **conversion_dictionary}
+                    for key, value in conversion_dictionary.items():
+                        self.logger.debug("Fixing %s to %s. Unit fix: %s=%f", source, var, key, float(value))
+                        step['history'].append(f"Fixing {source} to {var}. Unit fix: {key}={value}")
+                elif conversion_dictionary == {} and units[source] != tgt_units:
+                    self.logger.info("No conversion needed for %s, but units are renamed from %s to %s",
+                                     var, units[source], tgt_units)
+                    step['unit_attrs'] = {"units": tgt_units}
+                    units[source] = tgt_units
+
+            # Set to NaN before a certain date
+            step['mindate'] = varfix.get("mindate", None)
+
+            steps.append(step)
+
+        return {'steps': steps, 'renames': renames, 'varlist': varlist, 'vars_to_fix': vars_to_fix}
+
+    def _apply_plan(self, data, plan):
+        """
+        Apply a fix plan to a dataset in a single pass.
+
+        Arguments:
+            data (xr.Dataset):  the input dataset
+            plan (dict):        the plan, see get_plan
+
+        Returns:
+            The fixed xr.Dataset, with unit conversions stored as attributes
+        """
+        for step in plan['steps']:
+            source = step['source']
+            if step.get('formula'):
+                data[source] = EvaluateFormula(data=data, formula=step['formula'], short_name=source,
+                                               loglevel=self.loglevel).evaluate()
+            if step.get('src_units'):
+                data[source].attrs["units"] = step['src_units']
+            for att, value in step['attributes'].items():
+                data[source].attrs[att] = value
+            if step.get('unit_attrs'):
+                data[source].attrs.update(step['unit_attrs'])
+            for msg in step['history']:
+                log_history(data[source], msg)
+            if step['mindate']:
+                data[source] = data[source].where(data.time >= np.datetime64(str(step['mindate'])), np.nan)
+                data[source].attrs.update({"mindate": step['mindate']})
+                self.logger.debug("Steps before %s set to NaN for variable %s", str(step['mindate']), step['var'])
+
+        # Only now rename everything
+        for item, value in plan['renames'].items():
+            if not data[item].attrs.get("derived", None):
+                data = data.rename({item: value})
+            else:
+                self.logger.info("Variable %s is derived, it will not be renamed to %s", item, value)
+
+        return data
+
     def _define_deltat(self, default):
         """
         Define the deltat for the fixer. 
@@ -318,25 +420,6 @@ class Fixer():
         else:
             return tgt_units
 
-    def _override_src_units(self, data, varfix, var, source):
-        """
-        Override source units for the single variable
-        """
-
-        # Override source units
-        fixer_src_units = varfix.get("src_units", None)
-        if fixer_src_units:
-            if "units" in data[source].attrs:
-                self.logger.debug('Variable %s: Overriding source units "%s" with "%s"',
-                                  var, data[source].units, fixer_src_units)
-                data[source].attrs.update({"units": fixer_src_units})
-            else:
-                self.logger.debug('Variable %s: Setting missing source units to "%s"',
-                                  var, fixer_src_units)
-                data[source].attrs["units"] = fixer_src_units
-
-        return data
-
     def _get_variables_grib_attributes(self, var):
         """
         Get grib attributes for a specific variable
@@ -8,6 +8,9 @@ import xarray as xr
 from aqua.core.logger import log_history, log_configure
 from aqua.core.util import to_list, normalize_units
 
+# attributes describing a unit fix not yet applied
+UNIT_FIX_ATTRS = ['units', 'tgt_units', 'factor', 'offset', 'time_conversion_flag']
+
 class FixerOperator:
     """
     Base class for fix operators.
@@ -26,6 +29,11 @@ class FixerOperator:
         self.loglevel = loglevel
         self.logger = log_configure(log_level = loglevel, log_name="FixerOperator")
 
+        # last nanfirst mask, shared by the variables of the same time axis
+        self._nanfirst_key = None
+        self._nanfirst_mask = None
+        self._nanfirst_step = None
+
     def apply_unit_fix(self, data, time_correction=False):
         """
         Applies unit fixes stored in variable attributes (target_units, factor and offset)
@@ -58,6 +66,66 @@ class FixerOperator:
             log_history(data, f"Units changed to {tgt_units} by fixer")
             data.attrs.pop('tgt_units', None)
 
+    @staticmethod
+    def pending_unit_fix(data):
+        """
+        Find the unit fixes stored in the attributes and not yet applied
+
+        Arguments:
+            data (xr.DataArray or xr.Dataset):  input data
+
+        Returns:
+            dict: the unit fix attributes of each variable, by variable name
+        """
+        arrays = data.data_vars.items() if isinstance(data, xr.Dataset) else [(data.name, data)]
+        pending = {}
+        for name, array in arrays:
+            tgt_units = array.attrs.get("tgt_units", None)
+            if tgt_units and array.attrs.get("units", None) != tgt_units:
+                pending[name] = {key: array.attrs[key] for key in UNIT_FIX_ATTRS if key in array.attrs}
+        return pending
+
+    def deferred_unit_fix(self, data, pending, time_correction=False):
+        """
+        Apply unit fixes found by pending_unit_fix, returning new objects.
+        Since the fixes are affine, they can be applied after linear operations
+        (regridding, means) on the much smaller output.
+
+        Arguments:
+            data (xr.DataArray or xr.Dataset):  input data
+            pending (dict):                     the unit fixes, by variable name
+            time_correction:                    the days in month correction, if any
+
+        Returns:
+            The data with fixed units
+        """
+        if isinstance(data, xr.Dataset):
+            data = data.copy()
+            for name, fix in pending.items():
+                if name in data.data_vars:
+                    data[name] = self._unit_fixed(data[name], fix, time_correction)
+            return data
+        if data.name in pending:
+            return self._unit_fixed(data, pending[data.name], time_correction)
+        return data
+
+    def _unit_fixed(self, data, fix, time_correction):
+        """Return a copy of a DataArray with a unit fix applied, see apply_unit_fix"""
+        self.logger.debug("Applying deferred unit fixes for %s", data.name)
+        factor = fix.get("factor", 1)
+        offset = fix.get("offset", 0)
+        out = data.copy(deep=False)
+        if factor != 1:
+            out = out * factor
+            if fix.get("time_conversion_flag", 0) and time_correction is not False:
+                out = out / time_correction
+        if offset != 0:
+            out = out + offset
+        out.attrs = {**data.attrs, "src_units": fix.get("units"), "units_fixed": 1,
+                     "units": normalize_units(fix["tgt_units"])}
+        out.attrs.pop("tgt_units", None)
+        return log_history(out, f"Units changed to {fix['tgt_units']} by fixer")
+
     def delete_variables(self, data):
         """
         Remove variables which are set to be deleted in the fixer
@@ -102,7 +170,7 @@ class FixerOperator:
 
         return field
 
-    def wrapper_decumulate(self, data, deltat, variables, varlist, jump):
+    def wrapper_decumulate(self, data, deltat, variables, varlist, jump, state=None):
         """
         Wrapper function for decumulation, which takes into account the requirement of
         keeping into memory the last step for streaming/fdb purposes
@@ -112,6 +180,10 @@ class FixerOperator:
             variables: The fixes of the variables
             varlist: the variable dictionary with the old and new names
             jump: the jump for decumulation
+            state (DecumulationState, optional): the last accumulated fields of the previous
+                                                 retrieval, used to decumulate the first step.
+                                                 The data are tracked, the state is updated
+                                                 with DecumulationState.update on the returned piece.
 
         Returns:
             Dataset with decumulated fixes
@@ -124,15 +196,19 @@ class FixerOperator:
                 if varname in data.variables:
                     self.logger.debug("Starting decumulation for variable %s", varname)
                     keep_first = variables[var].get("keep_first", True)
+                    previous = state.previous(varname, data[varname]) if state else None
+                    if state:
+                        state.track(varname, data[varname])
                     data[varname] = self.simple_decumulate(data[varname],
                                                            deltat=deltat,
                                                            jump=jump,
-                                                           keep_first=keep_first)
+                                                           keep_first=keep_first,
+                                                           previous=previous)
                     log_history(data[varname], f"Variable {varname} decumulated by fixer")
 
         return data
     
-    def simple_decumulate(self, data, deltat=3600, jump=None, keep_first=True):
+    def simple_decumulate(self, data, deltat=3600, jump=None, keep_first=True, previous=None):
         """
         Remove cumulative effect on IFS fluxes.
 
@@ -141,6 +217,8 @@ class FixerOperator:
             jump (str):              used to fix periodic jumps (a very specific NextGEMS IFS issue)
                                     Examples: jump='month' (the NextGEMS case), jump='day')
             keep_first (bool):       if to keep the first value as it is (True) or place a 0 (False)
+            previous (xr.DataArray): the accumulated field preceding the first time step, without time.
+                                     If provided, the first step is decumulated exactly and keep_first is ignored.
 
         Returns:
             A xarray.DataArray where the cumulation has been removed
@@ -151,7 +229,9 @@ class FixerOperator:
 
         # add a first timestep empty to align the original and derived fields
 
-        if keep_first:
+        if previous is not None:
+            zeros = data.isel(time=0) - previous
+        elif keep_first:
             zeros = data.isel(time=0)
         else:
             zeros = xr.zeros_like(data.isel(time=0))
@@ -215,12 +295,74 @@ class FixerOperator:
             DataArray in with data on first step of each month is set to NaN
         """
 
-        first = data.time.groupby(data['time.year']*100+data['time.month']).first()
-        if enddate:
-            first = first.where(first < np.datetime64(str(enddate)), drop=True)
-        if startdate:
-            first = first.where(first > np.datetime64(str(startdate)), drop=True)
-        mask = data.time.isin(first)
+        mask = self.month_first_mask(data.time, startdate=startdate, enddate=enddate)
+        if not mask.any():
+            return data
+        mask = xr.DataArray(mask, dims='time', coords={'time': data.time})
         data = data.where(~mask, np.nan)
 
-        return data
\ No newline at end of file
+        return data
+
+    def month_first_mask(self, time, startdate=False, enddate=False):
+        """
+        Flag the first time step of each month, comparing each step with the one preceding it.
+        The data can thus start in the middle of a month, as in consecutive retrievals:
+        the first step is flagged only if the previous one falls in the previous month.
+        The mask is computed on the time index only and cached for the following
+        variables sharing the same time axis.
+
+        Args:
+            time (xr.DataArray): the time coordinate
+            startdate: date before which to fix the first timestep of each month (defaults to False)
+            enddate: date after which to fix the first timestep of each month (defaults to False)
+
+        Returns:
+            np.ndarray: boolean mask along time
+        """
+        # dt accessors work with both numpy and cftime time axes
+        values = time.values
+        key = (values[0], values[-1], values.size, startdate, enddate) if values.size else None
+        if key is not None and key == self._nanfirst_key:
+            return self._nanfirst_mask
+
+        months = self._month_index(time)
+        if values.size > 1:
+            # the first step is compared with the step preceding it
+            self._nanfirst_step = values[1] - values[0]
+        if self._nanfirst_step is not None and values.size:
+            before = xr.DataArray([values[0] - self._nanfirst_step], dims='time')
+            previous = np.concatenate([self._month_index(before), months[:-1]])
+            mask = months != previous
+        else:
+            # a single step without any previous information
+            mask = np.ones(values.size, dtype=bool)
+
+        if enddate or startdate:
+            stamps = self._time_stamp(time)
+            if enddate:
+                mask &= stamps < self._date_stamp(enddate)
+            if startdate:
+                mask &= stamps > self._date_stamp(startdate)
+
+        self._nanfirst_key = key
+        self._nanfirst_mask = mask
+        return mask
+
+    @staticmethod
+    def _month_index(time):
+        """Consecutive index of the month of each time step, for any calendar"""
+        return (time.dt.year * 12 + time.dt.month - 1).values
+
+    @staticmethod
+    def _time_stamp(time):
+        """The time steps as YYYYMMDDhhmmss integers, comparable in any calendar"""
+        stamp = time.dt.year.astype('int64')
+        for field in ['month', 'day', 'hour', 'minute', 'second']:
+            stamp = stamp * 100 + getattr(time.dt, field)
+        return stamp.values
+
+    @staticmethod
+    def _date_stamp(date):
+        """A date as a YYYYMMDDhhmmss integer"""
+        date = pd.Timestamp(str(date))
+        return int(date.strftime('%Y%m%d%H%M%S'))
@@ -1,8 +1,10 @@
 """FldStat module."""
 from .area_selection import AreaSelection
 from .fldstat import FldStat
+from .healpix import healpix_aggregate
 
 __all__ = [
     'AreaSelection',
-    'FldStat'
+    'FldStat',
+    'healpix_aggregate'
 ]
@@ -1,29 +1,42 @@
+import json
+
+import numpy as np
 import xarray as xr
 import regionmask
 from typeguard import typechecked
 from aqua.core.logger import log_configure, log_history
 from aqua.core.util import check_coordinates, to_list
 
+from .healpix import healpix_grid, healpix_pixel_coords, healpix_strip_pixels
+
 # set default options for xarray
 xr.set_options(keep_attrs=True)
 
 DEFAULT_COORDS = {"lat_min": -90, "lat_max": 90,
                   "lon_min": 0, "lon_max": 360}
 
+# masks of the HEALPix selections, by grid and request
+_HEALPIX_MASKS = {}
+MAX_HEALPIX_MASKS = 64
+
 
 class AreaSelection:
     """Class to select an area from an xarray Dataset."""
 
-    def __init__(self, loglevel: str = "WARNING"):
+    def __init__(self, loglevel: str = "WARNING", healpix_native: bool = False):
         """
         Initialize the AreaSelection.
 
         Args:
             loglevel (str, optional): The logging level. Default is "WARNING".
+            healpix_native (bool, optional): Select the cells of full HEALPix grids from the
+                pixel centres of the grid, with the masks cached per grid and request,
+                instead of comparing the coordinates of the data. Default is False.
         """
         self.logger = log_configure(
             log_level=loglevel, log_name="AreaSelection"
         )
+        self.healpix_native = healpix_native
 
     @typechecked
     def select_area(
@@ -85,8 +98,6 @@ class AreaSelection:
             if region_sel is None:
                 raise ValueError("`region_sel` must be specified when using region argument.")
 
-            mask = region.mask(data[lon_name], data[lat_name], **mask_kwargs)
-
             # Normalize input to list
             region_sel = to_list(region_sel)
 
@@ -96,14 +107,24 @@ class AreaSelection:
                 for name in region_sel
             ]
 
-            # Combine masks for selected regions
-            reg_mask = xr.zeros_like(mask, dtype=bool)
-            for rn in region_numbers:
-                reg_mask = reg_mask | (mask == rn)
+            grid = healpix_grid(data, lon_name=lon_name, lat_name=lat_name) if self.healpix_native else None
+            if grid is not None:
+                key = ("region", grid, region.name, tuple(region.numbers), tuple(region_numbers),
+                       json.dumps(mask_kwargs, sort_keys=True, default=str))
+                reg_mask = self._healpix_mask(key, lambda: self._healpix_region(
+                    grid, region, region_numbers, mask_kwargs))
+                selected = self._healpix_select(data, grid, reg_mask, drop=drop)
+            else:
+                mask = region.mask(data[lon_name], data[lat_name], **mask_kwargs)
+
+                # Combine masks for selected regions
+                reg_mask = xr.zeros_like(mask, dtype=bool)
+                for rn in region_numbers:
+                    reg_mask = reg_mask | (mask == rn)
 
-            reg_mask = reg_mask.fillna(False)  # handle NaNs from regionmask
+                reg_mask = reg_mask.fillna(False)  # handle NaNs from regionmask
 
-            selected = data.where(reg_mask, drop=drop)
+                selected = data.where(reg_mask, drop=drop)
 
             region_sel = [
                 region.names[rs] if isinstance(rs, int) else rs
@@ -136,20 +157,26 @@ class AreaSelection:
             and lon[0] > lon[1]
         )
 
-        # Building the mask
-        lat_condition = (
-            (data[lat_name] >= lat[0]) & (data[lat_name] <= lat[1])
-            if box_brd
-            else (data[lat_name] > lat[0]) & (data[lat_name] < lat[1])
-        )
+        grid = healpix_grid(data, lon_name=lon_name, lat_name=lat_name) if self.healpix_native else None
+        if grid is not None:
+            key = ("box", grid, tuple(lon), tuple(lat), box_brd,
+                   default_coords["lon_min"], default_coords["lon_max"])
+            mask = self._healpix_mask(key, lambda: self._healpix_box(
+                grid, lon, lat, box_brd=box_brd, default_coords=default_coords))
+            selected = self._healpix_select(data, grid, mask, drop=drop)
+        else:
+            # Building the mask
+            lat_condition = self._lat_condition(
+                data, lat_name=lat_name, lat0=lat[0], lat1=lat[1], box_brd=box_brd
+            )
 
-        lon_condition = self._lon_condition(
-            data, lon_name=lon_name, lon0=lon[0], lon1=lon[1],
-            box_brd=box_brd, default_coords=default_coords
-        )
+            lon_condition = self._lon_condition(
+                data, lon_name=lon_name, lon0=lon[0], lon1=lon[1],
+                box_brd=box_brd, default_coords=default_coords
+            )
 
-        # Apply the selection on data
-        selected = data.where(lat_condition & lon_condition, drop=drop)
+            # Apply the selection on data
+            selected = data.where(lat_condition & lon_condition, drop=drop)
 
         # If the selection crosses Greenwich in a 0..360 coordinate
         # system, optionally convert the selected lon coordinates to
@@ -171,6 +198,23 @@ class AreaSelection:
 
         return selected
 
+    def _lat_condition(self, data, lat_name: str, lat0: float, lat1: float, box_brd: bool = True):
+        """
+        Build latitude selection condition.
+
+        Args:
+            data: The dataset containing the latitude values.
+            lat_name: The name of the latitude variable in the dataset.
+            lat0: The lower latitude value.
+            lat1: The upper latitude value.
+            box_brd: Whether to include the boundaries in the selection.
+
+        Returns:
+            A boolean mask for selecting the appropriate latitude values.
+        """
+        lat = data[lat_name]
+        return (lat >= lat0) & (lat <= lat1) if box_brd else (lat > lat0) & (lat < lat1)
+
     def _lon_condition(
         self,
         data,
@@ -216,3 +260,66 @@ class AreaSelection:
             ) | (
                 (lon >= default_coords["lon_min"]) & (lon < lon1)
             )
+
+    def _healpix_mask(self, key, build):
+        """The cached mask of a HEALPix selection, built on first request"""
+        if key not in _HEALPIX_MASKS:
+            if len(_HEALPIX_MASKS) >= MAX_HEALPIX_MASKS:
+                _HEALPIX_MASKS.pop(next(iter(_HEALPIX_MASKS)))
+            _HEALPIX_MASKS[key] = build()
+        else:
+            self.logger.debug("Reusing HEALPix selection for nside=%d", key[1].nside)
+        return _HEALPIX_MASKS[key]
+
+    def _healpix_box(self, grid, lon: list, lat: list, box_brd: bool = True,
+                     default_coords: dict | None = None):
+        """
+        Mask of the HEALPix pixels whose centres are in a lon/lat box.
+        Only the pixels of the rings overlapping the latitude band are tested.
+
+        Args:
+            grid (HealpixGrid): The HEALPix grid.
+            lon: The longitude range, in the default coordinate system.
+            lat: The latitude range.
+            box_brd: Whether to include the boundaries in the selection.
+            default_coords: The default coordinate system boundaries.
+
+        Returns:
+            numpy.ndarray: The boolean mask of the pixels.
+        """
+        self.logger.debug("Building HEALPix box selection for nside=%d", grid.nside)
+        pix = healpix_strip_pixels(grid.nside, lat, nest=grid.nest)
+        lons, lats = healpix_pixel_coords(grid.nside, nest=grid.nest, signed_lon=grid.signed_lon)
+        centres = {"lon": lons[pix], "lat": lats[pix]}
+        condition = self._lat_condition(centres, lat_name="lat", lat0=lat[0], lat1=lat[1], box_brd=box_brd)
+        condition &= self._lon_condition(centres, lon_name="lon", lon0=lon[0], lon1=lon[1],
+                                         box_brd=box_brd, default_coords=default_coords)
+        mask = np.zeros(lons.size, dtype=bool)
+        mask[pix[condition]] = True
+        return mask
+
+    def _healpix_region(self, grid, region: regionmask.Regions, region_numbers: list, mask_kwargs: dict):
+        """
+        Mask of the HEALPix pixels whose centres are in the selected regions.
+
+        Args:
+            grid (HealpixGrid): The HEALPix grid.
+            region (regionmask.Regions): The regions.
+            region_numbers (list): The numbers of the selected regions.
+            mask_kwargs (dict): Additional keyword arguments passed to region.mask().
+
+        Returns:
+            numpy.ndarray: The boolean mask of the pixels.
+        """
+        self.logger.debug("Building HEALPix region selection for nside=%d", grid.nside)
+        lons, lats = healpix_pixel_coords(grid.nside, nest=grid.nest, signed_lon=grid.signed_lon)
+        mask = region.mask(xr.DataArray(lons, dims=[grid.dim]), xr.DataArray(lats, dims=[grid.dim]),
+                           **mask_kwargs)
+        return np.isin(mask.values, region_numbers)
+
+    @staticmethod
+    def _healpix_select(data, grid, mask, drop: bool = False):
+        """Apply a pixel mask to data on a HEALPix grid"""
+        if drop:
+            return data.isel({grid.dim: np.flatnonzero(mask)})
+        return data.where(xr.DataArray(mask, dims=[grid.dim]))
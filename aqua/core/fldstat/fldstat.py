@@ -1,6 +1,8 @@
 """AQUA class for field statitics"""
+import re
 import xarray as xr
 import numpy as np
+import healpy as hp
 import regionmask
 
 from smmregrid import GridInspector
@@ -9,10 +11,14 @@ from aqua.core.logger import log_configure, log_history
 from aqua.core.util import multiply_units
 
 from .area_selection import AreaSelection
+from .healpix import healpix_cell_area
 
 # set default options for xarray
 xr.set_options(keep_attrs=True)
 
+# names of the HEALPix grids, e.g. hpz7-nested, icon-R02B08-hp-nested or ifs-healpix
+HEALPIX_GRID_NAME = re.compile(r'hpz\d+|healpix|(^|[-_])hp([-_]|$)', re.IGNORECASE)
+
 
 class FldStat():
     """AQUA class for field statitics"""
@@ -21,6 +27,8 @@ class FldStat():
                  area: xr.Dataset | xr.DataArray | None = None,
                  horizontal_dims: list[str] | None = None,
                  grid_name: str | None = None,
+                 healpix_native: bool = False,
+                 mask: xr.DataArray | None = None,
                  loglevel: str = 'WARNING'):
         """
         Initialize the FldStat.
@@ -29,6 +37,11 @@ class FldStat():
             area (xr.Dataset, xr.DataArray, optional): The area to calculate the statistics for.
             horizontal_dims (list, optional): The horizontal dimensions of the data.
             grid_name (str, optional): The name of the grid, used for logging history.
+            healpix_native (bool, optional): For data on a full HEALPix grid, use the equal area of the
+                                             HEALPix cells instead of the area values, and select regions
+                                             from the pixel centres of the grid. Defaults to False.
+            mask (xr.DataArray, optional): The valid cells of an explicitly masked HEALPix grid (e.g. a 2dm
+                                           ocean grid), excluded from the equal-area statistics. Defaults to None.
             loglevel (str, optional): The logging level.
         """
         self.loglevel = loglevel
@@ -37,6 +50,14 @@ class FldStat():
         if horizontal_dims is None:
             self.logger.warning("No horizontal dimensions provided, will try to guess from data when provided!")
         self.horizontal_dims = horizontal_dims
+        self.grid_name = grid_name
+        self.healpix_native = healpix_native
+        self.mask = mask
+        # cell area and mask of the HEALPix grids, by dimension and size
+        self._healpix_areas = {}
+
+        # Initialize area selection
+        self.area_selection = AreaSelection(healpix_native=healpix_native, loglevel=loglevel)
 
         if self.area is None:
             self.logger.warning("No area provided, no weighted area can be provided.")
@@ -46,11 +67,6 @@ class FldStat():
         if not isinstance(area, (xr.DataArray, xr.Dataset)):
             raise ValueError("Area must be an xarray DataArray or Dataset.")
 
-        self.grid_name = grid_name
-
-        # Initialize area selection
-        self.area_selection = AreaSelection(loglevel=loglevel)
-
     @property
     def AVAILABLE_FLDSTATS(self):
         """Return available field statistics."""
@@ -115,6 +131,10 @@ class FldStat():
                 if dim not in self.horizontal_dims:
                     raise ValueError(f"Dimension {dim} not found in horizontal dimensions: {self.horizontal_dims}")
 
+        if self._is_healpix(data, dims):
+            return self._healpix_fldstat(data, stat, dims, lon_limits=lon_limits, lat_limits=lat_limits,
+                                         region=region, region_sel=region_sel, mask_kwargs=mask_kwargs, **kwargs)
+
         # If area is not provided, return the raw mean
         if self.area is None:
             self.logger.warning("No area provided, no area-weighted stat can be provided.")
@@ -160,6 +180,88 @@ class FldStat():
 
         return out
 
+    def _is_healpix(self, data: xr.Dataset | xr.DataArray, dims: list):
+        """
+        If the HEALPix path applies, i.e. the statistic is over a full HEALPix grid.
+        Besides a valid number of pixels, the grid must be declared as HEALPix by its name
+        or by the HEALPix grid mapping of the data (the 'crs' coordinate).
+        """
+        if not self.healpix_native or len(dims) != 1 or dims[0] not in data.dims:
+            return False
+        npix = data.sizes[dims[0]]
+        if not hp.isnpixok(npix):
+            return False
+        crs = data.coords.get('crs')
+        if crs is not None and (crs.attrs.get('grid_mapping_name') == 'healpix' or 'healpix_nside' in crs.attrs):
+            nside = crs.attrs.get('healpix_nside')
+            return nside is None or int(nside) == hp.npix2nside(npix)
+        return bool(self.grid_name and HEALPIX_GRID_NAME.search(self.grid_name))
+
+    def _healpix_area(self, data: xr.Dataset | xr.DataArray, dim: str):
+        """
+        The cell area of a full HEALPix grid, equal for all cells, and the mask of the
+        masked grid if provided (e.g. land on ocean grids). The area values are never read.
+
+        Returns:
+            tuple: the cell area as scalar DataArray, the area of each cell, NaN on the masked cells,
+                   and the mask (None if all cells are valid)
+        """
+        key = (dim, data.sizes[dim])
+        if key not in self._healpix_areas:
+            nside = hp.npix2nside(data.sizes[dim])
+            attrs = {'units': 'm2'}
+            cell_area = healpix_cell_area(nside)
+            mask = None
+            if self.mask is not None:
+                mask = xr.DataArray(np.asarray(self.mask, dtype=bool), dims=[dim])
+                if mask.size != data.sizes[dim]:
+                    raise ValueError(f"The mask has {mask.size} cells, the data {data.sizes[dim]} on {dim}")
+            self.logger.debug("HEALPix grid with nside=%d and cell area %.4g", nside, cell_area)
+            area = xr.DataArray(cell_area, attrs=attrs)
+            cells = area.expand_dims({dim: data.sizes[dim]})
+            if mask is not None:
+                cells = cells.where(mask)
+            cells.attrs = attrs
+            self._healpix_areas[key] = (area, cells, mask)
+        return self._healpix_areas[key]
+
+    def _healpix_fldstat(self, data: xr.Dataset | xr.DataArray, stat: str, dims: list,
+                         lon_limits: list | None = None, lat_limits: list | None = None,
+                         region: regionmask.Regions | None = None,
+                         region_sel: str | int | list | None = None,
+                         mask_kwargs: dict = {}, **kwargs):
+        """
+        Field statistic on a full HEALPix grid. All the cells have the same area,
+        so that weighted statistics are plain statistics over the valid cells.
+        Arguments as in fldstat.
+        """
+        area, cells, mask = self._healpix_area(data, dims[0])
+
+        if lon_limits is not None or lat_limits is not None or region is not None:
+            self.logger.debug("Selecting HEALPix pixels for field stat calculation.")
+            data = self.area_selection.select_area(data, lon=lon_limits, lat=lat_limits,
+                                                   region=region, region_sel=region_sel,
+                                                   mask_kwargs=mask_kwargs,
+                                                   to_180=False, **kwargs)
+        if mask is not None:
+            data = data.where(mask)
+
+        self.logger.info("Computing equal-area %s on HEALPix %s dimension", stat, dims)
+        # the area of each cell, so that masked and missing cells are excluded as with the area files
+        if stat == 'integral':
+            out = self.integrate_over_area(data, cells, dims)
+        elif stat == 'areasum':
+            out = self.sum_area(data.notnull() & data.astype(bool), cells, dims)
+        elif stat == 'sum':
+            out = data.sum(dim=dims) * area.item()
+        else:
+            out = getattr(data, stat)(dim=dims)
+
+        if self.grid_name is not None:
+            log_history(out, f"From grid '{self.grid_name}'. Computed field stat '{stat}'")
+
+        return out
+
     def select_area(self, data: xr.Dataset | xr.DataArray,
                     lon: list | None = None, lat: list | None = None,
                     box_brd: bool = True, drop: bool = False,
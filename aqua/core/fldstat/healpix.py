@@ -0,0 +1,135 @@
+"""
+HEALPix helpers for field statistics: the closed-form geometry of the grid
+replaces the area files and the coordinate masks of generic unstructured grids.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import healpy as hp
+import xarray as xr
+
+# the radius used by CDO for the cell areas, in meters
+EARTH_RADIUS = 6371000.0
+
+HealpixGrid = namedtuple('HealpixGrid', ['dim', 'nside', 'nest', 'signed_lon'])
+
+
+def healpix_grid(data: xr.Dataset | xr.DataArray, lon_name: str = 'lon', lat_name: str = 'lat'):
+    """
+    Detect a full HEALPix grid from the coordinates of the data, comparing a sample
+    of the cell centres with the pixel centres in nested and ring ordering.
+
+    Args:
+        data (xr.Dataset or xr.DataArray): The data.
+        lon_name (str, optional): Name of the longitude coordinate. Defaults to 'lon'.
+        lat_name (str, optional): Name of the latitude coordinate. Defaults to 'lat'.
+
+    Returns:
+        HealpixGrid: dimension, nside, ordering and longitude convention of the grid,
+                     None if the data are not on a full HEALPix grid.
+    """
+    if lon_name not in data.coords or lat_name not in data.coords:
+        return None
+    lon, lat = data[lon_name], data[lat_name]
+    if lon.ndim != 1 or lon.dims != lat.dims or not hp.isnpixok(lon.size):
+        return None
+
+    nside = hp.npix2nside(lon.size)
+    sample = np.unique(np.linspace(0, lon.size - 1, 16).astype(int))
+    lons = np.asarray(lon[sample], dtype=float)
+    lats = np.asarray(lat[sample], dtype=float)
+    for nest in (True, False):
+        plon, plat = hp.pix2ang(nside, sample, nest=nest, lonlat=True)
+        if np.allclose(lats, plat, atol=1e-4) and np.allclose((lons - plon + 180) % 360 - 180, 0, atol=1e-4):
+            return HealpixGrid(lon.dims[0], nside, nest, bool((lons < 0).any()))
+    return None
+
+
+def healpix_cell_area(nside: int, radius: float = EARTH_RADIUS):
+    """The area of the cells of a HEALPix grid, all equal, in square meters"""
+    return 4 * np.pi * radius**2 / hp.nside2npix(nside)
+
+
+@lru_cache(maxsize=64)
+def healpix_pixel_coords(nside: int, nest: bool = True, signed_lon: bool = False):
+    """
+    Longitude and latitude of the pixel centres of a HEALPix grid.
+
+    Args:
+        nside (int): The nside of the grid.
+        nest (bool, optional): Nested ordering. Defaults to True.
+        signed_lon (bool, optional): Longitudes in [-180, 180] instead of [0, 360]. Defaults to False.
+
+    Returns:
+        tuple: numpy arrays of longitude and latitude, read-only since they are cached.
+    """
+    lon, lat = hp.pix2ang(nside, np.arange(hp.nside2npix(nside)), nest=nest, lonlat=True)
+    if signed_lon:
+        lon = np.where(lon > 180, lon - 360, lon)
+    lon.flags.writeable = False
+    lat.flags.writeable = False
+    return lon, lat
+
+
+def healpix_strip_pixels(nside: int, lat: list, nest: bool = True):
+    """
+    The pixels of a HEALPix grid overlapping a latitude band, a superset of the pixels
+    whose centres are in the band, found with the ring structure of the grid.
+
+    Args:
+        nside (int): The nside of the grid.
+        lat (list): The latitude band.
+        nest (bool, optional): Nested ordering. Defaults to True.
+
+    Returns:
+        numpy.ndarray: The sorted pixel indices.
+    """
+    if lat[0] <= -90 and lat[1] >= 90:
+        return np.arange(hp.nside2npix(nside))
+    theta1 = np.radians(90 - min(lat[1], 90))
+    theta2 = np.radians(90 - max(lat[0], -90))
+    return np.sort(hp.query_strip(nside, theta1, theta2, inclusive=True, nest=nest))
+
+
+def healpix_aggregate(data: xr.Dataset | xr.DataArray, zoom: int, dim: str | None = None,
+                      lon_name: str = 'lon', lat_name: str = 'lat'):
+    """
+    Average nested HEALPix data on the parent pixels of a coarser zoom level.
+    In nested ordering the children of a pixel are contiguous, so that the average
+    is a reshape of the cell dimension, and the cell areas being equal it is area-weighted.
+    The ordering is checked on the lon/lat coordinates: without them, nested ordering is assumed.
+
+    Args:
+        data (xr.Dataset or xr.DataArray): The data on a nested HEALPix grid.
+        zoom (int): The zoom level of the output, i.e. nside = 2**zoom.
+        dim (str, optional): The cell dimension. Defaults to the one of the lon/lat coordinates.
+        lon_name (str, optional): Name of the longitude coordinate. Defaults to 'lon'.
+        lat_name (str, optional): Name of the latitude coordinate. Defaults to 'lat'.
+
+    Returns:
+        xr.Dataset or xr.DataArray: The data at the given zoom level, with the pixel centres as coordinates.
+
+    Raises:
+        ValueError: If the data are not on a nested HEALPix grid or the zoom level is not coarser.
+    """
+    grid = healpix_grid(data, lon_name=lon_name, lat_name=lat_name)
+    if grid is not None:
+        if not grid.nest:
+            raise ValueError("HEALPix data in ring ordering cannot be aggregated, reorder them to nested")
+        dim = dim or grid.dim
+    if dim is None or dim not in data.dims or not hp.isnpixok(data.sizes[dim]):
+        raise ValueError("Data are not on a full HEALPix grid, please provide the cell dimension")
+
+    nside = hp.npix2nside(data.sizes[dim])
+    nside_out = 2**zoom
+    if nside_out > nside:
+        raise ValueError(f"Zoom {zoom} is finer than the one of the data ({int(np.log2(nside))})")
+
+    coords = [name for name in data.coords if dim in data[name].dims]
+    out = data.drop_vars(coords).coarsen({dim: (nside // nside_out)**2}).mean()
+    if grid is not None:
+        lon, lat = healpix_pixel_coords(nside_out, nest=True, signed_lon=grid.signed_lon)
+        out = out.assign_coords({lon_name: (dim, lon.copy(), data[lon_name].attrs),
+                                 lat_name: (dim, lat.copy(), data[lat_name].attrs)})
+    return out
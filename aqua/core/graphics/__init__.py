@@ -13,6 +13,7 @@ The following functions are available:
 - plot_timeseries: Plot monthly and annual timeseries
 - plot_seasonalcycle: Plot a seasonal cycle
 - plot_maps: Plot multiple maps using plot_single_map
+- BatchMapRenderer: Render many maps to file, reusing figures in a pool of processes
 """
 from .gregory import plot_gregory_monthly, plot_gregory_annual
 from .histogram import plot_histogram
@@ -20,6 +21,7 @@ from .hovmoller import plot_hovmoller
 from .boxplot import boxplot
 from .index_plot import index_plot, indexes_plot
 from .single_map import plot_single_map, plot_single_map_diff
+from .batch_maps import BatchMapRenderer
 from .styles import ConfigStyle
 from .timeseries import plot_timeseries, plot_seasonalcycle
 from .multiple_maps import plot_maps, plot_maps_diff
@@ -34,6 +36,7 @@ __all__ = ["plot_gregory_monthly", "plot_gregory_annual",
            "plot_hovmoller", "boxplot",
            "index_plot", "indexes_plot",
            "plot_single_map", "plot_single_map_diff",
+           "BatchMapRenderer",
            "ConfigStyle",
            "plot_timeseries", "plot_seasonalcycle",
            "plot_maps", "plot_maps_diff",
@@ -0,0 +1,231 @@
+"""
+Module to render many maps in a batch.
+The figure and the map axes, with coastlines, land and gridlines, are built once
+for each combination of projection, extent and figure size and reused for all
+the maps sharing it, while the maps are split among a pool of processes.
+"""
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import cartopy.crs as ccrs
+import cartopy.feature as cfeature
+import matplotlib
+import matplotlib.pyplot as plt
+import xarray as xr
+
+from aqua.core.logger import log_configure
+from aqua.core.util import add_png_metadata, add_pdf_metadata
+from .gridlines import draw_manual_gridlines
+from .single_map import plot_single_map
+
+# keyword arguments of plot_single_map handled by the map templates
+TEMPLATE_KWARGS = ['proj', 'extent', 'figsize', 'coastlines', 'add_land', 'gridlines', 'cbar',
+                   'fig', 'ax', 'ax_pos', 'return_fig', 'loglevel']
+
+# the templates of the current process, by template key
+_TEMPLATES = {}
+
+
+class MapFrame():
+    """
+    A map to be rendered by the BatchMapRenderer.
+
+    Args:
+        data (xr.DataArray): the data to plot, loaded in memory
+        filename (str): the output filename, without extension
+        metadata (dict, optional): metadata added to the output files
+        kwargs (dict, optional): keyword arguments for plot_single_map
+    """
+
+    def __init__(self, data, filename, metadata=None, kwargs=None):
+        self.data = data
+        self.filename = filename
+        self.metadata = metadata
+        self.kwargs = kwargs or {}
+
+    @property
+    def template(self):
+        """The key of the figure template used by the map"""
+        extent = self.kwargs.get('extent')
+        return (self.kwargs.get('proj', ccrs.Robinson()),
+                tuple(extent) if extent else None,
+                tuple(self.kwargs.get('figsize', (11, 8.5))),
+                self.kwargs.get('coastlines', True),
+                self.kwargs.get('add_land', False),
+                self.kwargs.get('gridlines', False),
+                self.kwargs.get('cbar', True))  # the colorbar changes the axes position
+
+
+class _MapTemplate():
+    """A figure with the map axes and their decorations, restored after each map"""
+
+    def __init__(self, key):
+        proj, extent, figsize, coastlines, add_land, gridlines, _ = key
+        self.fig = plt.figure(figsize=figsize)
+        self.ax = self.fig.add_subplot(1, 1, 1, projection=proj)
+        if extent:
+            self.ax.set_extent(extent, ccrs.PlateCarree())
+        if coastlines:
+            self.ax.coastlines()
+        if add_land:
+            self.ax.add_feature(cfeature.LAND, facecolor='#efebd7', edgecolor='k', zorder=3)
+        if gridlines and proj != ccrs.PlateCarree():
+            gl = self.ax.gridlines(draw_labels=True, color='none')  # invisible lines
+            gl.xlabels_top = False
+            gl.ylabels_right = False
+            draw_manual_gridlines(ax=self.ax, lon_interval=30, lat_interval=30, zorder=50)
+
+        self.artists = set(self.ax.get_children())
+        self.axes = set(self.fig.axes)
+        self.datalim = self.ax.dataLim.frozen()
+        self.viewlim = self.ax.viewLim.frozen()
+        self.ignore_limits = self.ax.ignore_existing_data_limits
+        self.autoscale = (self.ax.get_autoscalex_on(), self.ax.get_autoscaley_on())
+
+    def clean(self):
+        """Remove everything added by a map and restore the limits, as for a new figure"""
+        # the colorbars first, so that they disconnect from their maps and remove their own axes
+        for artist in self.ax.get_children():
+            colorbar = getattr(artist, 'colorbar', None)
+            if artist not in self.artists and colorbar is not None:
+                colorbar.remove()
+        for artist in self.ax.get_children():
+            if artist not in self.artists:
+                try:
+                    artist.remove()
+                except (NotImplementedError, ValueError):
+                    pass
+        for other in self.fig.axes:
+            if other not in self.axes:
+                other.remove()
+        self.ax.set_title('')
+        self.ax.dataLim.set(self.datalim)
+        self.ax.ignore_existing_data_limits = self.ignore_limits
+        self.ax.set_xlim(self.viewlim.intervalx)
+        self.ax.set_ylim(self.viewlim.intervaly)
+        self.ax.set_autoscalex_on(self.autoscale[0])
+        self.ax.set_autoscaley_on(self.autoscale[1])
+
+
+def _get_template(key):
+    """The template of a key, built on first use in the current process"""
+    if key not in _TEMPLATES:
+        _TEMPLATES[key] = _MapTemplate(key)
+    return _TEMPLATES[key]
+
+
+def _render_frames(frames, formats, dpi, loglevel):
+    """Render a list of frames in the current process, returning the output files"""
+    logger = log_configure(loglevel, 'BatchMapRenderer')
+    outputs = []
+    for frame in frames:
+        key = frame.template
+        template = _get_template(key)
+        fig, ax = template.fig, template.ax
+        kwargs = {name: value for name, value in frame.kwargs.items() if name not in TEMPLATE_KWARGS}
+        try:
+            plot_single_map(frame.data, proj=key[0], coastlines=False, add_land=False, gridlines=False,
+                            cbar=key[-1], fig=fig, ax=ax, return_fig=True, loglevel=loglevel, **kwargs)
+            for fmt in formats:
+                filename = f'{frame.filename}.{fmt}'
+                fig.savefig(filename, dpi=dpi, bbox_inches='tight')
+                if frame.metadata:
+                    if fmt == 'png':
+                        add_png_metadata(filename, frame.metadata, loglevel=loglevel)
+                    elif fmt == 'pdf':
+                        add_pdf_metadata(filename, frame.metadata, loglevel=loglevel)
+                outputs.append(filename)
+                logger.debug('Saved %s', filename)
+        finally:
+            template.clean()
+    return outputs
+
+
+def _close_templates():
+    """Close the figures of the templates of the current process"""
+    for template in _TEMPLATES.values():
+        plt.close(template.fig)
+    _TEMPLATES.clear()
+
+
+class BatchMapRenderer():
+    """
+    Render many maps with plot_single_map, saving each of them to file.
+    The maps sharing projection, extent, figure size, coastlines, land and gridlines
+    are drawn on the same figure, built once per process, and the maps are split
+    among a pool of processes.
+
+    Args:
+        formats (list, optional): the output formats, 'png' and/or 'pdf'. Defaults to ['png'].
+        dpi (int, optional): the resolution of the output. Defaults to 300.
+        processes (int, optional): the number of processes. 1 renders in the current process.
+                                   Defaults to the number of CPUs.
+        loglevel (str, optional): the log level. Defaults to 'WARNING'.
+    """
+
+    def __init__(self, formats: Optional[list] = None, dpi: int = 300,
+                 processes: Optional[int] = None, loglevel: str = 'WARNING'):
+        self.logger = log_configure(loglevel, 'BatchMapRenderer')
+        self.loglevel = loglevel
+        self.formats = formats or ['png']
+        for fmt in self.formats:
+            if fmt not in ['png', 'pdf']:
+                raise ValueError(f'Format {fmt} not supported, use png or pdf')
+        self.dpi = dpi
+        self.processes = processes if processes and processes > 0 else (os.cpu_count() or 1)
+        self.frames = []
+
+    def add(self, data: xr.DataArray, filename: str, metadata: Optional[dict] = None, **kwargs):
+        """
+        Add a map to be rendered.
+
+        Args:
+            data (xr.DataArray): the data to plot, loaded in memory when added
+            filename (str): the output filename, without extension
+            metadata (dict, optional): metadata added to the output files
+            **kwargs: keyword arguments for plot_single_map
+        """
+        if not isinstance(data, xr.DataArray):
+            raise ValueError('Data must be an xarray.DataArray')
+        self.frames.append(MapFrame(data.compute(), filename, metadata, kwargs))
+
+    def render(self):
+        """
+        Render all the added maps.
+
+        Returns:
+            list: the output files, in the order of the maps and formats
+        """
+        frames, self.frames = self.frames, []
+        if not frames:
+            return []
+
+        # the maps sharing a template are rendered by the same process
+        order = sorted(range(len(frames)), key=lambda i: repr(frames[i].template))
+        nproc = min(self.processes, len(frames))
+        size = -(-len(frames) // nproc)
+        batches = [[frames[i] for i in order[start:start + size]] for start in range(0, len(frames), size)]
+        self.logger.info('Rendering %d maps with %d processes', len(frames), len(batches))
+
+        if len(batches) == 1:
+            try:
+                results = [_render_frames(batches[0], self.formats, self.dpi, self.loglevel)]
+            finally:
+                _close_templates()
+        else:
+            # spawned workers do not inherit the threads of the caller, and draw without display
+            with ProcessPoolExecutor(max_workers=len(batches),
+                                     mp_context=multiprocessing.get_context('spawn'),
+                                     initializer=matplotlib.use, initargs=('Agg',)) as executor:
+                results = list(executor.map(_render_frames, batches,
+                                            [self.formats] * len(batches), [self.dpi] * len(batches),
+                                            [self.loglevel] * len(batches)))
+
+        # back to the order of the maps
+        rendered = {}
+        for batch, outputs in zip(batches, results):
+            for index, frame in enumerate(batch):
+                rendered[id(frame)] = outputs[index * len(self.formats):(index + 1) * len(self.formats)]
+        return [filename for frame in frames for filename in rendered[id(frame)]]
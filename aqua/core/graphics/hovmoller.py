@@ -8,6 +8,7 @@ import numpy as np
 import xarray as xr
 
 from aqua.core.util import create_folder, evaluate_colorbar_limits, unit_to_latex
+from aqua.core.util import display_pixels, coarsen_for_display
 from aqua.core.logger import log_configure
 from .styles import ConfigStyle
 
@@ -34,6 +35,8 @@ def plot_hovmoller(data: xr.DataArray,
                    return_fig=False,
                    fig: plt.Figure = None, ax: plt.Axes = None,
                    ax_pos: tuple = (1, 1, 1),
+                   preview: bool = False,
+                   preview_dpi: int = 150,
                    loglevel: str = "WARNING",
                    ):
     """
@@ -63,6 +66,9 @@ def plot_hovmoller(data: xr.DataArray,
         fig (plt.Figure): Matplotlib figure object to plot on. If None, a new figure will be created.
         ax (plt.Axes): Matplotlib axes object to plot on. If None, a new axes will be created.
         ax_pos (tuple): Position of the axes in the figure. Default is (1, 1, 1), which means a single subplot.
+        preview (bool): If True, the averaged data are reduced lazily to the resolution of the figure
+                        before being loaded, and the color limits are evaluated on them. Default is False.
+        preview_dpi (int): Resolution of the figure assumed by the preview. Default is 150.
         loglevel (str): Logging level. Default is "WARNING".
 
     Returns:
@@ -94,6 +100,13 @@ def plot_hovmoller(data: xr.DataArray,
     if ax is None:
         ax = fig.add_subplot(ax_pos[0], ax_pos[1], ax_pos[2])
 
+    if preview:
+        # No need to load more points than the pixels of the axes
+        width, height = display_pixels(figsize, preview_dpi, fig=fig, ax=ax)
+        space = data_mean.dims[-1]
+        pixels = {space: width, 'time': height} if invert_axis else {'time': width, space: height}
+        data_mean = coarsen_for_display(data_mean, pixels, loglevel=loglevel).load(keep_attrs=True)
+
     # Plot the data
     if invert_axis:
         logger.debug('Inverting axis for plot')
@@ -115,12 +128,14 @@ def plot_hovmoller(data: xr.DataArray,
         if invert_space_coord:
             plt.gca().invert_yaxis()
 
+    # The preview does not load the full data to evaluate the limits
+    maps = [data_mean] if preview else [data]
     if vmin is None or vmax is None:
-        vmin, vmax = evaluate_colorbar_limits(maps=[data], sym=sym)
+        vmin, vmax = evaluate_colorbar_limits(maps=maps, sym=sym)
     else:
         if sym:
             logger.warning("sym=True, vmin and vmax given will be ignored")
-            vmin, vmax = evaluate_colorbar_limits(maps=[data], sym=sym)
+            vmin, vmax = evaluate_colorbar_limits(maps=maps, sym=sym)
     logger.debug("Setting vmin to %s, vmax to %s", vmin, vmax)
 
     if contour:
@@ -18,6 +18,7 @@ from aqua.core.logger import log_configure
 from aqua.core.util import add_cyclic_lon, evaluate_colorbar_limits
 from aqua.core.util import healpix_resample, coord_names, set_ticks, ticks_round
 from aqua.core.util import cbar_get_label, set_map_title, generate_colorbar_ticks
+from aqua.core.util import display_pixels, coarsen_map_for_display
 from .gridlines import draw_manual_gridlines
 from .styles import ConfigStyle
 import cartopy.feature as cfeature
@@ -32,7 +33,7 @@ def plot_single_map(data: xr.DataArray,
                     norm: Optional[object] = None,
                     title: Optional[str] = None, title_size: Optional[int] = 12, transform_first: bool = False, cyclic_lon: bool = True,
                     add_land: bool = False, fig: Optional[plt.Figure] = None, ax: Optional[plt.Axes] = None,
-                    ax_pos: tuple = (1, 1, 1), return_fig: bool = False, 
+                    ax_pos: tuple = (1, 1, 1), return_fig: bool = False, preview: bool = False,
                     loglevel='WARNING',  **kwargs):
     """
     Plot contour or pcolormesh map of a single variable. By default the contour map is plotted.
@@ -64,9 +65,12 @@ def plot_single_map(data: xr.DataArray,
         ax (plt.Axes, optional):     Axes to plot on. By default a new axes is created.
         ax_pos (list, optional):     Axes position. Used if the axes has to be created. Defaults to (1, 1, 1).
         return_fig (bool, optional): If True, return the figure and axes. Defaults to False.
+        preview (bool, optional):    If True, the data are averaged lazily to the resolution of the figure
+                                     before being loaded. Defaults to False.
         loglevel (str, optional):    Log level. Defaults to 'WARNING'.
 
     Keyword Args:
+        preview_dpi (int, optional): Resolution of the figure assumed by the preview. Defaults to 150.
         nxticks (int, optional):     Number of x ticks. Defaults to 7.
         nyticks (int, optional):     Number of y ticks. Defaults to 7.
         ticks_rounding (int, optional):  Number of digits to round the ticks.
@@ -81,6 +85,11 @@ def plot_single_map(data: xr.DataArray,
     logger = log_configure(loglevel, 'plot_single_map')
     ConfigStyle(style=style, loglevel=loglevel)
 
+    if preview:
+        # No need to load more points than the pixels of the figure
+        width, height = display_pixels(figsize, kwargs.get('preview_dpi', 150), fig=fig, ax=ax, ax_pos=ax_pos)
+        data = coarsen_map_for_display(data, width, height, extent=extent, loglevel=loglevel)
+
     # Check if the data is in HEALPix format
     npix = data.size  # Number of cells in the data
     nside = hp.npix2nside(npix) if hp.isnpixok(npix) else None
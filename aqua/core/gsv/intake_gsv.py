@@ -12,6 +12,7 @@ from intake.source import base
 from aqua.core.util.eccodes import get_eccodes_attr
 from aqua.core.util import to_list
 from aqua.core.logger import log_configure, _check_loglevel
+from aqua.core.tracing import trace_span
 from .timeutil import check_dates, shift_time_dataset, floor_datetime, read_bridge_date, todatetime
 from .timeutil import split_date, make_timeaxis, date2str, date2yyyymm, add_offset
 
@@ -636,8 +637,10 @@ class GSVSource(base.DataSource):
         gsv = GSVRetriever(engine=self.engine, source=self.databridge, logging_level=self.gsv_log_level)
 
         self.logger.debug('Request %s', request)
-        dataset = gsv.request_data(request, use_stream_iterator=fstream_iterator,
-                                   process_derived_variables=False)  # following 2.9.2 we avoid derived variables
+        with trace_span('fdb_partition', partition=ii) as span:
+            dataset = gsv.request_data(request, use_stream_iterator=fstream_iterator,
+                                       process_derived_variables=False)  # following 2.9.2 we avoid derived variables
+            span.set(dataset)
 
         if self.timeshift:  # shift time by one month (special case)
             dataset = shift_time_dataset(dataset)
@@ -1,4 +1,5 @@
 """Histogram module."""
-from .histogram import histogram
+from .histogram import histogram, bin_edges
+from .sketch import HistogramSketch, QuantileSketch
 
-__all__ = ['histogram']
+__all__ = ['histogram', 'bin_edges', 'HistogramSketch', 'QuantileSketch']
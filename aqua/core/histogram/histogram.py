@@ -2,81 +2,200 @@ import numpy as np
 import xarray as xr
 import builtins
 import dask.array as da
-from aqua.core.util import convert_data_units
+from dask.base import compute
+from aqua.core.util import convert_data_units, to_list
 from aqua.core.logger import log_configure
 
+
+def bin_edges(data: xr.Dataset | xr.DataArray, bins=10, range=None):
+    """
+    Edges of the bins of a histogram, shared by all the variables of the data.
+    If the range is not provided it is the one of the data, computed in a single pass for all the variables.
+
+    Args:
+        data (xarray.Dataset or xarray.DataArray): The input data.
+        bins (int or sequence, optional): The number of bins or the bin edges. Defaults to 10.
+        range (tuple, optional): The lower and upper range of the bins. Defaults to None.
+
+    Raises:
+        ValueError: If the edges are not monotonically increasing or the range is not finite.
+
+    Returns:
+        numpy.ndarray: The bin edges.
+    """
+    if not np.isscalar(bins):
+        edges = np.asarray(bins, dtype=float)
+        if edges.ndim != 1 or edges.size < 2 or np.any(np.diff(edges) <= 0):
+            raise ValueError('Bin edges must be a monotonically increasing sequence')
+        return edges
+
+    if range is None:
+        variables = list(data.data_vars.values()) if isinstance(data, xr.Dataset) else [data]
+        extremes = compute(*[stat for var in variables for stat in (var.min(), var.max())])
+        range = (min(float(value) for value in extremes[::2]), max(float(value) for value in extremes[1::2]))
+        if not np.all(np.isfinite(range)):
+            raise ValueError('The range of the data is not finite, please provide the range')
+        if range[0] == range[1]:  # as numpy does
+            range = (range[0] - 0.5, range[1] + 0.5)
+    return np.linspace(range[0], range[1], int(bins) + 1)
+
+
+def _block_histogram(values, weights=None, *, edges, nkeep):
+    """
+    Histogram of a block over all its axes but the first nkeep ones,
+    keeping the reduced axes with size 1 so that blocks can be summed.
+    Bins are half-open but the last one, values outside the edges and NaNs are ignored, as in numpy.
+    """
+    nbins = edges.size - 1
+    shape = values.shape
+    rows = int(np.prod(shape[:nkeep], dtype=int))
+    values = values.reshape(rows, -1)
+    index = np.searchsorted(edges, values, side='right') - 1
+    index[values == edges[-1]] = nbins - 1
+    valid = (index >= 0) & (index < nbins)
+    index = (index + np.arange(rows)[:, np.newaxis] * nbins)[valid]
+    if weights is not None:
+        weights = np.broadcast_to(weights, shape).reshape(rows, -1)[valid]
+    hist = np.bincount(index, weights=weights, minlength=rows * nbins)
+    return hist.reshape(shape[:nkeep] + (1,) * (len(shape) - nkeep) + (nbins,))
+
+
+def _lat_weights(data: xr.DataArray):
+    """Cosine of the latitude, with size 1 along the dimensions not carrying the latitude"""
+    if 'lat' not in data.coords:
+        raise ValueError("DataArray must have a 'lat' coordinate for weighted histogram.")
+    weights = np.cos(np.radians(data['lat'].astype(float)))
+    weights = weights.transpose(*[dim for dim in data.dims if dim in weights.dims]).values
+    return weights.reshape([data.sizes[dim] if dim in data['lat'].dims else 1 for dim in data.dims])
+
+
+def _histogram_array(data: xr.DataArray, edges, dims, weighted, dask, split=None):
+    """
+    The histogram of a DataArray over the dimensions dims, keeping the others.
+    Dask arrays are reduced from the partial histograms of their chunks.
+    With split, one of dims, the partial histograms of the chunks along it are not summed,
+    giving one histogram per chunk (e.g. per time window) in a single blockwise reduction.
+    """
+    keep = [name for name in data.dims if name not in dims]
+    if split is not None and not isinstance(data.data, da.Array):
+        data = data.chunk()
+    data = data.transpose(*keep, ...)
+    weights = _lat_weights(data) if weighted else None
+    nkeep = len(keep)
+    nbins = edges.size - 1
+
+    if dask and isinstance(data.data, da.Array):
+        values = data.data
+        if weights is not None:
+            # the weights are broadcast within each chunk, never at full size
+            wchunks = tuple(chunks if size > 1 else (1,) for chunks, size in zip(values.chunks, weights.shape))
+            weights = da.broadcast_to(da.from_array(weights, chunks=wchunks), values.shape, chunks=values.chunks)
+        chunks = values.chunks[:nkeep] + tuple((1,) * len(chunks) for chunks in values.chunks[nkeep:]) + ((nbins,),)
+        dtype = float if weights is not None else np.int64
+        args = (values,) if weights is None else (values, weights)
+        hist = da.map_blocks(_block_histogram, *args, edges=edges, nkeep=nkeep, chunks=chunks,
+                             new_axis=values.ndim, dtype=dtype, meta=np.array((), dtype=dtype))
+        axes = [axis for axis in builtins.range(nkeep, values.ndim) if data.dims[axis] != split]
+        hist = hist.sum(axis=tuple(axes))
+        if split is not None:
+            axis = data.dims.index(split)
+            # the chunks are reduced to one entry each, labelled by the coordinate of their first element
+            starts = np.cumsum((0,) + values.chunks[axis][:-1])
+            coords = {dim: data[dim] for dim in keep if dim in data.coords}
+            if split in data.coords:
+                coords[split] = data[split].isel({split: starts})
+            return xr.DataArray(hist, dims=keep + [split, 'center_of_bin'], coords=coords)
+    else:
+        hist = _block_histogram(np.asarray(data.values), weights, edges=edges, nkeep=nkeep)
+        hist = hist.reshape(hist.shape[:nkeep] + (nbins,))
+
+    return xr.DataArray(hist, dims=keep + ['center_of_bin'], coords={dim: data[dim] for dim in keep if dim in data.coords})
+
+
 def histogram(data: xr.DataArray, bins = 10, range = None, units = None,
-              weighted = True, loglevel='WARNING', dask=True, check=False, density=False):
+              weighted = True, loglevel='WARNING', dask=True, check=False, density=False,
+              var=None, dim=None):
     """
     Function to calculate a histogram of a DataArray.
 
     Args:
-        data (xarray.Dataset):     The input DataArray. If it is a Dataset, the first variable is used.
-        bins (int, optional):      The number of bins for the histogram. Defaults to 10.
+        data (xarray.Dataset):     The input DataArray. If it is a Dataset, the first variable is used unless var is provided.
+        bins (int or sequence, optional): The number of bins for the histogram, or the bin edges. Defaults to 10.
         range (tuple, optional):   The lower and upper range of the bins. Defaults to None (in that case it is determined automatically).
         weighted (bool, optional): Use latitudinal weights for the histogram. Defaults to True.
         dask (bool, optional):     If True, uses Dask for parallel computation. Defaults to True.
         units (str, optional):     Convert data to these units. Defaults to None.
-        check (bool, optional):    Checks if the sum of counts in the histogram is equal to the size of the data. 
+        check (bool, optional):    Checks if the sum of counts in the histogram is equal to the size of the data.
                                    Defaults to False. This forces the histogram to be computed.
         density (bool, optional):  Returns a probability density function,
                                    normalized such that the integral over the range is 1. Defaults to False.
+        var (str or list, optional): The variables of a Dataset. With a list a Dataset is returned,
+                                     with the histograms of all the variables computed with the same bins.
+        dim (str or list, optional): The dimensions over which the histogram is computed. Defaults to all.
+                                     The other dimensions are kept, e.g. to have one histogram per time step.
         loglevel (str, optional):  Logging level. Defaults to 'WARNING'.
 
     Raises:
         TypeError: If the input data is not an xarray DataArray.
 
     Returns:
-        xarray.DataArray: The histogram of the input data.
+        xarray.DataArray or xarray.Dataset: The histogram of the input data.
     """
 
     if isinstance(data, xr.Dataset):
-        data = data[list(data.data_vars.keys())[0]]
+        if var is None:
+            data = data[list(data.data_vars.keys())[0]]
+        elif isinstance(var, str):
+            data = data[var]
+        else:
+            data = data[to_list(var)]
     elif not isinstance(data, xr.DataArray):
         raise TypeError('Input data must be an xarray DataArray or Dataset')
 
     logger = log_configure(log_level=loglevel, log_name='Histogram')
 
     if units is not None:
-        data = convert_data_units(data, var=data.name, units=units, loglevel=loglevel)
+        if isinstance(data, xr.Dataset):
+            for name in data.data_vars:
+                data = convert_data_units(data, var=name, units=units, loglevel=loglevel)
+        else:
+            data = convert_data_units(data, var=data.name, units=units, loglevel=loglevel)
 
     logger.info('Computing histogram with the following parameters: bins={}, range={}'.format(bins, range))
 
+    edges = bin_edges(data, bins=bins, range=range)
+    dims = list(data.dims) if dim is None else to_list(dim)
     if weighted:
         logger.debug('Using latitudinal weights')
-        if 'lat' not in data.coords:
-            raise ValueError("DataArray must have a 'lat' coordinate for weighted histogram.")
-        weights = xr.ones_like(data)
-        weights = weights * weights.lat
-        weights = np.cos(np.radians(weights))
-    else:
-        weights = None
 
-    if dask and isinstance(data.data, da.Array):
-        logger.debug('Using Dask for histogram computation')
-        hist, edges = da.histogram(data, weights=weights, bins=bins, range=range, density=density)
-    else:
-        logger.debug('Using NumPy for histogram computation')
-        hist, edges = np.histogram(data, weights=weights, bins=bins, range=range, density=density)
-    
-    size_of_the_data = data.size
+    if isinstance(data, xr.Dataset):
+        hists = {name: _finalize(_histogram_array(field, edges, dims, weighted, dask), field, edges, dims,
+                                 check, density, logger)
+                 for name, field in data.data_vars.items()}
+        return xr.Dataset(hists)
 
-    if check and not density:
-        if isinstance(hist, da.Array):
-            hist = hist.compute()
-        if int(sum(hist)) != size_of_the_data:
-            logger.warning('Sum of counts in the histogram is not equal to the size of the data')
+    hist = _histogram_array(data, edges, dims, weighted, dask)
+    return _finalize(hist, data, edges, dims, check, density, logger)
 
-    center_of_bin = [ 0.5 * (edges[i] + edges[i+1]) for i in builtins.range(len(edges)-1)]
-    width_table = [ edges[i+1] - edges[i] for i in builtins.range(len(edges)-1)]
 
-    counts_per_bin = xr.DataArray(hist, coords=[center_of_bin], dims=["center_of_bin"])
-    counts_per_bin = counts_per_bin.assign_coords(width=("center_of_bin", width_table))
+def _finalize(hist: xr.DataArray, data: xr.DataArray, edges, dims, check, density, logger):
+    """Normalize the histogram and set its coordinates and metadata"""
+    size_of_the_data = int(np.prod([data.sizes[name] for name in dims if name in data.dims], dtype=int))
 
-    counts_per_bin.attrs = data.attrs
+    if check and not density:
+        hist = hist.compute()
+        if not np.all(hist.sum('center_of_bin').astype(int) == size_of_the_data):
+            logger.warning('Sum of counts in the histogram is not equal to the size of the data')
 
-    counts_per_bin.center_of_bin.attrs['units'] = data.units
+    width_table = xr.DataArray(np.diff(edges), dims='center_of_bin')
+    if density:
+        hist = hist / (hist.sum('center_of_bin') * width_table)
 
+    counts_per_bin = hist.assign_coords(center_of_bin=0.5 * (edges[:-1] + edges[1:]),
+                                        width=width_table)
+    counts_per_bin.attrs = dict(data.attrs)
+    if 'units' in data.attrs:
+        counts_per_bin.center_of_bin.attrs['units'] = data.units
     counts_per_bin.attrs['size_of_the_data'] = size_of_the_data
 
     if density:
@@ -90,4 +209,4 @@ def histogram(data: xr.DataArray, bins = 10, range = None, units = None,
         counts_per_bin.name = 'histogram'
         counts_per_bin.attrs['units'] = 'counts'
 
-    return counts_per_bin
\ No newline at end of file
+    return counts_per_bin
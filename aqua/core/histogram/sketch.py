@@ -0,0 +1,298 @@
+"""
+Mergeable sketches of the distribution of the data, to compute histograms and quantiles
+of long records chunk by chunk: the sketches of different chunks, workers or runs
+are merged by summing their counts, and can be stored to disk and merged later.
+"""
+import numpy as np
+import xarray as xr
+
+from aqua.core.logger import log_configure
+from .histogram import bin_edges, _histogram_array
+
+
+class HistogramSketch():
+    """
+    Histogram with fixed bins, plus an underflow and an overflow bin, so that no data is lost.
+    Bins are half-open, [lower, upper). The counts have a 'bin' dimension, whose 'bin_lower'
+    coordinate is the lower edge of each bin, and keep the dimensions not reduced by add().
+    Quantiles are interpolated linearly within the bins.
+
+    Args:
+        bins (int or sequence): The number of bins or the bin edges.
+        range (tuple, optional): The lower and upper range of the bins, required if bins is a number.
+        counts (xarray.DataArray or xarray.Dataset, optional): The counts of a sketch.
+        loglevel (str, optional): Logging level. Defaults to 'WARNING'.
+    """
+
+    def __init__(self, bins=100, range=None, counts=None, loglevel='WARNING'):
+        self.logger = log_configure(loglevel, 'HistogramSketch')
+        self.loglevel = loglevel
+        if np.isscalar(bins) and range is None:
+            raise ValueError('A mergeable sketch needs fixed bins, please provide the range or the bin edges')
+        self.edges = bin_edges(None, bins=bins, range=range)
+        self.counts = counts
+
+    @property
+    def params(self):
+        """The arguments defining the bins of the sketch"""
+        return {'bins': self.edges}
+
+    @property
+    def lower(self):
+        """The lower edge of each bin, -inf for the underflow bin"""
+        return np.concatenate([[-np.inf], self.edges])
+
+    @property
+    def upper(self):
+        """The upper edge of each bin, inf for the overflow bin"""
+        return np.concatenate([self.edges, [np.inf]])
+
+    def add(self, data: xr.DataArray | xr.Dataset, dim=None, weighted=False, split=None):
+        """
+        Add data to the sketch. With dask data the counts are lazy, reduced from the partial histograms of the chunks.
+
+        Args:
+            data (xarray.DataArray or xarray.Dataset): The data, with the same dimensions not reduced as the sketch.
+            dim (str or list, optional): The dimensions reduced by the sketch. Defaults to all.
+            weighted (bool, optional): Use latitudinal weights. Defaults to False.
+            split (str, optional): One of the reduced dimensions whose chunks are kept separate, giving the counts
+                                   of each chunk, e.g. of each time window with the data chunked by window.
+
+        Returns:
+            HistogramSketch: the sketch itself
+        """
+        dims = list(data.dims) if dim is None else [dim] if isinstance(dim, str) else list(dim)
+        edges = np.concatenate([[-np.inf], self.edges, [np.inf]])
+
+        def count(field):
+            counts = _histogram_array(field, edges, dims, weighted, True, split=split).rename(center_of_bin='bin')
+            counts = counts.assign_coords(bin_lower=('bin', self.lower))
+            counts.attrs = {name: value for name, value in field.attrs.items() if name in ['units', 'long_name']}
+            return counts.rename(field.name)
+
+        if isinstance(data, xr.Dataset):
+            counts = xr.Dataset({name: count(field) for name, field in data.data_vars.items()})
+        else:
+            counts = count(data)
+        self.counts = counts if self.counts is None else self._sum(self.counts, counts)
+        return self
+
+    @staticmethod
+    def _sum(first, second):
+        """Sum the counts of two sketches, which must have the same coordinates"""
+        first, second = xr.align(first, second, join='exact')
+        with xr.set_options(keep_attrs=True):
+            return first + second
+
+    def merge(self, other: 'HistogramSketch'):
+        """
+        Merge two sketches with the same bins.
+
+        Args:
+            other (HistogramSketch): the other sketch
+
+        Raises:
+            ValueError: If the sketches have different bins or coordinates.
+
+        Returns:
+            HistogramSketch: a new sketch with the counts of both
+        """
+        if type(other) is not type(self) or not np.array_equal(self.edges, other.edges):
+            raise ValueError('Only sketches of the same type and with the same bins can be merged')
+        if self.counts is None or other.counts is None:
+            counts = self.counts if other.counts is None else other.counts
+        else:
+            counts = self._sum(self.counts, other.counts)
+        return type(self)(**self.params, counts=counts, loglevel=self.loglevel)
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    def compute(self):
+        """Compute the counts of the sketch, returning the sketch itself"""
+        if self.counts is not None:
+            self.counts = self.counts.compute()
+        return self
+
+    def _interpolate(self, lower, upper, fraction):
+        """The value at a fraction of the counts of a bin"""
+        return lower + fraction * (upper - lower)
+
+    def _quantile(self, counts, q):
+        """Quantiles of the counts, with the bins on the last axis"""
+        cdf = np.cumsum(counts, axis=-1)
+        total = cdf[..., -1:]
+        target = q * total
+        # the first non-empty bin where the cumulative counts reach the target
+        below = (cdf[..., np.newaxis, :] < target[..., np.newaxis]) | (counts[..., np.newaxis, :] == 0)
+        index = np.argmin(below, axis=-1)
+        previous = np.take_along_axis(cdf - counts, index, axis=-1)
+        current = np.take_along_axis(counts, index, axis=-1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            fraction = np.clip(np.where(current > 0, (target - previous) / current, 0), 0, 1)
+            lower, upper = self.lower[index], self.upper[index]
+            # data outside the edges are estimated with the closest edge
+            lower, upper = np.where(np.isinf(lower), upper, lower), np.where(np.isinf(upper), lower, upper)
+            values = self._interpolate(lower, upper, fraction)
+        return np.where(total > 0, values, np.nan)
+
+    def quantile(self, q):
+        """
+        Estimate quantiles from the sketch.
+
+        Args:
+            q (float or list): The quantiles, between 0 and 1.
+
+        Returns:
+            xarray.DataArray or xarray.Dataset: The quantiles, with a 'quantile' dimension.
+        """
+        if self.counts is None:
+            raise ValueError('The sketch is empty, please add data first')
+        scalar = np.isscalar(q)
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        if np.any((q < 0) | (q > 1)):
+            raise ValueError('Quantiles must be between 0 and 1')
+
+        out = xr.apply_ufunc(self._quantile, self.counts.drop_vars('bin_lower'), kwargs={'q': q},
+                             input_core_dims=[['bin']], output_core_dims=[['quantile']],
+                             dask='parallelized', output_dtypes=[float],
+                             dask_gufunc_kwargs={'output_sizes': {'quantile': q.size}, 'allow_rechunk': True}, keep_attrs=True)
+        out = out.assign_coords(quantile=q)
+        return out.squeeze('quantile', drop=False) if scalar else out
+
+    def to_histogram(self, density=False):
+        """
+        The histogram of the sketch between its edges, as returned by the histogram function.
+
+        Args:
+            density (bool, optional): Return a probability density function. Defaults to False.
+
+        Returns:
+            xarray.DataArray or xarray.Dataset: The histogram, with the 'center_of_bin' and 'width' coordinates.
+        """
+        hist = self.counts.isel(bin=slice(1, -1)).drop_vars('bin_lower').rename(bin='center_of_bin')
+        width = xr.DataArray(np.diff(self.edges), dims='center_of_bin')
+        with xr.set_options(keep_attrs=True):
+            if density:
+                hist = hist / (self.counts.sum('bin') * width)
+        return hist.assign_coords(center_of_bin=0.5 * (self.edges[:-1] + self.edges[1:]), width=width)
+
+    def to_dataset(self):
+        """The sketch as a Dataset, with its parameters in the attributes"""
+        if self.counts is None:
+            raise ValueError('The sketch is empty, please add data first')
+        if isinstance(self.counts, xr.DataArray):
+            data = self.counts.to_dataset(name=self.counts.name or 'counts')
+            data.attrs['AQUA_sketch_dataarray'] = str(self.counts.name or 'counts')
+        else:
+            data = self.counts.copy()
+        data.attrs['AQUA_sketch'] = type(self).__name__
+        for name, value in self.params.items():
+            # attributes must be serializable by both netCDF and Zarr
+            data.attrs[f'AQUA_sketch_{name}'] = int(value) if isinstance(value, bool) else np.asarray(value).tolist()
+        return data
+
+    def save(self, filename: str):
+        """
+        Store the sketch, as a Zarr store if the filename ends with .zarr, as a netCDF file otherwise.
+
+        Args:
+            filename (str): the output file
+        """
+        data = self.to_dataset()
+        if filename.endswith('.zarr'):
+            data.to_zarr(filename, mode='w')
+        else:
+            data.to_netcdf(filename)
+        self.logger.info('Sketch saved to %s', filename)
+
+    @staticmethod
+    def from_dataset(data: xr.Dataset, loglevel='WARNING'):
+        """
+        Restore a sketch from a Dataset produced by to_dataset().
+
+        Args:
+            data (xarray.Dataset): the Dataset
+            loglevel (str, optional): Logging level. Defaults to 'WARNING'.
+
+        Returns:
+            HistogramSketch or QuantileSketch: the sketch
+        """
+        attrs = dict(data.attrs)
+        kind = attrs.pop('AQUA_sketch', None)
+        classes = {cls.__name__: cls for cls in [HistogramSketch, QuantileSketch]}
+        if kind not in classes:
+            raise ValueError('The Dataset does not contain an AQUA sketch')
+        name = attrs.pop('AQUA_sketch_dataarray', None)
+        params = {key[len('AQUA_sketch_'):]: attrs.pop(key) for key in list(attrs) if key.startswith('AQUA_sketch_')}
+        if name:
+            counts = data[name].rename(None) if name == 'counts' else data[name]
+        else:
+            counts = data.copy()
+            counts.attrs = attrs
+        return classes[kind](**params, counts=counts, loglevel=loglevel)
+
+    @staticmethod
+    def load(filename: str, loglevel='WARNING'):
+        """
+        Read a sketch stored with save().
+
+        Args:
+            filename (str): the sketch file
+            loglevel (str, optional): Logging level. Defaults to 'WARNING'.
+
+        Returns:
+            HistogramSketch or QuantileSketch: the sketch
+        """
+        data = xr.open_zarr(filename) if filename.endswith('.zarr') else xr.open_dataset(filename)
+        return HistogramSketch.from_dataset(data, loglevel=loglevel)
+
+
+class QuantileSketch(HistogramSketch):
+    """
+    Sketch for quantiles with a relative accuracy, with logarithmic bins in the DDSketch fashion:
+    the edges grow by a factor gamma = (1 + alpha) / (1 - alpha), so that the estimate of any quantile
+    between min_value and max_value in absolute value is within a relative error alpha.
+    Values smaller than min_value in absolute value are collected in a single bin around zero,
+    where the error is at most min_value, and values larger than max_value are estimated as max_value.
+    The number of bins, and so the size of the counts, is about log(max_value / min_value) / (2 * alpha)
+    for each sign: the defaults give about 350 bins per sign, 700 in total.
+
+    Args:
+        relative_accuracy (float, optional): The relative accuracy alpha of the quantiles. Defaults to 0.02.
+        min_value (float, optional): The smallest absolute value resolved. Defaults to 1e-3.
+        max_value (float, optional): The largest absolute value resolved. Defaults to 1e3.
+        signed (bool, optional): Resolve negative values too. Defaults to True.
+        counts (xarray.DataArray or xarray.Dataset, optional): The counts of a sketch.
+        loglevel (str, optional): Logging level. Defaults to 'WARNING'.
+    """
+
+    def __init__(self, relative_accuracy=0.02, min_value=1e-3, max_value=1e3, signed=True,
+                 counts=None, loglevel='WARNING'):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('The relative accuracy must be between 0 and 1')
+        if not 0 < min_value < max_value:
+            raise ValueError('The values must satisfy 0 < min_value < max_value')
+        self.relative_accuracy = float(relative_accuracy)
+        self.min_value = float(min_value)
+        self.max_value = float(max_value)
+        self.signed = bool(signed)
+
+        gamma = (1 + self.relative_accuracy) / (1 - self.relative_accuracy)
+        nbins = int(np.ceil(np.log(self.max_value / self.min_value) / np.log(gamma)))
+        positive = self.min_value * gamma**np.arange(nbins + 1)
+        edges = np.concatenate([-positive[::-1], positive]) if self.signed else np.concatenate([[0.], positive])
+        super().__init__(bins=edges, counts=counts, loglevel=loglevel)
+        self.logger.debug('QuantileSketch with relative accuracy %g between %g and %g: %d bins',
+                          self.relative_accuracy, self.min_value, self.max_value, self.edges.size + 1)
+
+    @property
+    def params(self):
+        """The arguments defining the bins of the sketch"""
+        return {'relative_accuracy': self.relative_accuracy, 'min_value': self.min_value,
+                'max_value': self.max_value, 'signed': self.signed}
+
+    def _interpolate(self, lower, upper, fraction):
+        """The value of the bin minimizing the relative error, linear interpolation in the bin around zero"""
+        return np.where(lower * upper > 0, 2 * lower * upper / (lower + upper),
+                        lower + fraction * (upper - lower))
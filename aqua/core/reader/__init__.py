@@ -1,7 +1,8 @@
 """Reader module."""
 from .reader import Reader
 from .streaming import Streaming
+from .chunk_iterator import ChunkIterator
 from .trender import Trender
 from .catalog import show_catalog_content
 
-__all__ = ["Reader", "Streaming", "Trender", "show_catalog_content"]
+__all__ = ["Reader", "Streaming", "ChunkIterator", "Trender", "show_catalog_content"]
@@ -0,0 +1,169 @@
+"""
+Iterator over the time windows of a dataset, loading the following windows in the background.
+"""
+
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from aqua.core.logger import log_configure
+from aqua.core.tracing import trace_span
+from .streaming import Streaming
+
+
+class ChunkIterator():
+    """
+    Iterate over consecutive time windows of a dataset, yielding loaded chunks.
+    The windows are computed once at creation, and the following `prefetch` windows
+    are loaded in background threads while the current one is processed.
+    Both the iterator and the async iterator protocols are supported.
+
+    The position of the next window can be stored in a JSON checkpoint file:
+    a window is considered processed when the following one is requested,
+    so that an interrupted run restarts from the first unprocessed window.
+
+    Args:
+        data (xr.Dataset or xr.DataArray): the lazy data to be iterated
+        aggregation (str, optional): the window length in pandas style (e.g. 'monthly', '7D') or in
+                                     number of time steps (e.g. '24S'). Defaults to 'S' (one time step).
+        startdate (str, optional): the first date to be iterated. Defaults to the first date of data.
+        enddate (str, optional): the last date to be iterated. Defaults to the last date of data.
+        prefetch (int, optional): the number of windows loaded in advance. 0 disables prefetching. Defaults to 1.
+        start (int, optional): the index of the first window to be yielded. Defaults to 0.
+        checkpoint (str, optional): JSON file where the position is stored, and read from if existing.
+        load (bool, optional): load the chunks in memory. If False, lazy chunks are yielded. Defaults to True.
+        loglevel (str, optional): the log level. Defaults to 'WARNING'.
+
+    Attributes:
+        windows (list): the (first, last) dates of each window
+        position (int): the index of the next window to be yielded
+    """
+
+    def __init__(self, data, aggregation=None, startdate=None, enddate=None,
+                 prefetch=1, start=0, checkpoint=None, load=True, loglevel='WARNING'):
+
+        self.logger = log_configure(loglevel, 'ChunkIterator')
+        if prefetch < 0:
+            raise ValueError(f'prefetch must be a non-negative integer, got {prefetch}')
+
+        self.data = data
+        self.prefetch = prefetch
+        self.load = load
+        self.checkpoint = checkpoint
+
+        timechunks = Streaming(aggregation=aggregation, startdate=startdate,
+                               enddate=enddate).stream_chunk(data)
+        # empty resampling bins (gaps in the data) are dropped
+        self.windows = [(first, last) for first, last in zip(np.asarray(timechunks.first()),
+                                                             np.asarray(timechunks.last()))
+                        if not np.isnat(first)]
+        self.logger.info('%d windows to be iterated', len(self.windows))
+
+        self.position = start
+        if checkpoint and os.path.exists(checkpoint):
+            self.position = self._read_checkpoint(checkpoint)
+
+        self._executor = ThreadPoolExecutor(max_workers=prefetch) if prefetch else None
+        self._pending = {}
+
+    def __len__(self):
+        return len(self.windows)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.position > 0:
+            # the previous window has been processed by the caller
+            self._write_checkpoint()
+        if self.position >= len(self.windows):
+            self.close()
+            raise StopIteration
+
+        index = self.position
+        future = self._pending.pop(index, None)
+        self._schedule(index + 1)
+        chunk = future.result() if future is not None else self._get(index)
+        self.position += 1
+        return chunk
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await asyncio.get_running_loop().run_in_executor(None, self._next_or_none)
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
+
+    def _next_or_none(self):
+        """StopIteration cannot cross an executor, return None instead"""
+        try:
+            return next(self)
+        except StopIteration:
+            return None
+
+    def _schedule(self, first):
+        """Submit the loading of the next prefetch windows"""
+        if self._executor is None:
+            return
+        for index in range(first, min(first + self.prefetch, len(self.windows))):
+            if index not in self._pending:
+                self._pending[index] = self._executor.submit(self._get, index)
+
+    def _get(self, index):
+        """Select and possibly load a window"""
+        date1, date2 = self.windows[index]
+        chunk = self.data.sel(time=slice(date1, date2))
+        if self.load:
+            with trace_span('load_chunk', index=index) as span:
+                chunk = chunk.load()
+                span.set(chunk)
+        self.logger.debug('Window %d from %s to %s ready', index, date1, date2)
+        return chunk
+
+    def state(self):
+        """
+        The position of the iterator, to be stored and passed as start to resume it.
+
+        Returns:
+            dict: the position and the first date of the corresponding window
+        """
+        state = {'position': self.position, 'nwindows': len(self.windows)}
+        if self.position < len(self.windows):
+            state['date'] = str(self.windows[self.position][0])
+        return state
+
+    def _write_checkpoint(self):
+        """Store the position in the checkpoint file"""
+        if not self.checkpoint:
+            return
+        tmpfile = f'{self.checkpoint}.tmp'
+        with open(tmpfile, 'w', encoding='utf-8') as f:
+            json.dump(self.state(), f)
+        os.replace(tmpfile, self.checkpoint)
+
+    def _read_checkpoint(self, checkpoint):
+        """Read the position from the checkpoint file, checking it matches the windows"""
+        with open(checkpoint, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        position = state.get('position', 0)
+        if state.get('nwindows') != len(self.windows):
+            raise ValueError(f'Checkpoint {checkpoint} has {state.get("nwindows")} windows, '
+                             f'while {len(self.windows)} are expected')
+        if 'date' in state and str(self.windows[position][0]) != state['date']:
+            raise ValueError(f'Checkpoint {checkpoint} position {position} starts at {state["date"]}, '
+                             f'while the window starts at {self.windows[position][0]}')
+        self.logger.info('Resuming from window %d of %d', position, len(self.windows))
+        return position
+
+    def close(self):
+        """Stop the background loading"""
+        if self._executor is not None:
+            for future in self._pending.values():
+                future.cancel()
+            self._pending = {}
+            self._executor.shutdown(wait=False)
+            self._executor = None
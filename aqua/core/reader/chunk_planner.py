@@ -0,0 +1,170 @@
+"""
+Automatic selection of the chunking used by the Reader.
+
+Given the sizes and data types of a source, the time and vertical chunking
+are chosen so that each chunk is close to a target size in bytes,
+by default the dask 'array.chunk-size' configuration (128MiB).
+Horizontal dimensions are never chunked, since most AQUA operations
+(regridding, field statistics) need the full horizontal field.
+"""
+
+import math
+import dask
+import numpy as np
+import pandas as pd
+from aqua.core.util import find_vert_coord
+from aqua.core.logger import log_configure
+
+# GSV time chunking options and their duration
+GSV_FREQUENCIES = {'10M': '10min', '15M': '15min', '30M': '30min', 'h': '1h', '3h': '3h',
+                   '6h': '6h', 'D': '1D', '5D': '5D', 'W': '7D', 'M': '31D', 'Y': '366D'}
+
+
+class ChunkPlan():
+    """
+    The chunking chosen for a source.
+
+    Attributes:
+        time (int): number of time steps per chunk
+        vertical (int): number of vertical levels per chunk, None if not chunked
+        time_dim (str): name of the time dimension
+        vertical_dim (str): name of the vertical dimension, None if absent
+        gsv_time (str): the GSV time chunking matching the planned time steps, None if not planned for GSV
+        chunk_bytes (int): size in bytes of the largest chunk
+        nchunks (int): total number of chunks over all variables
+    """
+
+    def __init__(self, time, vertical, time_dim, vertical_dim, gsv_time, chunk_bytes, nchunks):
+        self.time = time
+        self.vertical = vertical
+        self.time_dim = time_dim
+        self.vertical_dim = vertical_dim
+        self.gsv_time = gsv_time
+        self.chunk_bytes = chunk_bytes
+        self.nchunks = nchunks
+
+    @property
+    def xarray_chunks(self):
+        """The chunks to be passed to xarray"""
+        chunks = {self.time_dim: self.time}
+        if self.vertical_dim:
+            chunks[self.vertical_dim] = self.vertical if self.vertical else -1
+        return chunks
+
+    @property
+    def gsv_chunks(self):
+        """The chunks to be passed to a GSV source, None if the plan is not for GSV"""
+        if self.gsv_time is None:
+            return None
+        chunks = {'time': self.gsv_time}
+        if self.vertical:
+            chunks['vertical'] = self.vertical
+        return chunks
+
+    def report(self):
+        """A short human readable description of the plan"""
+        gsv = f' (GSV {self.gsv_chunks})' if self.gsv_time else ''
+        return (f'{self.xarray_chunks}{gsv}: {self.nchunks} chunks '
+                f'of at most {self.chunk_bytes / 2**20:.1f} MiB')
+
+    def __repr__(self):
+        return f'ChunkPlan({self.report()})'
+
+
+def plan_chunks(data, target_bytes=None, gsv=False, loglevel='WARNING'):
+    """
+    Plan time and vertical chunking of a dataset for a target chunk size.
+    Only the metadata of the dataset are used, no data is loaded.
+
+    Args:
+        data (xarray.Dataset): the lazily opened source
+        target_bytes (int or str, optional): the target chunk size, e.g. '256MiB'.
+                                             Defaults to the dask 'array.chunk-size' configuration.
+        gsv (bool, optional): plan for a GSV source. The time chunk is then the number of
+                              steps of the longest GSV chunking fitting the target,
+                              so that the xarray and the GSV chunking agree. Defaults to False.
+        loglevel (str, optional): the log level
+
+    Returns:
+        ChunkPlan: the planned chunking
+
+    Raises:
+        ValueError: if the dataset has no time dimension
+    """
+    logger = log_configure(loglevel, 'plan_chunks')
+
+    if target_bytes is None:
+        target_bytes = dask.config.get('array.chunk-size')
+    if isinstance(target_bytes, str):
+        target_bytes = dask.utils.parse_bytes(target_bytes)
+
+    time_dim = 'time'
+    if time_dim not in data.dims:
+        raise ValueError('Cannot plan chunks for a dataset without a time dimension')
+
+    vertical = [dim for dim in ['level', *find_vert_coord(data)] if dim in data.dims]
+    vertical_dim = vertical[0] if vertical else None
+
+    # the largest variable in a time step drives the chunking
+    field_bytes = 1
+    nlev = 1
+    for name in data.data_vars:
+        var = data[name]
+        if time_dim not in var.dims:
+            continue
+        size = var.dtype.itemsize * math.prod(var.sizes[dim] for dim in var.dims
+                                               if dim not in [time_dim, vertical_dim])
+        levels = var.sizes.get(vertical_dim, 1)
+        if size * levels > field_bytes * nlev:
+            field_bytes = max(size, 1)
+            nlev = levels
+
+    ntime = data.sizes[time_dim]
+    if field_bytes * nlev <= target_bytes:
+        nvert = None
+        tchunk = int(min(ntime, max(1, target_bytes // (field_bytes * nlev))))
+    else:
+        nvert = int(max(1, target_bytes // field_bytes))
+        tchunk = 1
+
+    # align with the chunking on disk, if any
+    preferred = _preferred_time_chunk(data, time_dim)
+    if preferred and preferred < tchunk < ntime:
+        tchunk = tchunk // preferred * preferred
+
+    gsv_time = None
+    if gsv:
+        gsv_time, tchunk = _gsv_frequency(data[time_dim], tchunk)
+    chunk_bytes = field_bytes * (nvert or nlev) * tchunk
+    nvars = sum(1 for name in data.data_vars if time_dim in data[name].dims)
+    nchunks = nvars * math.ceil(ntime / tchunk) * (math.ceil(nlev / nvert) if nvert else 1)
+
+    plan = ChunkPlan(tchunk, nvert, time_dim, vertical_dim, gsv_time, chunk_bytes, nchunks)
+    logger.info('Planned chunks for a target of %.1f MiB: %s', target_bytes / 2**20, plan.report())
+    return plan
+
+
+def _preferred_time_chunk(data, time_dim):
+    """Time chunk of the files on disk, if available"""
+    for name in data.data_vars:
+        preferred = data[name].encoding.get('preferred_chunks', {}).get(time_dim)
+        if preferred:
+            return preferred
+    return None
+
+
+def _gsv_frequency(time, tchunk):
+    """
+    The longest GSV chunking frequency spanning at most tchunk time steps,
+    and the number of time steps of its chunks (the longest month or year for 'M' and 'Y')
+    """
+    if time.size < 2 or not np.issubdtype(time.dtype, np.datetime64):
+        return 'S', 1
+    step = pd.Timedelta(time.values[1] - time.values[0])
+    span = step * tchunk
+    best, nsteps = 'S', 1
+    for freq, duration in GSV_FREQUENCIES.items():
+        duration = pd.Timedelta(duration)
+        if step <= duration <= span:
+            best, nsteps = freq, int(duration // step)
+    return best, nsteps
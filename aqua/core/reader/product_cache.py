@@ -0,0 +1,262 @@
+"""
+Cache of the intermediate products (time and field statistics) computed by the Reader,
+shared by the Readers pointing to the same directory, e.g. the tools of an aqua analysis run.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import dask
+import dask.array as da
+import xarray as xr
+from dask import is_dask_collection
+from dask.base import tokenize
+from dask.utils import key_split
+
+from aqua.core.logger import log_configure
+from aqua.core.version import __version__ as aqua_version
+
+# name of the variable of a cached DataArray without name
+DATAARRAY_NAME = '__xarray_dataarray_variable__'
+
+# graph layers selecting or rechunking an array without changing its values
+SELECTION_LAYERS = ('getitem', 'rechunk-merge', 'rechunk-split', 'rechunk-p2p')
+
+
+def _variables(data):
+    """The data variables of a Dataset or DataArray"""
+    if isinstance(data, xr.DataArray):
+        return [data.variable]
+    return list(data.data_vars.values())
+
+
+def graph_names(data):
+    """
+    The names of the dask graphs of the data variables.
+
+    Args:
+        data (xr.Dataset or xr.DataArray): the data
+
+    Returns:
+        set: the names
+    """
+    return {var.data.name for var in _variables(data) if isinstance(var.data, da.Array)}
+
+
+def unmodified(data, names):
+    """
+    Whether the values of the lazy data variables are the ones of the arrays with the given names,
+    possibly selected or rechunked: any arithmetic adds other layers to the graph.
+    Variables in memory are always accepted, since their values are part of the data token.
+
+    Args:
+        data (xr.Dataset or xr.DataArray): the data
+        names (set): the names of the dask graphs of the original arrays, e.g. as retrieved
+
+    Returns:
+        bool: True if the data are unmodified
+    """
+    for var in _variables(data):
+        if not isinstance(var.data, da.Array):
+            continue
+        name = var.data.name
+        dependencies = var.data.dask.dependencies
+        while name not in names:
+            if key_split(name) not in SELECTION_LAYERS or len(dependencies.get(name, ())) != 1:
+                return False
+            name = next(iter(dependencies[name]))
+    return True
+
+
+def data_token(data):
+    """
+    A token describing the data without computing it: the name, dimensions, shape, type and units
+    of the variables and the values of the index coordinates, i.e. the time range and the selection.
+    Unlike the names of the dask graphs, it does not depend on the chunks or on how the data were opened,
+    so that it is the same in every process, but it does not see the arithmetic done on lazy values:
+    use it only for data passing unmodified(). The values of the variables in memory are included.
+    Other attributes are excluded, since they contain the retrieval time in the history.
+
+    Args:
+        data (xr.Dataset or xr.DataArray): the data
+
+    Returns:
+        str: the token
+    """
+    if isinstance(data, xr.DataArray):
+        data = data.to_dataset(name=data.name or DATAARRAY_NAME)
+    variables = [(str(name), var.dims, var.shape, str(var.dtype), str(var.attrs.get('units')),
+                  None if is_dask_collection(var.data) else tokenize(var.values))
+                 for name, var in sorted(data.data_vars.items(), key=lambda item: str(item[0]))]
+    indexes = [(str(name), tokenize(index.values)) for name, index in sorted(data.indexes.items(), key=lambda item: str(item[0]))]
+    return tokenize(type(data).__name__, variables, indexes)
+
+
+def config_token(paths):
+    """
+    A token of the configuration files, changing when any of them is modified.
+
+    Args:
+        paths (list): files or folders, whose YAML files are included
+
+    Returns:
+        str: the token
+    """
+    stamps = []
+    for path in paths:
+        if not path:
+            continue
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path)
+                           for name in names if name.endswith(('.yaml', '.yml')))
+        for filename in files:
+            if os.path.exists(filename):
+                stat = os.stat(filename)
+                stamps.append((filename, stat.st_mtime_ns, stat.st_size))
+    return tokenize(stamps)
+
+
+def _after_write(block, written):
+    """A block of a product, returned once the product has been written to the cache"""
+    return block
+
+
+class ProductCache():
+    """
+    Store the products of the Reader operations as compressed Zarr stores, named after
+    a hash of the AQUA version, the configuration, the source of the data, the operation with its parameters
+    and the input data token. A later request with the same key reads the stored product.
+    Lazy products are stored the first time they are computed, as a whole, in the same computation.
+    Stores are written to a temporary folder and renamed, so that concurrent writers
+    never leave a partial product.
+
+    Args:
+        directory (str): the folder of the cached products
+        config_files (list, optional): files or folders of the configuration invalidating the cache
+        loglevel (str, optional): the log level. Defaults to 'WARNING'.
+    """
+
+    def __init__(self, directory, config_files=None, loglevel='WARNING'):
+        self.logger = log_configure(loglevel, 'ProductCache')
+        self.directory = os.path.expandvars(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.config = config_token(config_files or [])
+
+    def key(self, data, operation, origin=None, **params):
+        """
+        The key of an operation applied to data.
+
+        Args:
+            data (xr.Dataset or xr.DataArray): the input data
+            operation (str): the operation name
+            origin (dict, optional): the source of the data and the settings of the Reader producing them,
+                                     which must be JSON serializable
+            **params: the parameters of the operation, which must be JSON serializable
+
+        Returns:
+            str: the key, None if the parameters cannot be serialized
+        """
+        try:
+            request = json.dumps(params, sort_keys=True)
+            source = json.dumps(origin or {}, sort_keys=True)
+        except TypeError:
+            self.logger.debug('Parameters of %s cannot be cached: %s', operation, params)
+            return None
+        digest = hashlib.sha256()
+        for part in [aqua_version, self.config, source, operation, request, data_token(data)]:
+            digest.update(part.encode())
+        return f'{operation}-{digest.hexdigest()[:32]}'
+
+    def path(self, key):
+        """The Zarr store of a key"""
+        return os.path.join(self.directory, f'{key}.zarr')
+
+    def get(self, key):
+        """
+        Read a cached product.
+
+        Args:
+            key (str): the product key
+
+        Returns:
+            xr.Dataset or xr.DataArray: the lazy product, None if not cached
+        """
+        path = self.path(key)
+        if not os.path.exists(path):
+            return None
+        self.logger.info('Reading cached product %s', key)
+        return self._restore(xr.open_zarr(path, consolidated=True))
+
+    def put(self, key, data):
+        """
+        Store a product. A lazy product is returned still lazy, and stored the first time it is computed:
+        computing any part of it computes the whole product, which is written in the same computation.
+        An eager product is stored immediately.
+
+        Args:
+            key (str): the product key
+            data (xr.Dataset or xr.DataArray): the product
+
+        Returns:
+            xr.Dataset or xr.DataArray: the product
+        """
+        if not is_dask_collection(data):
+            self._write(data, key)
+            return data
+
+        written = da.from_delayed(dask.delayed(self._write, pure=False)(data, key), shape=(), dtype=bool)
+
+        def lazy(var):
+            if not isinstance(var.data, da.Array):
+                return var
+            return var.copy(data=da.map_blocks(_after_write, var.data, written, dtype=var.dtype))
+
+        if isinstance(data, xr.DataArray):
+            return lazy(data)
+        return data.assign({name: lazy(var) for name, var in data.data_vars.items()})
+
+    def _write(self, data, key):
+        """
+        Write a computed product to its Zarr store, unless it is already there.
+
+        Returns:
+            bool: True if the product is in the cache
+        """
+        path = self.path(key)
+        if os.path.exists(path):
+            return True
+        tmppath = f'{path}.{uuid.uuid4().hex}.tmp'
+
+        store = data.to_dataset(name=data.name or DATAARRAY_NAME) if isinstance(data, xr.DataArray) else data
+        # the encoding of the source files may not be valid for Zarr
+        store = store.copy()
+        for var in store.variables.values():
+            var.encoding = {}
+        if isinstance(data, xr.DataArray):
+            store.attrs['AQUA_cache_dataarray'] = str(data.name or DATAARRAY_NAME)
+
+        self.logger.info('Storing product %s', key)
+        try:
+            store.to_zarr(tmppath, mode='w', consolidated=True)
+            os.rename(tmppath, path)
+        except OSError as err:  # written in the meantime by another process, or not writable
+            self.logger.debug('Product %s not stored: %s', key, err)
+            shutil.rmtree(tmppath, ignore_errors=True)
+        return os.path.exists(path)
+
+    @staticmethod
+    def _restore(store):
+        """Turn a stored product back into its original type"""
+        name = store.attrs.pop('AQUA_cache_dataarray', None)
+        if name is None:
+            return store
+        data = store[name]
+        return data.rename(None) if name == DATAARRAY_NAME else data
+
+    def clear(self):
+        """Remove all the cached products"""
+        shutil.rmtree(self.directory, ignore_errors=True)
@@ -12,16 +12,17 @@ from metpy.units import units
 
 from smmregrid import GridInspector
 
-from aqua.core.util import load_multi_yaml, files_exist, to_list, find_vert_coord
+from aqua.core.util import load_multi_yaml, files_exist, to_list, find_vert_coord, warm_units_cache
 from aqua.core.configurer import ConfigPath
 from aqua.core.logger import log_configure, log_history
+from aqua.core.tracing import trace_span, configure_tracing
 from aqua.core.exceptions import NoDataError, NoRegridError
 from aqua.core.version import __version__ as aqua_version
 from aqua.core.regridder import Regridder
 from aqua.core.fldstat import FldStat
 from aqua.core.timstat import TimStat
 from aqua.core.fixer import Fixer
-from aqua.core.data_model import DataModel, counter_reverse_coordinate
+from aqua.core.data_model import DataModel, counter_reverse_coordinate, apply_pending_flip
 from aqua.core.histogram import histogram
 import aqua.core.gsv
 
@@ -29,6 +30,9 @@ from .streaming import Streaming
 from .trender import Trender
 
 from .reader_utils import set_attrs
+from .chunk_planner import plan_chunks
+from .chunk_iterator import ChunkIterator
+from .product_cache import ProductCache, graph_names, unmodified
 
 # set default options for xarray
 xr.set_options(keep_attrs=True)
@@ -51,8 +55,8 @@ class Reader():
                  rebuild=False, loglevel=None, nproc=4,
                  aggregation=None, chunks=None,
                  preproc=None, convention='eccodes',
-                 engine='fdb',
-                 **kwargs):
+                 engine='fdb', decumulation_state=None, deferred_units=False, lazy_flip=False,
+                 product_cache=None, healpix_native=False, **kwargs):
         """
         Initializes the Reader class, which uses the catalog
         `config/config.yaml` to identify the required data.
@@ -84,10 +88,28 @@ class Reader():
                                             If it is a dictionary the keys 'time' and 'vertical' are looked for.
                                             Time chunking can be one of S (step), 10M, 15M, 30M, h, 1h, 3h, 6h, D, 5D, W, M, Y.
                                             Vertical chunking is expressed as the number of vertical levels to be used.
+                                            If 'auto', time and vertical chunking are planned to match the dask
+                                            'array.chunk-size' configuration (see `Reader.plan_chunks`).
             preproc (function, optional): a function to be applied to the dataset when retrieved. Defaults to None.
             convention (str, optional): convention to be used for reading data. Defaults to 'eccodes'.
                                         (Only one supported so far)
             engine (str, optional): Engine to be used for GSV retrieval: 'polytope' or 'fdb'. Defaults to 'fdb'.
+            decumulation_state (bool or str, optional): carry the last accumulated fields across consecutive
+                                                        retrievals, so that data retrieved in pieces are decumulated
+                                                        exactly. If a filename, the state is persisted to NetCDF.
+                                                        Defaults to None.
+            deferred_units (bool, optional): do not apply unit conversions at retrieve, but after the first regrid,
+                                             field mean or time mean, where they are applied to the smaller output
+                                             by linearity. Other operations apply them before. Defaults to False.
+            lazy_flip (bool, optional): do not reorder the data when the data model flips a coordinate (e.g. latitude).
+                                        Regridding and field statistics use the native order and the flip is applied
+                                        to the output of time statistics or with apply_pending_flip. Defaults to False.
+            product_cache (str, optional): folder where the outputs of time and field statistics are stored as Zarr
+                                           and read back by any Reader asking for the same product.
+                                           Defaults to the AQUA_PRODUCT_CACHE environment variable, if set.
+            healpix_native (bool, optional): field statistics on full HEALPix grids use the equal area of the cells
+                                             and select regions from the pixel centres of the grid, instead of
+                                             the area files and coordinate masks of generic grids. Defaults to False.
 
         Keyword Args: 
             zoom (int, optional): HEALPix grid zoom level (e.g. zoom=10 is h1024). Allows for multiple gridname definitions.
@@ -115,6 +137,8 @@ class Reader():
         self.time_correction = False  # extra flag for correction data with cumulation time on monthly timescale
         self.aggregation = aggregation
         self.chunks = chunks
+        self.deferred_units = deferred_units
+        self.flip_coords = 'lazy' if lazy_flip else True
 
         # Preprocessing function
         self.preproc = preproc
@@ -144,22 +168,25 @@ class Reader():
 
         # define configuration file and paths
         configurer = ConfigPath(catalog=catalog, loglevel=loglevel)
-        self.configdir = configurer.configdir
-        self.machine = configurer.get_machine()
-        self.config_file = configurer.config_file
-        self.cat, self.catalog_file, self.machine_file = configurer.deliver_intake_catalog(
-            catalog=catalog, model=model, exp=exp, source=source)
-        self.fixer_folder, self.grids_folder = configurer.get_reader_filenames()
-
-        # deduce catalog name
-        self.catalog = self.cat.name
-
-        # machine dependent catalog path
-        machine_paths, intake_vars = configurer.get_machine_info()
-
-        # load the catalog
-        aqua.core.gsv.GSVSource.first_run = True  # Hack needed to avoid double checking of paths (which would not work if on another machine using polytope)
-        self.expcat = self.cat(**intake_vars)[self.model][self.exp]  # the top-level experiment entry
+        configure_tracing((configurer.config_dict.get('options') or {}).get('trace'),
+                          loglevel=self.loglevel)
+        with trace_span('catalog', model=model, exp=exp, source=source):
+            self.configdir = configurer.configdir
+            self.machine = configurer.get_machine()
+            self.config_file = configurer.config_file
+            self.cat, self.catalog_file, self.machine_file = configurer.deliver_intake_catalog(
+                catalog=catalog, model=model, exp=exp, source=source)
+            self.fixer_folder, self.grids_folder = configurer.get_reader_filenames()
+
+            # deduce catalog name
+            self.catalog = self.cat.name
+
+            # machine dependent catalog path
+            machine_paths, intake_vars = configurer.get_machine_info()
+
+            # load the catalog
+            aqua.core.gsv.GSVSource.first_run = True  # Hack needed to avoid double checking of paths (which would not work if on another machine using polytope)
+            self.expcat = self.cat(**intake_vars)[self.model][self.exp]  # the top-level experiment entry
 
         # check machine compatibility
         self.machine_from_catalog = self.expcat.metadata.get('machine')
@@ -184,8 +211,18 @@ class Reader():
             if not files_exist(self.esmcat.urlpath):
                 raise NoDataError(f"No NetCDF files available for {self.model} {self.exp} {self.source}, please check the urlpath: {self.esmcat.urlpath}")  # noqa E501
 
+        # Automatic chunking: the chunks are planned from the metadata of the source and passed to it,
+        # so that the data are opened with them. GSV sources are planned from a single time step.
+        if self.chunks == 'auto':
+            self.chunks = self._auto_chunks()
+            if self.chunks is not None:
+                self.kwargs['chunks'] = self.chunks
+                self.esmcat = self.expcat[self.source](**self.kwargs)
+
         # extend the unit registry
         units_extra_definition()
+        # convert the most common units pairs once, later conversions are taken from the cache
+        warm_units_cache()
         # Get fixes dictionary and find them
         self.fix = fix  # fix activation flag
         self.fixer_name = self.esmcat.metadata.get('fixer_name', None)
@@ -205,6 +242,7 @@ class Reader():
                                convention=self.convention,
                                fixes_dictionary=self.fixes_dictionary,
                                metadata=self.esmcat.metadata,
+                               decumulation_state=decumulation_state,
                                loglevel=self.loglevel)
         
         # if data model is not passed to Reader, try to get it from the catalog source metadata
@@ -233,7 +271,8 @@ class Reader():
         cell_area = self.src_grid_area.cell_area if areas else None
         self.src_fldstat = FldStat(
             cell_area, grid_name=self.src_grid_name,
-            horizontal_dims=self.src_space_coord, loglevel=self.loglevel
+            horizontal_dims=self.src_space_coord, healpix_native=healpix_native,
+            loglevel=self.loglevel
             )
         self.tgt_fldstat = None
         if regrid:
@@ -242,11 +281,23 @@ class Reader():
                 areas = True
             self.tgt_fldstat = FldStat(
                 self.tgt_grid_area.cell_area, grid_name=self.tgt_grid_name,
-                horizontal_dims=self.tgt_space_coord, loglevel=self.loglevel
+                horizontal_dims=self.tgt_space_coord, healpix_native=healpix_native,
+                loglevel=self.loglevel
                 )
             
         self.trender = Trender(loglevel=self.loglevel)
 
+        # shared cache of the intermediate products, invalidated by configuration changes
+        product_cache = product_cache or os.environ.get('AQUA_PRODUCT_CACHE')
+        self.product_cache = None
+        # dask graphs returned by the Reader, the only lazy data whose products are cached
+        self._graph_names = set()
+        if product_cache:
+            self.product_cache = ProductCache(
+                product_cache, loglevel=self.loglevel,
+                config_files=[self.config_file, self.catalog_file, self.machine_file,
+                              self.fixer_folder, self.grids_folder])
+
     def _configure_regridder(self, machine_paths, regrid=False, areas=False,
                              rebuild=False, reader_kwargs=None):
         """
@@ -306,7 +357,7 @@ class Reader():
                 self.src_grid_area = self.fixer.fixerdatamodel.apply(self.src_grid_area)
             # Apply data model transformation to areas
             if self.datamodel:
-                self.src_grid_area = self.datamodel.apply(self.src_grid_area)
+                self.src_grid_area = self.datamodel.apply(self.src_grid_area, flip_coords=self.flip_coords)
 
         # configure regridder and generate weights
         if regrid:
@@ -410,13 +461,17 @@ class Reader():
         # Apply variable fixes (units, names, attributes) and data model fixes
         if self.fix:
             self.logger.debug("Applying variable fixes")
-            data = self.fixer.fixer(data, var)
-            data = self.fixer.fixerdatamodel.apply(data)
+            with trace_span('fixer', source=self.source) as span:
+                data = self.fixer.fixer(data, var, apply_unit_fix=not self.deferred_units)
+                data = self.fixer.fixerdatamodel.apply(data)
+                span.set(data)
 
         # Apply base data model transformation (always applied)
         if self.datamodel:
             self.logger.debug("Applying base data model: %s", self.datamodel_name)
-            data = self.datamodel.apply(data)
+            with trace_span('datamodel', datamodel=self.datamodel_name) as span:
+                data = self.datamodel.apply(data, flip_coords=self.flip_coords)
+                span.set(data)
 
         # log an error if some variables have no units
         if isinstance(data, xr.Dataset) and self.fix:
@@ -433,6 +488,10 @@ class Reader():
             if (startdate or enddate) and not ffdb:  # do not select if data come from FDB (already done)
                 data = data.sel(time=slice(startdate, enddate))
 
+        # the decumulation state is the last step of the piece returned, not of the whole retrieval
+        if self.fix and self.fixer.decumulation_state:
+            self.fixer.decumulation_state.update(data)
+
         if isinstance(data, xr.Dataset):
             data.aqua.set_default(self)  # This links the dataset accessor to this instance of the Reader class
 
@@ -449,7 +508,7 @@ class Reader():
 
         data = set_attrs(data, info_metadata)
 
-        return data
+        return self._track_graphs(data)
 
     def _add_index(self, data):
 
@@ -536,11 +595,15 @@ class Reader():
         
         data = counter_reverse_coordinate(data)
 
-        out = self.regridder.regrid(data)
+        data, pending = self._pending_unit_fix(data, linear=True)
+        with trace_span('regrid', grid=self.tgt_grid_name) as span:
+            out = self.regridder.regrid(data)
+            span.set(out)
+        out = self.apply_unit_fix(out, pending)
 
         # set regridded attribute to 1 for all vars
         out = set_attrs(out, {"AQUA_regridded": 1})
-        return out
+        return self._track_graphs(out)
     
     # def trend(self, data, dim='time', degree=1, skipna=False):
     #     """
@@ -572,6 +635,8 @@ class Reader():
         Returns:
             DataArray or Dataset: The detrended data.
         """
+        # the detrending removes any offset, so deferred unit fixes are applied first
+        data, _ = self._pending_unit_fix(data, linear=False)
         final = self.trender.detrend(data, dim=dim, degree=degree, skipna=skipna)
         final.aqua.set_default(self)
         return final
@@ -713,7 +778,7 @@ class Reader():
                 self.logger.debug('Adding databridge=%s to the filtered kwargs', databridge)
 
         # HACK: Keep chunking info if present as reader kwarg
-        if self.chunks is not None:
+        if self.chunks is not None and self.chunks != 'auto':
             self.logger.warning('Keeping chunks=%s in the filtered kwargs', self.chunks)
             filtered_kwargs['chunks'] = self.chunks
 
@@ -793,7 +858,7 @@ class Reader():
 
         final.aqua.set_default(self)  # This links the dataset accessor to this instance of the Reader class
 
-        return final
+        return self._track_graphs(final)
 
     def _vertinterp(self, data, levels=None, units='Pa', vert_coord='plev', method='linear'):
 
@@ -980,6 +1045,169 @@ class Reader():
 
         return data
     
+    def _pending_unit_fix(self, data, linear):
+        """
+        With deferred unit fixes, find the unit fixes pending on the data.
+        If the following operation is linear they are returned, to be applied to its output,
+        otherwise they are applied immediately.
+
+        Args:
+            data (xr.DataArray or xr.Dataset): the input data
+            linear (bool): if the following operation commutes with an affine transformation
+
+        Returns:
+            tuple: the data and the unit fixes to be applied after the operation
+        """
+        if not (self.deferred_units and self.fix):
+            return data, {}
+        pending = self.fixer.operator.pending_unit_fix(data)
+        if pending and not linear:
+            return self.apply_unit_fix(data, pending), {}
+        return data, pending
+
+    def apply_unit_fix(self, data, pending=None):
+        """
+        Apply the unit conversions left pending on the data by deferred_units=True.
+
+        Args:
+            data (xr.DataArray or xr.Dataset): the input data
+            pending (dict, optional): the unit fixes by variable name. Defaults to those found in the data attributes.
+
+        Returns:
+            The data with the target units of the fixer
+        """
+        if not self.fix:
+            return data
+        if pending is None:
+            pending = self.fixer.operator.pending_unit_fix(data)
+        if not pending:
+            return data
+        return self.fixer.operator.deferred_unit_fix(data, pending, time_correction=self.fixer.time_correction)
+
+    def _track_graphs(self, data):
+        """Record the dask graphs of data returned by the Reader, whose products can be cached"""
+        if self.product_cache is not None:
+            self._graph_names.update(graph_names(data))
+        return data
+
+    def _product_key(self, data, operation, **params):
+        """
+        The product cache key of an operation, None if the cache is not active
+        or if the data have been modified after being returned by the Reader,
+        since the key does not see the arithmetic done on the values.
+        """
+        if self.product_cache is None or self.streaming:
+            return None
+        if not unmodified(data, self._graph_names):
+            self.logger.debug('Data modified after the retrieval, %s is not cached', operation)
+            return None
+        # the source and the settings changing the data, not how they are chunked
+        origin = {'catalog': self.catalog, 'model': self.model, 'exp': self.exp, 'source': self.source,
+                  'kwargs': {name: str(value) for name, value in self.kwargs.items() if name != 'chunks'},
+                  'fix': bool(self.fix), 'regrid': self.tgt_grid_name if self._check_if_regridded(data) else None}
+        return self.product_cache.key(data, operation, origin=origin, **params)
+
+    def _cached_product(self, key):
+        """The cached product of a key, None if not available"""
+        if not key:
+            return None
+        data = self.product_cache.get(key)
+        if data is not None:
+            data.aqua.set_default(self)
+            self._track_graphs(data)
+        return data
+
+    def iter_chunks(self, var=None, aggregation=None, startdate=None, enddate=None,
+                    prefetch=1, start=0, checkpoint=None, load=True, **kwargs):
+        """
+        Iterate over consecutive time windows of the source, yielding loaded chunks
+        while the following ones are loaded in the background.
+        The data are retrieved lazily once and the windows are computed at the start,
+        so that the iteration is deterministic and can be resumed.
+
+        Args:
+            var (str, list, optional): the variable(s) to retrieve. Defaults to all variables.
+            aggregation (str, optional): the window length in pandas style (e.g. 'monthly', '7D')
+                                         or in time steps (e.g. '24S'). Defaults to the Reader aggregation.
+            startdate (str, optional): the first date. Defaults to the Reader startdate.
+            enddate (str, optional): the last date. Defaults to the Reader enddate.
+            prefetch (int, optional): number of windows loaded in advance. Defaults to 1.
+            start (int, optional): index of the first window, e.g. from a previous `state()`. Defaults to 0.
+            checkpoint (str, optional): JSON file storing the position, used to resume the iteration.
+            load (bool, optional): yield chunks loaded in memory. Defaults to True.
+            **kwargs: additional arguments passed to retrieve (e.g. level)
+
+        Returns:
+            ChunkIterator: an iterator and async iterator over the chunks
+
+        Example:
+            >>> for chunk in reader.iter_chunks(var='2t', aggregation='monthly', prefetch=2):
+            ...     process(chunk)
+        """
+        # the iterator takes care of the time windows, retrieve the full period
+        streaming, self.streaming = self.streaming, False
+        try:
+            data = self.retrieve(var=var, startdate=startdate, enddate=enddate, **kwargs)
+        finally:
+            self.streaming = streaming
+
+        return ChunkIterator(data, aggregation=aggregation or self.aggregation,
+                             startdate=startdate or self.startdate, enddate=enddate or self.enddate,
+                             prefetch=prefetch, start=start, checkpoint=checkpoint,
+                             load=load, loglevel=self.loglevel)
+
+    def plan_chunks(self, target_bytes=None, data=None):
+        """
+        Plan the time and vertical chunking of the source for a target chunk size,
+        without applying it. This can be used as a dry-run of chunks='auto':
+        the plan reports the resulting number of chunks and memory per chunk.
+        If no data are provided only the metadata of the source are read, opening it
+        with the chunks on disk, so that no task per time step is created.
+        For FDB sources a single time step is retrieved to inspect the data.
+
+        Args:
+            target_bytes (int or str, optional): the target chunk size, e.g. '256MiB'.
+                                                 Defaults to the dask 'array.chunk-size' configuration.
+            data (xarray.Dataset, optional): the lazily opened data to plan for. Defaults to the whole source.
+
+        Returns:
+            ChunkPlan: the planned chunking, with xarray_chunks and gsv_chunks properties
+        """
+        gsv = isinstance(self.esmcat, aqua.core.gsv.intake_gsv.GSVSource)
+        if data is None:
+            data = self._open_metadata()
+        plan = plan_chunks(data, target_bytes=target_bytes, gsv=gsv, loglevel=self.loglevel)
+        self.logger.info('Chunk plan for %s %s %s: %s', self.model, self.exp, self.source, plan.report())
+        return plan
+
+    def _open_metadata(self):
+        """
+        The source opened lazily to inspect its metadata: sources accepting the chunks
+        are opened with the chunks on disk, instead of the catalog ones (e.g. one per time step).
+        """
+        esmcat = self.esmcat
+        if not isinstance(esmcat, aqua.core.gsv.intake_gsv.GSVSource) and hasattr(esmcat, 'chunks'):
+            esmcat = self.expcat[self.source](**{**self.kwargs, 'chunks': {}})
+            if 'filter_key' in esmcat.metadata and isinstance(esmcat, intake_xarray.netcdf.NetCDFSource):
+                esmcat = self._filter_netcdf_files(esmcat, filter_key=esmcat.metadata['filter_key'])
+        return esmcat.to_dask()
+
+    def _auto_chunks(self):
+        """
+        The chunks planned for chunks='auto', in the format of the source,
+        None if the source does not accept them or has no time dimension.
+        """
+        gsv = isinstance(self.esmcat, aqua.core.gsv.intake_gsv.GSVSource)
+        if not gsv and not hasattr(self.esmcat, 'chunks'):
+            self.logger.warning('Source %s does not accept chunks, keeping the catalog chunking', self.source)
+            return None
+        try:
+            plan = self.plan_chunks()
+        except ValueError as err:
+            self.logger.info('Keeping the catalog chunking: %s', err)
+            return None
+        return plan.gsv_chunks if gsv else plan.xarray_chunks
+
     def _filter_netcdf_files(self, esmcat, filter_key="year"):
 
         """
@@ -1168,22 +1396,31 @@ class Reader():
             mask_kwargs (dict, optional): Additional keyword arguments passed to region.mask().
             **kwargs: additional arguments passed to fldstat
         """
+        # regions are objects which cannot be part of a cache key
+        key = None
+        if region is None:
+            key = self._product_key(data, 'fldstat', stat=stat, lon_limits=lon_limits, lat_limits=lat_limits,
+                                    dims=dims, mask_kwargs=mask_kwargs, **kwargs)
+        cached = self._cached_product(key)
+        if cached is not None:
+            return cached
+
         # Handle regridding logic - use appropriate fldstat module
-        if self._check_if_regridded(data):
-            data = self.tgt_fldstat.fldstat(
-                data, stat=stat,
-                lon_limits=lon_limits, lat_limits=lat_limits,
-                region=region, region_sel=region_sel, mask_kwargs=mask_kwargs,
-                dims=dims, **kwargs)
-        else:
-            data = self.src_fldstat.fldstat(
+        fldstat = self.tgt_fldstat if self._check_if_regridded(data) else self.src_fldstat
+        data, pending = self._pending_unit_fix(data, linear=stat == 'mean')
+        with trace_span('fldstat', stat=stat) as span:
+            data = fldstat.fldstat(
                 data, stat=stat,
                 lon_limits=lon_limits, lat_limits=lat_limits,
                 region=region, region_sel=region_sel, mask_kwargs=mask_kwargs,
                 dims=dims, **kwargs)
+            span.set(data)
+        data = self.apply_unit_fix(data, pending)
+        if key:
+            data = self.product_cache.put(key, data)
 
         data.aqua.set_default(self)
-        return data
+        return self._track_graphs(data)
 
     # Field stats wrapper. If regridded, uses the target grid areas.
     def fldmean(self, data, **kwargs):
@@ -1244,13 +1481,31 @@ class Reader():
             center_time (bool):  center time for averaging
             kwargs:  additional arguments to be passed to the statistical function
         """
-        data = self.timemodule.timstat(
-            data, stat=stat, freq=freq,
-            exclude_incomplete=exclude_incomplete,
-            time_bounds=time_bounds,
-            center_time=center_time, **kwargs)
+        key = None
+        if isinstance(stat, str):
+            key = self._product_key(data, 'timstat', stat=stat, freq=freq, exclude_incomplete=exclude_incomplete,
+                                    time_bounds=time_bounds, center_time=center_time, **kwargs)
+        cached = self._cached_product(key)
+        if cached is not None:
+            return cached
+
+        # the days in month correction depends on time, it cannot be moved after the time statistic
+        linear = stat == 'mean' and (not self.fix or self.fixer.time_correction is False)
+        data, pending = self._pending_unit_fix(data, linear=linear)
+        with trace_span('timstat', stat=stat, freq=freq) as span:
+            data = self.timemodule.timstat(
+                data, stat=stat, freq=freq,
+                exclude_incomplete=exclude_incomplete,
+                time_bounds=time_bounds,
+                center_time=center_time, **kwargs)
+            span.set(data)
+        data = self.apply_unit_fix(data, pending)
+        # the flip deferred by lazy_flip is applied to the reduced output
+        data = apply_pending_flip(data)
+        if key:
+            data = self.product_cache.put(key, data)
         data.aqua.set_default(self) #accessor linking
-        return data
+        return self._track_graphs(data)
     
     def timmean(self, data, **kwargs):
         """
@@ -1291,8 +1546,10 @@ class Reader():
 
     def histogram(self, data, **kwargs):
         """
-        Wrapper for the histogram function
+        Wrapper for the histogram function.
+        Deferred unit fixes are applied first, since the bins are in the target units.
         """
+        data, _ = self._pending_unit_fix(data, linear=False)
         return histogram(data, **kwargs)
 
 def units_extra_definition():
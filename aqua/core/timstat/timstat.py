@@ -1,12 +1,13 @@
 """Timmean mixin for the Reader class"""
 import pandas as pd
 import xarray as xr
+from xarray.groupers import TimeResampler
 import numpy as np
 from functools import partial
 from aqua.core.util import check_chunk_completeness, check_seasonal_chunk_completeness, frequency_string_to_pandas
 from aqua.core.util import extract_literal_and_numeric
 from aqua.core.logger import log_history, log_configure
-from aqua.core.histogram import histogram
+from aqua.core.histogram import histogram, QuantileSketch
 
 
 class TimStat():
@@ -23,19 +24,20 @@ class TimStat():
     @property
     def AVAILABLE_STATS(self):
         """Return the list of available statistics."""
-        return ['mean', 'std', 'max', 'min', 'sum', 'histogram']
+        return ['mean', 'std', 'max', 'min', 'sum', 'histogram', 'quantile', 'sketch']
 
     def timstat(self, data, stat='mean', freq=None, exclude_incomplete=False,
                 time_bounds=False, center_time=False, func_kwargs={}, **kwargs):
         """
         Compute a time statistic on the input data. The statistic is computed over a time window defined by the frequency
         parameter. The frequency can be a string (e.g. '1D', '1M', '1Y', 'QS-DEC') or a pandas frequency object. The statistic can be
-        'mean', 'std', 'max', 'min' or 'histogram'. The output is a new xarray dataset with the time dimension resampled to the desired
+        'mean', 'std', 'max', 'min', 'histogram', 'quantile' or 'sketch'. The output is a new xarray dataset with the time dimension resampled to the desired
         frequency and the statistic computed over the time window.
 
         Args: 
             data (xarray.Dataset): Input data to compute the statistic on.
-            stat (str, func): Statistic to compute. Can be a string in ['mean', 'std', 'max', 'min', 'histogram'] or a custom function.
+            stat (str, func): Statistic to compute. Can be a string in ['mean', 'std', 'max', 'min', 'histogram', 'quantile', 'sketch']
+                              or a custom function. 'quantile' and 'sketch' use a QuantileSketch, see _sketch_stat.
             freq (str): Frequency to resample the data to. Can be a string (e.g. '1D', '1M', '1Y') or a pandas frequency object.
             exclude_incomplete (bool): If True, exclude incomplete chunks from the output.
             time_bounds (bool): If True, add time bounds to the output data.
@@ -53,8 +55,8 @@ class TimStat():
         if not isinstance(stat, str) and not callable(stat):
             raise TypeError('stat must be a string or a callable function')
         
-        if stat == 'histogram':  # convert to callable function
-            stat = histogram
+        if stat is histogram:  # the built-in histogram is computed with the resampled path
+            stat = 'histogram'
         
         resample_freq = frequency_string_to_pandas(freq)
 
@@ -94,7 +96,16 @@ class TimStat():
             resample_data = data
 
         # compact call, equivalent of "out = resample_data.mean()""
-        if isinstance(stat, str):  # we already checked if it is one of the allowable stats
+        if stat == 'histogram':
+            self.logger.info('Resampling to %s frequency and computing histogram...', str(resample_freq))
+            if resample_freq is not None:
+                out = self._resampled_histogram(data, resample_freq, **func_kwargs, **kwargs)
+            else:
+                out = histogram(data, **func_kwargs, **kwargs)
+        elif stat in ['quantile', 'sketch']:
+            self.logger.info('Resampling to %s frequency and computing %s...', str(resample_freq), stat)
+            out = self._sketch_stat(data, stat, resample_freq, **func_kwargs, **kwargs)
+        elif isinstance(stat, str):  # we already checked if it is one of the allowable stats
             self.logger.info(f'Resampling to %s frequency and computing {stat}...', str(resample_freq))
             # use the kwargs to feed the time dimension to define the method and its options
             extra_kwargs = {} if resample_freq is not None else {'dim': 'time'}
@@ -144,6 +155,68 @@ class TimStat():
 
         return out
     
+    def _resampled_histogram(self, data, resample_freq, density=False, **kwargs):
+        """
+        Histograms of each time window, summing the histograms of each time step.
+        All the windows share the same bins and are computed in a single dask graph
+        from the partial histograms of the data chunks, instead of one histogram per window.
+
+        Args:
+            data (xarray.Dataset or xarray.DataArray): Input data.
+            resample_freq (str): The pandas resampling frequency.
+            density (bool, optional): Return a probability density function for each window. Defaults to False.
+            kwargs (dict): Additional keyword arguments for the histogram function.
+
+        Returns:
+            xarray.DataArray or xarray.Dataset: The histogram of each time window.
+        """
+        dims = [dim for dim in data.dims if dim != 'time']
+        steps = histogram(data, dim=dims, **kwargs)
+        with xr.set_options(keep_attrs=True):
+            out = steps.resample(time=resample_freq).sum()
+            if density:
+                out = out / (out.sum('center_of_bin') * out.width)
+
+        fields = list(out.data_vars.values()) if isinstance(out, xr.Dataset) else [out]
+        for field in fields:
+            # the windows may have a different number of time steps
+            field.attrs.pop('size_of_the_data', None)
+            if density:
+                if "long_name" in field.attrs:
+                    field.attrs['long_name'] = field.attrs['long_name'].replace('Histogram of', 'Pdf of', 1)
+                field.attrs['units'] = 'probability density'
+        if density and isinstance(out, xr.DataArray):
+            out.name = 'pdf'
+        return out
+
+    def _sketch_stat(self, data, stat, resample_freq, q=0.5, weighted=False, **kwargs):
+        """
+        Quantiles of each time window, estimated with a QuantileSketch over time, or the sketch counts
+        themselves, which can be stored and merged with the ones of other periods or runs.
+        The data are chunked by time window, so that the counts of all the windows
+        are computed in a single blockwise reduction.
+
+        Args:
+            data (xarray.Dataset or xarray.DataArray): Input data.
+            stat (str): 'quantile' or 'sketch'.
+            resample_freq (str): The pandas resampling frequency, None for the whole record.
+            q (float or list, optional): The quantiles, for stat='quantile'. Defaults to 0.5.
+            weighted (bool, optional): Use latitudinal weights. Defaults to False.
+            kwargs (dict): The parameters of the QuantileSketch, e.g. relative_accuracy, min_value, max_value, signed.
+
+        Returns:
+            xarray.DataArray or xarray.Dataset: The quantiles, or the counts of the sketch of each time window.
+        """
+        sketch = QuantileSketch(loglevel=self.loglevel, **kwargs)
+        if resample_freq is None:
+            sketch.add(data, dim='time', weighted=weighted)
+        else:
+            # one chunk per window, whose counts are labelled as the resampled windows with data
+            sketch.add(data.chunk(time=TimeResampler(resample_freq)), dim='time', weighted=weighted, split='time')
+            steps = data['time'].resample(time=resample_freq).count()
+            sketch.counts = sketch.counts.assign_coords(time=steps['time'][steps.values > 0].values)
+        return sketch.quantile(q) if stat == 'quantile' else sketch.counts
+
     # this is not yet a great solution, but is more general than the previous one
     def center_time_axis(self, avg_data: xr.Dataset, resample_freq: str) -> xr.Dataset:
         """
@@ -0,0 +1,304 @@
+"""
+Module to trace the performance of the main AQUA operations.
+
+Tracing is disabled by default and costs a single attribute lookup per span.
+It can be enabled with the AQUA_TRACE environment variable or with the
+'trace' key of the 'options' block of the config-aqua.yaml file.
+The value is the output file: '.jsonl' files are written line by line
+while the spans are closed (safe with dask workers and multiple processes),
+'.json' files are written in Chrome trace format when the process exits
+and can be opened with chrome://tracing or https://ui.perfetto.dev.
+Any true-like value ('1', 'true', 'yes') enables in-memory tracing only.
+
+Spans wrapping lazy operations (regrid, fldstat, timstat, fixer on dask data)
+measure only the construction of the dask graph: they are tagged with the
+'graph' phase and aggregated as '<name>:graph', while the actual computation
+is measured by the spans around compute and write (e.g. in DROP).
+"""
+
+import atexit
+import json
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter, time
+
+from aqua.core.logger import log_configure
+
+TRACE_FORMATS = ['jsonl', 'chrome']
+_TRUE_VALUES = ['1', 'true', 'yes', 'on']
+
+
+class Span():
+    """A single traced operation, exposing the Chrome 'complete' event fields."""
+
+    __slots__ = ['name', 'ts', 'dur', 'pid', 'tid', 'args']
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.ts = time() * 1e6  # Chrome trace wants microseconds
+        self.dur = None
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.args = dict(attrs)
+
+    def set(self, data=None, **attrs):
+        """
+        Attach attributes to the span.
+
+        Args:
+            data (xarray object, optional): data produced by the operation,
+                used to record the number of bytes, the phase ('graph' for lazy
+                data, 'compute' otherwise) and, at DEBUG level, the number of dask tasks
+            **attrs: additional attributes, e.g. nbytes for a written file
+        """
+        if data is not None:
+            self.args.update(data_info(data, tasks=_TRACER.loglevel == 'DEBUG'))
+        self.args.update(attrs)
+
+    def to_dict(self):
+        """The span as a Chrome trace event"""
+        return {'name': self.name, 'cat': 'aqua', 'ph': 'X',
+                'ts': self.ts, 'dur': self.dur, 'pid': self.pid,
+                'tid': self.tid, 'args': self.args}
+
+
+class _NullSpan():
+    """Span returned when tracing is disabled"""
+
+    __slots__ = []
+
+    def set(self, data=None, **attrs):
+        """Do nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Tracer():
+    """
+    Collect the spans of a run and export them.
+
+    Attributes:
+        enabled (bool): if the spans are recorded
+        output (str): the output file, None for in-memory tracing
+        fmt (str): the output format, 'jsonl' or 'chrome'
+        loglevel (str): the number of dask tasks is recorded only at DEBUG level
+        spans (list): the spans recorded by this process
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.output = None
+        self.fmt = None
+        self.loglevel = 'WARNING'
+        self.spans = []
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def enable(self, output=None, fmt=None, loglevel='WARNING'):
+        """
+        Enable the tracing.
+
+        Args:
+            output (str, optional): the output file. If None, spans are kept in memory.
+            fmt (str, optional): 'jsonl' or 'chrome'. Deduced from the output
+                extension if not provided: '.json' is chrome, everything else jsonl.
+            loglevel (str, optional): with 'DEBUG' the number of dask tasks of each span
+                is recorded too, which can be costly on large graphs. Defaults to 'WARNING'.
+        """
+        if fmt is None and output is not None:
+            fmt = 'chrome' if output.endswith('.json') else 'jsonl'
+        if fmt is not None and fmt not in TRACE_FORMATS:
+            raise ValueError(f'Trace format {fmt} not supported, use one of {TRACE_FORMATS}')
+        self.output = os.path.abspath(output) if output else None
+        self.fmt = fmt
+        self.loglevel = str(loglevel).upper()
+        self.enabled = True
+        if self.output and self.fmt == 'chrome' and not self._registered:
+            atexit.register(self._export_at_exit)
+            self._registered = True
+
+    def disable(self):
+        """Disable the tracing, keeping the spans already recorded"""
+        self.enabled = False
+
+    def reset(self):
+        """Drop the spans recorded so far"""
+        with self._lock:
+            self.spans = []
+
+    def record(self, span):
+        """Store a closed span, streaming it to the output file for the jsonl format"""
+        with self._lock:
+            self.spans.append(span)
+            if self.output and self.fmt == 'jsonl':
+                with open(self.output, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(span.to_dict(), default=str) + '\n')
+
+    def summary(self):
+        """
+        Aggregate the recorded spans by name. Spans of the graph construction
+        of lazy data are aggregated separately, as '<name>:graph'.
+
+        Returns:
+            dict: for each span name the number of calls, the total, mean and
+                  max duration in seconds and the total bytes and dask tasks
+        """
+        summary = {}
+        for span in self.spans:
+            name = f'{span.name}:graph' if span.args.get('phase') == 'graph' else span.name
+            entry = summary.setdefault(name, {'count': 0, 'total': 0., 'max': 0.,
+                                                   'nbytes': 0, 'ntasks': 0})
+            duration = span.dur / 1e6
+            entry['count'] += 1
+            entry['total'] += duration
+            entry['max'] = max(entry['max'], duration)
+            entry['nbytes'] += span.args.get('nbytes', 0)
+            entry['ntasks'] += span.args.get('ntasks', 0)
+        for entry in summary.values():
+            entry['mean'] = entry['total'] / entry['count']
+        return summary
+
+    def log_summary(self, loglevel='INFO'):
+        """Log the aggregated spans of the run"""
+        logger = log_configure(loglevel, 'Tracer')
+        for name, entry in sorted(self.summary().items(), key=lambda item: -item[1]['total']):
+            logger.info('%-14s %5d calls %9.3f s total %8.3f s max %9.1f MiB %7d tasks',
+                        name, entry['count'], entry['total'], entry['max'],
+                        entry['nbytes'] / 2**20, entry['ntasks'])
+
+    def export(self, filename, fmt='chrome'):
+        """
+        Write the recorded spans to a file.
+
+        Args:
+            filename (str): the output file
+            fmt (str): 'jsonl' or 'chrome'
+        """
+        if fmt not in TRACE_FORMATS:
+            raise ValueError(f'Trace format {fmt} not supported, use one of {TRACE_FORMATS}')
+        events = [span.to_dict() for span in self.spans]
+        with open(filename, 'w', encoding='utf-8') as f:
+            if fmt == 'chrome':
+                json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+            else:
+                for event in events:
+                    f.write(json.dumps(event, default=str) + '\n')
+
+    def _export_at_exit(self):
+        """Export the Chrome trace when the process exits, one file per process"""
+        if not self.spans:
+            return
+        output = self.output
+        if os.environ.get('AQUA_TRACE_PID') not in (None, str(os.getpid())):
+            # spawned workers inherit the environment: do not overwrite the main trace
+            root, ext = os.path.splitext(output)
+            output = f'{root}.{os.getpid()}{ext}'
+        self.export(output, fmt='chrome')
+
+
+_TRACER = Tracer()
+
+
+def get_tracer():
+    """Return the tracer of the current process"""
+    return _TRACER
+
+
+def enable_tracing(output=None, fmt=None, loglevel='WARNING'):
+    """Enable the tracing, see Tracer.enable"""
+    os.environ.setdefault('AQUA_TRACE_PID', str(os.getpid()))
+    _TRACER.enable(output=output, fmt=fmt, loglevel=loglevel)
+
+
+def disable_tracing():
+    """Disable the tracing"""
+    _TRACER.disable()
+
+
+def configure_tracing(value, loglevel=None):
+    """
+    Enable the tracing from a configuration value, as found in
+    the AQUA_TRACE environment variable or in config-aqua.yaml.
+    Nothing is done if the tracing is already enabled or the value is empty.
+
+    Args:
+        value (str or bool): an output file or a true-like value
+        loglevel (str, optional): the tracing level, see Tracer.enable.
+            Defaults to the AQUA_TRACE_LOGLEVEL environment variable or 'WARNING'.
+    """
+    if _TRACER.enabled or value in (None, False, ''):
+        return
+    loglevel = loglevel or os.environ.get('AQUA_TRACE_LOGLEVEL', 'WARNING')
+    if value is True or str(value).lower() in _TRUE_VALUES:
+        enable_tracing(loglevel=loglevel)
+    elif str(value).lower() not in ['0', 'false', 'no', 'off']:
+        enable_tracing(output=str(value), loglevel=loglevel)
+
+
+def data_info(data, tasks=False):
+    """
+    Size in bytes, phase and number of dask tasks of an xarray object
+
+    Args:
+        data: an xarray or dask object, or any object with an nbytes attribute
+        tasks (bool, optional): count the tasks of the dask graph, which
+            materializes the graph and can be costly. Defaults to False.
+
+    Returns:
+        dict: with 'nbytes', 'phase' and 'ntasks' when available
+    """
+    info = {}
+    nbytes = getattr(data, 'nbytes', None)
+    if nbytes is not None:
+        info['nbytes'] = int(nbytes)
+    graph = getattr(data, '__dask_graph__', None)
+    graph = graph() if callable(graph) else None
+    if graph is not None:
+        info['phase'] = 'graph'
+        if tasks:
+            info['ntasks'] = len(graph)
+    elif nbytes is not None:
+        info['phase'] = 'compute'
+    return info
+
+
+@contextmanager
+def _span(name, attrs):
+    """Time the enclosed block and record it as a span"""
+    span = Span(name, **attrs)
+    tstart = perf_counter()
+    try:
+        yield span
+    finally:
+        span.dur = (perf_counter() - tstart) * 1e6
+        _TRACER.record(span)
+
+
+def trace_span(name, **attrs):
+    """
+    Context manager tracing the enclosed block.
+    When tracing is disabled a shared no-op span is returned.
+
+    Args:
+        name (str): the name of the span, e.g. 'regrid' or 'write'
+        **attrs: attributes to be attached to the span
+
+    Example:
+        with trace_span('regrid', grid='r100') as span:
+            out = regridder.regrid(data)
+            span.set(out)
+    """
+    if not _TRACER.enabled:
+        return NULL_SPAN
+    return _span(name, attrs)
+
+
+configure_tracing(os.environ.get('AQUA_TRACE'))
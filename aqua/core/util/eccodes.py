@@ -4,16 +4,20 @@ to retrieve attributes of GRIB parameters by their short names or param IDs.
 It operates with caching to improve performance and handles preferentially GRIB2 format.
 A tentative is done to access also GRIB1 format in case of errors with GRIB2, but it 
 should be noted that GRIB1 is deprecated and not recommended for use.
+Results are also stored in a table in the AQUA configuration folder, one per eccodes version
+and definitions path, so that new processes read them from a single file instead of creating GRIB handles.
 """
-#import os
-#import eccodes
-#from packaging import version
-
+import os
+import json
+import atexit
+import hashlib
 import functools
+import eccodes
 from eccodes import codes_grib_new_from_samples, codes_set, codes_get, codes_release
 from eccodes import CodesInternalError
 from aqua.core.logger import log_configure
 from aqua.core.exceptions import NoEcCodesShortNameError
+from aqua.core.configurer import ConfigLocator
 
 # some eccodes shortnames are not unique: we need a manual mapping
 #NOT_UNIQUE_SHORTNAMES = {
@@ -21,9 +25,163 @@ from aqua.core.exceptions import NoEcCodesShortNameError
 #}
 
 
+class EccodesTable():
+    """
+    Persistent table of the eccodes lookups: the attributes by short name and the short names by paramId.
+    The table is read with a single file read and new entries are written back to it in batches,
+    every `batch` new entries and when the process exits.
+
+    Args:
+        filename (str, optional): The JSON file of the table. If None, the table is kept in memory.
+        batch (int, optional): The number of new entries triggering a write. Defaults to 50.
+    """
+
+    def __init__(self, filename=None, batch=50):
+        self.filename = filename
+        self.batch = batch
+        self.attrs = {}
+        self.shortnames = {}
+        self.pending = 0
+        if filename and os.path.exists(filename):
+            try:
+                with open(filename, 'r', encoding='utf-8') as f:
+                    table = json.load(f)
+                self.attrs = table.get('attrs', {})
+                self.shortnames = table.get('shortnames', {})
+            except (OSError, ValueError) as err:
+                log_configure(log_level='WARNING', log_name='eccodes').warning(
+                    'Cannot read eccodes table %s: %s', filename, err)
+
+    def add(self, kind, key, value):
+        """
+        Store a new entry, writing the table once a batch of new entries is collected.
+
+        Args:
+            kind (str): 'attrs' or 'shortnames'
+            key (str): the key of the entry
+            value: the value, None for a failed lookup
+        """
+        getattr(self, kind)[key] = value
+        self.pending += 1
+        if self.pending >= self.batch:
+            self.save()
+
+    def save(self):
+        """
+        Write the table to file, merging the entries written in the meantime by other processes.
+        Read-only configuration folders are ignored.
+        """
+        if not self.filename:
+            return
+        self.pending = 0
+        other = EccodesTable(self.filename)
+        self.attrs = {**other.attrs, **self.attrs}
+        self.shortnames = {**other.shortnames, **self.shortnames}
+        tmpfile = f'{self.filename}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            with open(tmpfile, 'w', encoding='utf-8') as f:
+                json.dump({'eccodes': eccodes.__version__, 'definitions': definitions_path(),
+                           'attrs': self.attrs, 'shortnames': self.shortnames}, f, indent=1)
+            os.replace(tmpfile, self.filename)
+        except OSError as err:
+            log_configure(log_level='WARNING', log_name='eccodes').debug(
+                'Cannot write eccodes table %s: %s', self.filename, err)
+
+    def save_pending(self):
+        """Write the table only if there are new entries"""
+        if self.pending:
+            self.save()
+
+
+def definitions_path():
+    """The eccodes definitions in use, including the custom ones set in the environment"""
+    paths = [os.environ.get(name) for name in ['ECCODES_DEFINITION_PATH', 'ECCODES_EXTRA_DEFINITION_PATH']]
+    paths = [path for path in paths if path]
+    return ':'.join(paths) if paths else eccodes.codes_definition_path()
+
+
+@functools.cache
+def get_eccodes_table():
+    """
+    The eccodes table of the current eccodes version and definitions, stored in the AQUA configuration folder.
+    If no configuration folder is found, the table is kept in memory.
+    New entries are written when the process exits.
+    """
+    try:
+        configdir = ConfigLocator().configdir
+    except FileNotFoundError:
+        return EccodesTable()
+    digest = hashlib.sha1(definitions_path().encode('utf-8')).hexdigest()[:8]
+    table = EccodesTable(os.path.join(configdir, 'cache', f'eccodes-{eccodes.__version__}-{digest}.json'))
+    atexit.register(table.save_pending)
+    return table
+
+
+def build_eccodes_table(params, loglevel='WARNING'):
+    """
+    Fill the eccodes table with a list of short names or paramIds, e.g. all the variables of a convention,
+    so that later lookups do not need eccodes.
+
+    Args:
+        params (list): short names or paramIds
+        loglevel (str): The logging level to use for the logger.
+
+    Returns:
+        EccodesTable: the updated table
+    """
+    logger = log_configure(log_level=loglevel, log_name='eccodes')
+    for param in params:
+        try:
+            get_eccodes_attr(str(param), loglevel=loglevel)
+        except NoEcCodesShortNameError as err:
+            logger.warning(err)
+    table = get_eccodes_table()
+    table.save_pending()
+    return table
+
+
 @functools.cache
 def _get_attrs_from_shortname(sn, grib_version="GRIB2", table=0):
-    """Get the attributes of a parameter by its short name.
+    """Get the attributes of a parameter by its short name, from the eccodes table or from eccodes.
+    Args:
+        sn (str): The short name to look up.
+        grib_version (str): The GRIB version to use, either "GRIB2" or "GRIB1".
+    Returns:
+        dict: A dictionary containing the attributes of the parameter, namely
+        'paramId', 'long_name', 'units', 'shortName', 'cfVarName'.
+        None if the short name is not found: misses are stored as well.
+    """
+    eccodes_table = get_eccodes_table()
+    key = f'{sn}/{grib_version}/{table}'
+    if key not in eccodes_table.attrs:
+        try:
+            attrs = _codes_attrs_from_shortname(sn, grib_version=grib_version, table=table)
+        except CodesInternalError:
+            attrs = None
+        eccodes_table.add('attrs', key, attrs)
+    return eccodes_table.attrs[key]
+
+
+@functools.cache
+def _get_shortname_from_paramid(pid):
+    """Get the short name of a parameter by its paramId, from the eccodes table or from eccodes.
+
+    Args:
+        paramid (str): The parameter ID to look up.
+
+    Returns:
+        string: The short name associated with the given paramId.
+    """
+    eccodes_table = get_eccodes_table()
+    key = str(pid)
+    if key not in eccodes_table.shortnames:
+        eccodes_table.add('shortnames', key, _codes_shortname_from_paramid(pid))
+    return eccodes_table.shortnames[key]
+
+
+def _codes_attrs_from_shortname(sn, grib_version="GRIB2", table=0):
+    """Get the attributes of a parameter by its short name with eccodes.
     Args:
         sn (str): The short name to look up.
         grib_version (str): The GRIB version to use, either "GRIB2" or "GRIB1".
@@ -60,9 +218,8 @@ def _get_attrs_from_shortname(sn, grib_version="GRIB2", table=0):
         'cfVarName': cfv
     }
 
-@functools.cache
-def _get_shortname_from_paramid(pid):
-    """Get the attributes of a parameter by its paramId.
+def _codes_shortname_from_paramid(pid):
+    """Get the short name of a parameter by its paramId with eccodes.
 
     Args:
         paramid (str): The parameter ID to look up.
@@ -120,15 +277,15 @@ def get_eccodes_attr(sn, loglevel='WARNING'):
     ]
 
     for _, strategy in enumerate(strategies):
-        try:
-            logger.debug("Trying short name %s with GRIB version %s and table %s",
-             sn, strategy["grib_version"], strategy["table"])
-            return _get_attrs_from_shortname(sn, **strategy)
-        except CodesInternalError as e:
-            if strategy["grib_version"] == "GRIB1":
-                logger.warning("No GRIB2 codes found, trying GRIB1 for shortName %s", sn)
-            logger.debug("Failed guessing for shortName %s, grib_version %s and table %s: %s",
-                         strategy["grib_version"], strategy["table"], sn, e)
+        logger.debug("Trying short name %s with GRIB version %s and table %s",
+         sn, strategy["grib_version"], strategy["table"])
+        attrs = _get_attrs_from_shortname(sn, **strategy)
+        if attrs is not None:
+            return attrs
+        if strategy["grib_version"] == "GRIB1":
+            logger.warning("No GRIB2 codes found, trying GRIB1 for shortName %s", sn)
+        logger.debug("Failed guessing for shortName %s, grib_version %s and table %s",
+                     sn, strategy["grib_version"], strategy["table"])
 
     raise NoEcCodesShortNameError(f"Cannot find any grib codes for ShortName {sn}")
 
@@ -1,5 +1,7 @@
 """Graphics utilities for Aqua."""
+import hashlib
 import math
+import os
 
 import xarray as xr
 import cartopy.util as cutil
@@ -7,7 +9,8 @@ import cartopy.crs as ccrs
 import cartopy.mpl.ticker as cticker
 import numpy as np
 import healpy as hp
-from scipy.interpolate import griddata
+from scipy.sparse import csr_matrix
+from scipy.spatial import Delaunay
 import matplotlib.pyplot as plt
 import matplotlib.path as mpath
 import matplotlib.patches as mpatches
@@ -477,6 +480,208 @@ def get_npix(data):
     """
     return hp.nside2npix(get_nside(data))
     
+# resampling plans of healpix_resample kept in memory, by key
+_RESAMPLE_PLANS = {}
+MAX_RESAMPLE_PLANS = 16
+
+
+class HealpixResamplePlan():
+    """
+    The resampling of a HEALPix grid to a lat/lon grid, computed once and applied
+    to any map of the same grid: a gather of the nearest pixels for the 'nearest' method,
+    a sparse matrix of the barycentric weights of the Delaunay triangulation
+    (the same used by scipy griddata) for the 'linear' method.
+
+    Args:
+        nside (int): nside of the HEALPix grid.
+        xlims (tuple): Longitude limits for the output grid.
+        ylims (tuple): Latitude limits for the output grid.
+        nx (int): Number of points in the x direction.
+        ny (int): Number of points in the y direction.
+        src_crs (cartopy.crs.Projection): Source coordinate reference system.
+        method (str, optional): Resampling method ('nearest' or 'linear'). Defaults to 'nearest'.
+        nest (bool, optional): Whether to use nested HEALPix scheme. Defaults to True.
+
+    Attributes:
+        xvals, yvals (numpy.ndarray): the coordinates of the output grid
+        valid (numpy.ndarray): the output points with finite lat/lon
+        pix (numpy.ndarray): the nearest pixel of each valid point ('nearest')
+        weights (scipy.sparse.csr_matrix): the weights of the pixels for each valid point ('linear')
+        outside (numpy.ndarray): the valid points outside the triangulation ('linear')
+    """
+
+    def __init__(self, nside, xlims, ylims, nx, ny, src_crs, method="nearest", nest=True):
+        if method not in ["nearest", "linear"]:
+            raise ValueError(f"Resampling method {method} not supported, use 'nearest' or 'linear'")
+        self.nside = nside
+        self.method = method
+        self.pix = None
+        self.weights = None
+        self.outside = None
+
+        # Compute grid centers
+        dx = (xlims[1] - xlims[0]) / nx
+        dy = (ylims[1] - ylims[0]) / ny
+        self.xvals = np.linspace(xlims[0] + dx / 2, xlims[1] - dx / 2, nx)
+        self.yvals = np.linspace(ylims[0] + dy / 2, ylims[1] - dy / 2, ny)
+        xvals2, yvals2 = np.meshgrid(self.xvals, self.yvals)
+
+        # Transform to lat/lon
+        latlon = ccrs.PlateCarree().transform_points(
+            src_crs, xvals2, yvals2, np.zeros_like(xvals2)
+        )
+        self.valid = np.all(np.isfinite(latlon), axis=-1)
+        points = latlon[self.valid].T
+
+        if method == "nearest":
+            self.pix = hp.ang2pix(nside, theta=points[0], phi=points[1], nest=nest, lonlat=True)
+        else:
+            self._linear_weights(points, nest)
+
+    def _linear_weights(self, points, nest):
+        """Barycentric weights of the target points in the triangulation of the pixel centers"""
+        npix = hp.nside2npix(self.nside)
+        lons, lats = hp.pix2ang(nside=self.nside, ipix=np.arange(npix), nest=nest, lonlat=True)
+        lons = (lons + 180) % 360 - 180
+
+        valid_src = ((lons > points[0].min()) & (lons < points[0].max())) | (
+            (lats > points[1].min()) & (lats < points[1].max())
+        )
+        src = np.column_stack([lons[valid_src], lats[valid_src]])
+        # the transformed points also carry the height, only lon and lat are interpolated
+        tgt = points.T[..., :2]
+
+        # same rescaling of griddata(rescale=True)
+        offset = src.mean(axis=0)
+        scale = np.ptp(src - offset, axis=0)
+        scale[~(scale > 0)] = 1.0
+        src = (src - offset) / scale
+        tgt = (tgt - offset) / scale
+
+        tri = Delaunay(src)
+        simplex = tri.find_simplex(tgt)
+        inside = simplex >= 0
+        transform = tri.transform[simplex[inside]]
+        bary = np.einsum('ijk,ik->ij', transform[:, :2], tgt[inside] - transform[:, 2])
+        weights = np.column_stack([bary, 1 - bary.sum(axis=1)])
+
+        cols = np.flatnonzero(valid_src)[tri.simplices[simplex[inside]]]
+        rows = np.repeat(np.flatnonzero(inside), 3)
+        self.weights = csr_matrix((weights.ravel(), (rows, cols.ravel())), shape=(len(tgt), npix))
+        self.outside = ~inside
+
+    def apply(self, var):
+        """
+        Resample a HEALPix map.
+
+        Args:
+            var (xarray.DataArray or numpy.ndarray): Input HEALPix map on the grid of the plan.
+
+        Returns:
+            xarray.DataArray: Resampled data on a lat/lon grid.
+        """
+        res = np.full(self.valid.shape, np.nan, dtype=var.dtype)
+
+        if self.method == "nearest":
+            if var.size < hp.nside2npix(self.nside):
+                if not isinstance(var, xr.DataArray):
+                    raise ValueError(
+                        "Sparse HEALPix grids are only supported as xr.DataArray"
+                    )
+                res[self.valid] = var.sel(cell=self.pix, method="nearest").where(
+                    lambda x: x.cell == self.pix
+                )
+            else:
+                res[self.valid] = np.asarray(var)[self.pix]
+        else:
+            values = self.weights @ np.asarray(var)
+            values[self.outside] = np.nan
+            res[self.valid] = values
+
+        result = xr.DataArray(res, coords=[("lat", self.yvals), ("lon", self.xvals)])
+        result.attrs = getattr(var, "attrs", {}).copy()
+        return result
+
+    def save(self, filename):
+        """Store the plan in a npz file"""
+        arrays = {'nside': self.nside, 'method': self.method, 'xvals': self.xvals,
+                  'yvals': self.yvals, 'valid': self.valid}
+        if self.method == "nearest":
+            arrays['pix'] = self.pix
+        else:
+            arrays.update(data=self.weights.data, indices=self.weights.indices,
+                          indptr=self.weights.indptr, shape=self.weights.shape, outside=self.outside)
+        tmpfile = f'{filename}.{os.getpid()}.tmp.npz'
+        np.savez(tmpfile, **arrays)
+        os.replace(tmpfile, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """Read a plan stored with save"""
+        plan = cls.__new__(cls)
+        with np.load(filename) as arrays:
+            plan.nside = int(arrays['nside'])
+            plan.method = str(arrays['method'])
+            plan.xvals = arrays['xvals']
+            plan.yvals = arrays['yvals']
+            plan.valid = arrays['valid']
+            plan.pix = plan.weights = plan.outside = None
+            if plan.method == "nearest":
+                plan.pix = arrays['pix']
+            else:
+                plan.weights = csr_matrix((arrays['data'], arrays['indices'], arrays['indptr']),
+                                          shape=tuple(arrays['shape']))
+                plan.outside = arrays['outside']
+        return plan
+
+
+def get_resample_plan(nside, xlims, ylims, nx, ny, src_crs, method="nearest", nest=True,
+                      plan_dir=None, loglevel="WARNING"):
+    """
+    The HealpixResamplePlan of a grid, taken from memory or from plan_dir if already computed.
+
+    Args:
+        nside (int): nside of the HEALPix grid.
+        xlims (tuple): Longitude limits for the output grid.
+        ylims (tuple): Latitude limits for the output grid.
+        nx (int): Number of points in the x direction.
+        ny (int): Number of points in the y direction.
+        src_crs (cartopy.crs.Projection): Source coordinate reference system.
+        method (str, optional): Resampling method ('nearest' or 'linear').
+        nest (bool, optional): Whether to use nested HEALPix scheme.
+        plan_dir (str, optional): Folder where the plans are stored. Defaults to None (memory only).
+        loglevel (str, optional): Log level.
+
+    Returns:
+        HealpixResamplePlan: the resampling plan
+    """
+    logger = log_configure(loglevel, "healpix resample")
+    key = (nside, bool(nest), tuple(float(x) for x in xlims), tuple(float(y) for y in ylims),
+           int(nx), int(ny), method, src_crs.proj4_init)
+    plan = _RESAMPLE_PLANS.get(key)
+    if plan is not None:
+        return plan
+
+    filename = None
+    if plan_dir:
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()[:16]
+        filename = os.path.join(plan_dir, f"healpix_plan_{nside}_{method}_{digest}.npz")
+    if filename and os.path.exists(filename):
+        logger.debug("Loading HEALPix resampling plan from %s", filename)
+        plan = HealpixResamplePlan.load(filename)
+    else:
+        logger.debug("Computing HEALPix resampling plan for nside=%d on %d x %d points", nside, nx, ny)
+        plan = HealpixResamplePlan(nside, xlims, ylims, nx, ny, src_crs, method=method, nest=nest)
+        if filename:
+            os.makedirs(plan_dir, exist_ok=True)
+            plan.save(filename)
+
+    if len(_RESAMPLE_PLANS) >= MAX_RESAMPLE_PLANS:
+        _RESAMPLE_PLANS.pop(next(iter(_RESAMPLE_PLANS)))
+    _RESAMPLE_PLANS[key] = plan
+    return plan
+
+
 def healpix_resample(
         var,
         xlims=None,
@@ -487,10 +692,12 @@ def healpix_resample(
         method="nearest",
         nest=True,
         nside_out=None,
+        plan_dir=None,
         loglevel="WARNING",
         ):
     """
     Resample a HEALPix map to a lat/lon grid.
+    The resampling plan is computed once per grid and reused for the following maps.
 
     Args:
         var (xarray.DataArray): Input HEALPix map.
@@ -502,6 +709,8 @@ def healpix_resample(
         method (str, optional): Resampling method ('nearest' or 'linear').
         nest (bool, optional): Whether to use nested HEALPix scheme.
         nside_out (int, optional): Output HEALPix nside.
+        plan_dir (str, optional): Folder where the resampling plans are stored to be reused
+                                  by other processes. Defaults to None (memory only).
         loglevel (str, optional): Log level.
 
     Returns:
@@ -528,64 +737,122 @@ def healpix_resample(
     if src_crs is None:
         src_crs = ccrs.Geodetic()
 
-    # Compute grid centers
-    dx = (xlims[1] - xlims[0]) / nx
-    dy = (ylims[1] - ylims[0]) / ny
-    xvals = np.linspace(xlims[0] + dx / 2, xlims[1] - dx / 2, nx)
-    yvals = np.linspace(ylims[0] + dy / 2, ylims[1] - dy / 2, ny)
-    xvals2, yvals2 = np.meshgrid(xvals, yvals)
+    plan = get_resample_plan(nside, xlims, ylims, nx, ny, src_crs, method=method, nest=nest,
+                             plan_dir=plan_dir, loglevel=loglevel)
 
-    # Transform to lat/lon
-    latlon = ccrs.PlateCarree().transform_points(
-        src_crs, xvals2, yvals2, np.zeros_like(xvals2)
-    )
-    valid = np.all(np.isfinite(latlon), axis=-1)
-    points = latlon[valid].T
+    logger.debug("Resampling HEALPix map to lat/lon grid with %d x %d points", nx, ny)
+    return plan.apply(var)
 
-    res = np.full(latlon.shape[:-1], np.nan, dtype=var.dtype)
 
-    logger.debug("Resampling HEALPix map to lat/lon grid with %d x %d points", nx, ny)
-    if method == "nearest":
-        pix = hp.ang2pix(
-            get_nside(var),
-            theta=points[0],
-            phi=points[1],
-            nest=nest,
-            lonlat=True,
-        )
-        if var.size < get_npix(var):
-            if not isinstance(var, xr.DataArray):
-                raise ValueError(
-                    "Sparse HEALPix grids are only supported as xr.DataArray"
-                )
-            res[valid] = var.sel(cell=pix, method="nearest").where(
-                lambda x: x.cell == pix
-            )
-        else:
-            res[valid] = var[pix]
-
-    elif method == "linear":
-        lons, lats = hp.pix2ang(
-            nside=get_nside(var),
-            ipix=np.arange(len(var)),
-            nest=nest,
-            lonlat=True,
-        )
-        lons = (lons + 180) % 360 - 180
+def display_pixels(figsize, dpi, fig=None, ax=None, ax_pos=(1, 1, 1)):
+    """
+    The size in pixels of the axes where data are displayed.
 
-        valid_src = ((lons > points[0].min()) & (lons < points[0].max())) | (
-            (lats > points[1].min()) & (lats < points[1].max())
-        )
+    Args:
+        figsize (tuple): Figure size in inches, used if fig is not given.
+        dpi (int): Resolution of the figure in dots per inch.
+        fig (plt.Figure, optional): The figure, if already created.
+        ax (plt.Axes, optional): The axes, if already created.
+        ax_pos (tuple, optional): Position of the axes to be created. Defaults to (1, 1, 1).
 
-        res[valid] = griddata(
-            points=np.asarray([lons[valid_src], lats[valid_src]]).T,
-            values=var[valid_src],
-            xi=(points[0], points[1]),
-            method="linear",
-            fill_value=np.nan,
-            rescale=True,
-        )
+    Returns:
+        tuple: width and height of the axes in pixels.
+    """
+    width, height = fig.get_size_inches() if fig is not None else figsize
+    if ax is not None:
+        box = ax.get_position()
+        return width * box.width * dpi, height * box.height * dpi
+    return width / ax_pos[1] * dpi, height / ax_pos[0] * dpi
+
+
+def coarsen_for_display(data, pixels, oversampling=2, loglevel="WARNING"):
+    """
+    Reduce data lazily with block means, so that each dimension keeps about
+    oversampling points per pixel of the figure. Nothing is loaded.
+
+    Args:
+        data (xarray.DataArray): Data to be displayed.
+        pixels (dict): Number of pixels of the figure along each dimension.
+        oversampling (int, optional): Points kept per pixel. Defaults to 2.
+        loglevel (str, optional): Log level.
 
-    result = xr.DataArray(res, coords=[("lat", yvals), ("lon", xvals)])
-    result.attrs = getattr(var, "attrs", {}).copy()
-    return result
+    Returns:
+        xarray.DataArray: The coarsened data.
+    """
+    logger = log_configure(loglevel, "coarsen_for_display")
+    for dim, npixels in pixels.items():
+        if dim not in data.dims or not npixels:
+            continue
+        factor = int(data.sizes[dim] // (oversampling * npixels))
+        if factor < 2:
+            continue
+        # incomplete blocks of datetimes cannot be padded
+        coord = data.coords.get(dim)
+        boundary = "trim" if coord is not None and np.issubdtype(coord.dtype, np.datetime64) else "pad"
+        logger.debug("Coarsening %s by %d for %d pixels", dim, factor, npixels)
+        data = data.coarsen({dim: factor}, boundary=boundary).mean()
+    return data
+
+
+def healpix_coarsen(var, nside_out):
+    """
+    Average a nested HEALPix map on the parent pixels at nside_out.
+
+    Args:
+        var (xarray.DataArray): Input HEALPix map, in nested ordering.
+        nside_out (int): nside of the output, a power of 2 smaller than the input nside.
+
+    Returns:
+        xarray.DataArray: The HEALPix map at nside_out.
+    """
+    dim = var.dims[-1]
+    nside = hp.npix2nside(var.sizes[dim])
+    if nside_out >= nside:
+        return var
+    # in nested ordering the children of a pixel are contiguous
+    out = var.coarsen({dim: (nside // nside_out) ** 2}).mean()
+    return out.drop_vars([name for name in out.coords if dim in out[name].dims])
+
+
+def coarsen_map_for_display(data, width, height, extent=None, oversampling=2, loglevel="WARNING"):
+    """
+    Reduce a map lazily to the resolution of the figure: regular lon/lat grids are
+    block averaged, nested HEALPix maps are averaged on their parent pixels.
+    Other grids are returned unchanged.
+
+    Args:
+        data (xarray.DataArray): Map to be displayed.
+        width (float): Width of the map in pixels.
+        height (float): Height of the map in pixels.
+        extent (list, optional): The displayed [lon_min, lon_max, lat_min, lat_max]. Defaults to the whole map.
+        oversampling (int, optional): Points kept per pixel. Defaults to 2.
+        loglevel (str, optional): Log level.
+
+    Returns:
+        xarray.DataArray: The coarsened map.
+    """
+    logger = log_configure(loglevel, "coarsen_for_display")
+
+    if data.ndim == 1 and hp.isnpixok(data.size):
+        crs = data.coords.get("crs")
+        if crs is not None and crs.attrs.get("healpix_order", "nest") != "nest":
+            logger.debug("HEALPix map in ring ordering, cannot be coarsened")
+            return data
+        fraction = (extent[1] - extent[0]) / 360 if extent else 1
+        # a HEALPix map has 4 * nside pixels along the equator, oversampling of them are kept per figure pixel
+        nside_out = 2 ** math.ceil(math.log2(max(1, oversampling * width / (4 * fraction))))
+        logger.debug("Coarsening HEALPix map to nside=%d for %d pixels", nside_out, width)
+        return healpix_coarsen(data, nside_out)
+
+    lon_name, lat_name = coord_names(data)
+    if lon_name not in data.dims or lat_name not in data.dims:
+        return data
+
+    pixels = {lon_name: width, lat_name: height}
+    if extent:
+        # only a fraction of the map is shown on the figure
+        for name, limits in [(lon_name, extent[:2]), (lat_name, extent[2:])]:
+            span = float(data[name].max() - data[name].min())
+            if span > 0:
+                pixels[name] /= min(1, abs(limits[1] - limits[0]) / span)
+    return coarsen_for_display(data, pixels, oversampling=oversampling, loglevel=loglevel)
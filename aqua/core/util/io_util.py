@@ -46,16 +46,33 @@ def create_folder(folder, loglevel="WARNING"):
         logger.info('Folder %s already exists', folder)
 
 
-def file_is_complete(filename, loglevel='WARNING'):
+INTEGRITY_MODES = ['metadata', 'sampled', 'full']
+
+
+def file_is_complete(filename, loglevel='WARNING', mode='full', ntime=None, nsamples=4):
     """
     Basic check to see if file exists and that includes values
     which are not NaN in its first variabiles
     Return a boolean that can be used as a flag for further operation
     A loglevel can be passed for tune the logging properties
 
+    Three levels of checks are available through the mode argument:
+    - 'metadata': only the header is inspected (variables, dimensions,
+      time length and decoding), no data values are read.
+    - 'sampled': on top of the metadata check, a few chunk-aligned blocks
+      are read for every timestep and their NaN counts are compared.
+      If the sampled check is not passed, the full check is run to confirm.
+    - 'full': the entire first variable is loaded and checked for NaN, as
+      done before the other modes were introduced. The header checks of the
+      other modes are not run, only the time length if ntime is provided.
+
     Args:
         filename: a string with the filename
         loglevel: the log level
+        mode (str): the integrity check mode, 'metadata', 'sampled' or 'full'.
+                    Default is 'full'.
+        ntime (int, optional): the expected length of the time dimension.
+        nsamples (int): number of blocks read per timestep in 'sampled' mode. Default is 4.
 
     Returns
         A boolean flag (True for file ok, False for file corrupted)
@@ -63,6 +80,9 @@ def file_is_complete(filename, loglevel='WARNING'):
 
     logger = log_configure(loglevel, 'file_is_complete')
 
+    if mode not in INTEGRITY_MODES:
+        raise ValueError(f'Integrity check mode {mode} not supported, use one of {INTEGRITY_MODES}')
+
     # check file existence
     if not os.path.isfile(filename):
         logger.info('File %s not found...', filename)
@@ -82,6 +102,20 @@ def file_is_complete(filename, loglevel='WARNING'):
         # check on a single variable
         varname = list(xfield.data_vars)[0]
 
+        if not _check_metadata(xfield[varname], ntime=ntime, header=mode != 'full', logger=logger):
+            logger.error('File %s has inconsistent metadata! Recomputing...', filename)
+            return False
+
+        if mode == 'metadata':
+            logger.info('File %s metadata seems ok!', filename)
+            return True
+
+        if mode == 'sampled':
+            if _check_sampled(xfield[varname], nsamples=nsamples, logger=logger):
+                logger.info('File %s seems ok!', filename)
+                return True
+            logger.info('Sampled check not passed for %s, running the full check...', filename)
+
         # all NaN case
         if xfield[varname].isnull().all():
 
@@ -127,6 +161,93 @@ def file_is_complete(filename, loglevel='WARNING'):
         return False
 
 
+def _check_metadata(xvar, ntime=None, header=True, logger=None):
+    """
+    Check the header of a variable without reading its values:
+    no empty dimensions, expected time length and decodable time axis.
+
+    Args:
+        xvar (xr.DataArray): the variable to be checked
+        ntime (int, optional): the expected length of the time dimension
+        header (bool): check empty dimensions and time decoding, otherwise only the time length
+        logger: the logger to be used
+
+    Returns:
+        bool: True if the metadata are consistent
+    """
+    empty = [dim for dim in xvar.dims if xvar.sizes[dim] == 0]
+    if header and empty:
+        logger.error('Dimension(s) %s have zero length', empty)
+        return False
+
+    if 'time' not in xvar.dims:
+        return True
+
+    if ntime is not None and xvar.sizes['time'] != ntime:
+        logger.error('Time dimension has length %s, expected %s', xvar.sizes['time'], ntime)
+        return False
+
+    # undecoded or half-written time axis are stored as plain numbers
+    if header and 'time' in xvar.coords and np.issubdtype(xvar['time'].dtype, np.number):
+        logger.error('Time axis cannot be decoded, encoding is %s', xvar['time'].encoding)
+        return False
+
+    return True
+
+
+def _check_sampled(xvar, nsamples=4, logger=None):
+    """
+    Check that a few chunk-aligned blocks of a variable have the same number
+    of NaN at every timestep and are not entirely NaN.
+    Blocks are aligned to the NetCDF chunking so that only the
+    selected chunks are decompressed.
+
+    Args:
+        xvar (xr.DataArray): the variable to be checked
+        nsamples (int): number of blocks to be read for each timestep
+        logger: the logger to be used
+
+    Returns:
+        bool: True if the sampled blocks are consistent, False if
+              a full check is required to decide
+    """
+    if 'time' not in xvar.dims:
+        return False
+
+    spatial = [dim for dim in xvar.dims if dim != 'time']
+    chunksizes = xvar.encoding.get('chunksizes')
+    if chunksizes is not None:
+        chunksizes = dict(zip(xvar.dims, chunksizes))
+    else:
+        # contiguous files: only the selected hyperslab is read anyway
+        chunksizes = {dim: min(xvar.sizes[dim], 64) for dim in spatial}
+
+    # deterministic sampling, so that repeated checks are reproducible
+    rng = np.random.default_rng(seed=0)
+    nan_count = np.zeros(xvar.sizes['time'], dtype=np.int64)
+    valid = 0
+    for _ in range(nsamples):
+        block = {}
+        for dim in spatial:
+            size, chunk = xvar.sizes[dim], chunksizes[dim]
+            start = rng.integers(0, -(-size // chunk)) * chunk
+            block[dim] = slice(start, min(start + chunk, size))
+        values = xvar.isel(block).transpose('time', *spatial).values
+        isnan = np.isnan(values).reshape(values.shape[0], -1)
+        nan_count += isnan.sum(axis=1)
+        valid += isnan.size - isnan.sum()
+
+    if valid == 0:
+        logger.debug('All sampled blocks are NaN')
+        return False
+
+    if not np.all(nan_count == nan_count[0]):
+        logger.debug('Sampled NaN count varies across timesteps: %s', nan_count)
+        return False
+
+    return True
+
+
 def normalize_key(key: str) -> str:
     """
     Normalize metadata key by removing leading '/' and converting to lowercase.
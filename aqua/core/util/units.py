@@ -1,11 +1,36 @@
 import os
+import logging
+from functools import lru_cache
+from types import MappingProxyType
 import xarray as xr
 from metpy.units import units
 from aqua.core.logger import log_configure, log_history
-from aqua.core.configurer import ConfigPath
+from aqua.core.configurer import ConfigLocator
 from .yaml import load_yaml
 
 
+# Unit pairs found in most ECMWF and CMOR fixes, converted when a Reader is created
+# so that the conversions of the fixer are found in the cache
+COMMON_CONVERSIONS = [
+    ('K', 'degC', None), ('degC', 'K', None), ('Pa', 'hPa', None), ('hPa', 'Pa', None),
+    ('m', 'mm', None), ('kg m**-2 s**-1', 'kg m-2 s-1', None), ('kg m-2 s-1', 'mm/day', None),
+    ('W m**-2', 'W m-2', None), ('J m**-2', 'W m-2', 3600), ('m', 'kg m-2 s-1', 3600),
+    ('m of water equivalent', 'kg m-2 s-1', 3600), ('kg m**-2', 'kg m-2 s-1', 3600),
+    ('m s**-1', 'm s-1', None), ('1', 'frac', None), ('(0 - 1)', 'frac', None),
+]
+
+
+@lru_cache(maxsize=8)
+def _unit_fixes(config_dir):
+    """The table of non-metpy units of the default.yaml fix file, loaded once per configuration folder"""
+    default_file = os.path.join(config_dir, "fixes", "default.yaml")
+
+    if not os.path.exists(default_file):
+        raise FileNotFoundError(f"Cannot find default.yaml in {os.path.dirname(default_file)}")
+
+    return load_yaml(default_file)['defaults']['units']['fix']
+
+
 def normalize_units(src, loglevel='WARNING'):
     """
     Get rid of stange grib units based on the default.yaml fix file
@@ -16,80 +41,59 @@ def normalize_units(src, loglevel='WARNING'):
     logger = log_configure(loglevel, 'normalize_units')
     src = str(src)
 
-    config_folder = ConfigPath().get_config_dir()
-    config_folder = os.path.join(config_folder, "fixes")
-    default_file = os.path.join(config_folder, "default.yaml")
-
-    if not os.path.exists(default_file):
-        raise FileNotFoundError(f"Cannot find default.yaml in {config_folder}")
-
-    default_dict = load_yaml(default_file)
-    fix_units = default_dict['defaults']['units']['fix']
-    for key in fix_units:
-        if key == src:
-            # return fixed
-            logger.info('Replacing non-metpy unit %s with %s', key, fix_units[key])
-            return src.replace(key, fix_units[key])
+    fix_units = _unit_fixes(ConfigLocator().configdir)
+    if src in fix_units:
+        # return fixed
+        logger.info('Replacing non-metpy unit %s with %s', src, fix_units[src])
+        return fix_units[src]
 
     # return original
     return src
 
 
-def convert_units(src, dst, deltat=None, var="input var", loglevel='WARNING'):
+@lru_cache(maxsize=1024)
+def _conversion(src, dst, deltat):
     """
-    Converts source to destination units using metpy.
-    Returns a dictionary with conversion factors and offsets.
-
-    Arguments:
-        src (str): Source units.
-        dst (str): Destination units.
-        deltat (float, optional): Time delta in seconds (needed for some unit conversions).
-        var (str): Variable name (optional, used only for diagnostic output).
-        loglevel (str): Log level for the logger. Default is 'WARNING'.
+    Compute with metpy the conversion between two normalized units.
+    Results are cached, so that pint is used only once per units pair and deltat.
 
     Returns:
-        dict: A dictionary with keys `factor`, `offset`, and possible extra flags
-              (e.g., `time_conversion_flag`).
+        tuple: the read-only conversion dictionary and the messages to be logged,
+               as (level, message, arguments) with the variable name as first argument
     """
-    logger = log_configure(loglevel, 'convert_units')
-    src = normalize_units(src, loglevel)
-    dst = normalize_units(dst, loglevel)
     factor = units(src).to_base_units() / units(dst).to_base_units()
 
     # Dictionary for storing conversion attributes
     conversion = {}
+    messages = []
 
     # Flag for time-dependent conversions
     if "second" in str(factor.units) and deltat is not None:
         conversion['time_conversion_flag'] = 1
         conversion['deltat'] = str(deltat)
     elif "second" in str(factor.units) and deltat is None:
-        logger.warning("Time-dependent conversion factor detected, but no accumulation time provided")
+        messages.append((logging.WARNING, "%s: time-dependent conversion factor detected, "
+                         "but no accumulation time provided", ()))
 
     if factor.units == units('dimensionless'):
         offset = (0 * units(src)).to(units(dst)) - (0 * units(dst))
     else:
         if factor.units == "meter ** 3 / kilogram":
             factor *= 1000 * units("kg m-3")
-            if logger:
-                logger.debug("%s: corrected multiplying by density of water 1000 kg m-3", var)
+            messages.append((logging.DEBUG, "%s: corrected multiplying by density of water 1000 kg m-3", ()))
         elif factor.units == "meter ** 3 * second / kilogram":
             factor *= 1000 * units("kg m-3") / (deltat * units("s"))
-            if logger:
-                logger.debug("%s: corrected multiplying by density of water 1000 kg m-3", var)
-                logger.info("%s: corrected dividing by accumulation time %s s", var, deltat)
+            messages.append((logging.DEBUG, "%s: corrected multiplying by density of water 1000 kg m-3", ()))
+            messages.append((logging.INFO, "%s: corrected dividing by accumulation time %s s", (deltat,)))
         elif factor.units == "second":
             factor /= deltat * units("s")
-            if logger:
-                logger.debug("%s: corrected dividing by accumulation time %s s", var, deltat)
+            messages.append((logging.DEBUG, "%s: corrected dividing by accumulation time %s s", (deltat,)))
         elif factor.units == "kilogram / meter ** 3":
             factor /= 1000 * units("kg m-3")
-            if logger:
-                logger.debug("%s: corrected dividing by density of water 1000 kg m-3", var)
+            messages.append((logging.DEBUG, "%s: corrected dividing by density of water 1000 kg m-3", ()))
         else:
-            if logger:
-                logger.debug("%s: incommensurate units converting %s to %s --> %s",
-                             var, src, dst, factor.units)
+            messages.append((logging.DEBUG, "%s: incommensurate units converting %s to %s --> %s",
+                             (src, dst, factor.units)))
         offset = 0 * units(dst)
 
     # Store non-default conversion factors and offsets
@@ -98,7 +102,51 @@ def convert_units(src, dst, deltat=None, var="input var", loglevel='WARNING'):
     elif factor.magnitude != 1:
         conversion['factor'] = factor.magnitude
 
-    return conversion
+    return MappingProxyType(conversion), tuple(messages)
+
+
+def convert_units(src, dst, deltat=None, var="input var", loglevel='WARNING'):
+    """
+    Converts source to destination units using metpy.
+    Returns a dictionary with conversion factors and offsets.
+    Conversions are cached by normalized units and deltat.
+
+    Arguments:
+        src (str): Source units.
+        dst (str): Destination units.
+        deltat (float, optional): Time delta in seconds (needed for some unit conversions).
+        var (str): Variable name (optional, used only for diagnostic output).
+        loglevel (str): Log level for the logger. Default is 'WARNING'.
+
+    Returns:
+        dict: A dictionary with keys `factor`, `offset`, and possible extra flags
+              (e.g., `time_conversion_flag`).
+    """
+    logger = log_configure(loglevel, 'convert_units')
+    src = normalize_units(src, loglevel)
+    dst = normalize_units(dst, loglevel)
+    conversion, messages = _conversion(src, dst, deltat)
+
+    for level, message, args in messages:
+        logger.log(level, message, var, *args)
+
+    # a copy, since callers may update it
+    return dict(conversion)
+
+
+def warm_units_cache(conversions=None):
+    """
+    Fill the conversion cache with the most common unit pairs.
+    Pairs which cannot be converted with the current registry are skipped.
+
+    Arguments:
+        conversions (list, optional): (src, dst, deltat) tuples. Defaults to COMMON_CONVERSIONS.
+    """
+    for src, dst, deltat in conversions or COMMON_CONVERSIONS:
+        try:
+            convert_units(src, dst, deltat=deltat, loglevel='ERROR')
+        except (ValueError, KeyError, AttributeError, TypeError) as err:
+            log_configure('WARNING', 'warm_units_cache').debug('Cannot convert %s to %s: %s', src, dst, err)
 
 
 def convert_data_units(data, var: str, units: str, loglevel: str = 'WARNING'):
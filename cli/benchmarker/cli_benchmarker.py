@@ -1,23 +1,36 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 '''
-AQUA tool to evalute speedo of some methods
+AQUA tool to evaluate the performance of some methods on synthetic sources.
+Results are stored in a JSON file that can be compared with a previous run
+to detect performance regressions across commits.
 '''
 
 import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
 import sys
-from timeit import timeit
+import tempfile
+import tracemalloc
+from time import perf_counter
 import dask
 from dask.distributed import Client, LocalCluster
-from aqua import Reader
+from aqua import Reader, Drop
 from aqua import __version__ as version
 from aqua.core.logger import log_configure
+from synthetic import SyntheticCatalog, CATALOG, MODEL, EXP, GRIDS
 
 print('AQUA version is: ' + version)
 
+BENCHMARKS = ['reader', 'retrieve', 'regrid', 'fldmean', 'timmean', 'histogram', 'drop']
+
+
 def parse_arguments(arguments):
     """
-    Parse command line arguments for the DROP CLI
+    Parse command line arguments for the Benchmarker CLI
     """
 
     parser = argparse.ArgumentParser(description='AQUA Benchmarker')
@@ -25,25 +38,40 @@ def parse_arguments(arguments):
                         help='number of dask workers')
     parser.add_argument('-l', '--loglevel', type=str, default='WARNING',
                         help='log level [default: WARNING]')
-
+    parser.add_argument('-n', '--nrepeat', type=int, default=3,
+                        help='number of repetitions of each benchmark [default: 3]')
+    parser.add_argument('-g', '--grids', nargs='+', default=GRIDS, choices=GRIDS,
+                        help='synthetic grids to be benchmarked')
+    parser.add_argument('-b', '--benchmarks', nargs='+', default=BENCHMARKS, choices=BENCHMARKS,
+                        help='benchmarks to be run')
+    parser.add_argument('--nyears', type=int, default=1,
+                        help='years of synthetic data [default: 1]')
+    parser.add_argument('--workdir', type=str, default=None,
+                        help='folder where the aqua-synthetic folder with data and outputs is created '
+                             '[default: temporary folder]')
+    parser.add_argument('-o', '--output', type=str, default=None,
+                        help='JSON file where to store the results [default: benchmark-<version>-<commit>.json]')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='JSON file of a previous run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='slowdown ratio flagged as regression [default: 1.2]')
 
     return parser.parse_args(arguments)
 
 
 class Benchmarker():
     """
-    A class for benchmarking tasks.
+    A class for benchmarking tasks on synthetic sources.
 
     Attributes:
-        model (str): The model to be benchmarked.
-        exp (str): The experiment to be performed.
-        source (str): The source of the benchmark data.
+        workdir (str): The folder hosting the synthetic data and DROP outputs.
         nproc (int): The number of processes to be used.
         nrepeat (int): The number of times to repeat the benchmark.
         loglevel (str): The log level for logging messages.
         logger (Logger): The logger object for logging messages.
         cluster (LocalCluster): The dask cluster object.
         client (Client): The dask client object.
+        results (list): The results of the benchmarks.
     """
 
     @property
@@ -51,28 +79,24 @@ class Benchmarker():
         """Check if dask is needed"""
         return self.nproc > 1
 
-    def __init__(self, model=None, exp=None, source=None,
-                 nproc=1, nrepeat=5, loglevel='WARNING'):
+    def __init__(self, workdir, nproc=1, nrepeat=3, loglevel='WARNING'):
         """
         Initialize the Benchmarker object.
 
         Args:
-            model (str, optional): The model to be benchmarked.
-            exp (str, optional): The experiment to be performed.
-            source (str, optional): The source of the benchmark data.
+            workdir (str): The folder hosting the synthetic data and DROP outputs.
             nproc (int, optional): The number of processes to be used.
             nrepeat (int, optional): The number of times to repeat the benchmark.
             loglevel (str, optional): The log level for logging messages.
         """
-        self.logger = log_configure(loglevel, 'daske')
+        self.logger = log_configure(loglevel, 'Benchmarker')
         self.loglevel = loglevel
+        self.workdir = workdir
         self.nproc = nproc
+        self.nrepeat = nrepeat
         self.cluster = None
         self.client = None
-        self.model = model
-        self.exp = exp
-        self.source = source
-        self.nrepeat = nrepeat
+        self.results = []
 
     def set_dask(self):
         """
@@ -80,8 +104,6 @@ class Benchmarker():
         """
         if self.dask:  # self.nproc > 1
             self.logger.info('Setting up dask cluster with %s workers', self.nproc)
-            #dask.config.set({'temporary_directory': self.tmpdir})
-            #self.logger.info('Temporary directory: %s', self.tmpdir)
             self.cluster = LocalCluster(n_workers=self.nproc,
                                         threads_per_worker=1)
             self.client = Client(self.cluster)
@@ -98,58 +120,176 @@ class Benchmarker():
             self.cluster.close()
             self.logger.info('Dask cluster closed')
 
-    def benchmark_reader(self):
+    def measure(self, name, source, func):
         """
-        Benchmark the reader.
-        """
-        self.logger.info('Benchmarking reader')
-        single = timeit(lambda: Reader(self.model, self.exp, self.source), number=self.nrepeat)
-        return round(single / self.nrepeat, 1)
-    
-    def benchmark_fldmean(self, tsteps=100):
-        """
-        Benchmark the fldmean method.
-        """
-        self.logger.info('Benchmarking fldmean')
-        reader = Reader(self.model, self.exp, self.source)
-        single = timeit(lambda: reader.retrieve(var='2t').isel(time=slice(0,tsteps)).aqua.fldmean().compute(),
-                                number=self.nrepeat)
-        return round(single / self.nrepeat, 1)
+        Run a function nrepeat times measuring the durations, then once more tracing the peak of memory,
+        so that the overhead of tracemalloc does not affect the timings.
+        Memory is traced on the main process only: with dask workers it does not include
+        the memory used by the workers.
 
-    def benchmark_regrid(self, tsteps=50):
-        """
-        Benchmark the regrid method.
+        Args:
+            name (str): The name of the benchmark.
+            source (str): The synthetic source benchmarked.
+            func (callable): The function to be benchmarked.
+
+        Returns:
+            dict: the benchmark result
         """
-        self.logger.info('Benchmarking regrid')
-        reader = Reader(self.model, self.exp, self.source, regrid='r100')
-        single = timeit(lambda: reader.retrieve(var='2t').isel(time=slice(0,tsteps)).aqua.regrid().compute(),
-                                number=self.nrepeat)
-        return round(single / self.nrepeat, 1)
+        self.logger.info('Benchmarking %s on %s', name, source)
+        durations = []
+        for _ in range(self.nrepeat):
+            tstart = perf_counter()
+            func()
+            durations.append(perf_counter() - tstart)
+
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1] / 2**20
+        finally:
+            tracemalloc.stop()
+
+        result = {'benchmark': name, 'source': source,
+                  'mean': sum(durations) / len(durations),
+                  'min': min(durations), 'max': max(durations),
+                  'peak_memory_mib': peak}
+        self.results.append(result)
+        print(f"{name:>10} on {source:<12} took on average {result['mean']:.3f} seconds "
+              f"over {self.nrepeat} runs, peak memory {result['peak_memory_mib']:.1f} MiB")
+        return result
+
+    def _reader(self, source, **kwargs):
+        """Reader on the synthetic catalog"""
+        return Reader(catalog=CATALOG, model=MODEL, exp=EXP, source=source,
+                      loglevel=self.loglevel, **kwargs)
+
+    def benchmark_reader(self, source):
+        """Benchmark the Reader initialization"""
+        return self.measure('reader', source, lambda: self._reader(source))
+
+    def benchmark_retrieve(self, source):
+        """Benchmark the retrieve and loading of 2D and 3D variables"""
+        reader = self._reader(source)
+        return self.measure('retrieve', source, lambda: reader.retrieve(var=['2t', 't']).load())
+
+    def benchmark_regrid(self, source):
+        """Benchmark the regrid of a 3D variable"""
+        reader = self._reader(source, regrid='r100')
+        data = reader.retrieve(var='t')
+        return self.measure('regrid', source, lambda: reader.regrid(data['t']).compute())
+
+    def benchmark_fldmean(self, source):
+        """Benchmark the field mean of a 3D variable"""
+        reader = self._reader(source)
+        data = reader.retrieve(var='t')
+        return self.measure('fldmean', source, lambda: reader.fldmean(data['t']).compute())
+
+    def benchmark_timmean(self, source):
+        """Benchmark the monthly mean of a 3D variable"""
+        reader = self._reader(source)
+        data = reader.retrieve(var='t')
+        return self.measure('timmean', source, lambda: reader.timmean(data['t'], freq='monthly').compute())
+
+    def benchmark_histogram(self, source):
+        """Benchmark the histogram of a 2D variable"""
+        reader = self._reader(source)
+        data = reader.retrieve(var='2t')
+        return self.measure('histogram', source,
+                            lambda: reader.histogram(data['2t'], bins=100, range=(200, 320),
+                                                     weighted=False).compute())
+
+    def benchmark_drop(self, source):
+        """Benchmark the end-to-end generation of monthly r100 DROP output"""
+        outdir = os.path.join(self.workdir, 'drop')
+
+        def run():
+            drop = Drop(catalog=CATALOG, model=MODEL, exp=EXP, source=source, var='2t',
+                        resolution='r100', frequency='monthly', outdir=outdir,
+                        tmpdir=os.path.join(self.workdir, 'tmp'), nproc=self.nproc,
+                        definitive=True, overwrite=True, loglevel=self.loglevel)
+            drop.retrieve()
+            drop.drop_generator()
+
+        return self.measure('drop', source, run)
+
+
+def compare_results(current, previous, threshold=1.2):
+    """
+    Compare two sets of benchmark results
+
+    Args:
+        current (list): the results of the current run
+        previous (list): the results of the previous run
+        threshold (float): the ratio of durations above which a regression is flagged
+
+    Returns:
+        list: the (benchmark, source, ratio) flagged as regressions
+    """
+    reference = {(res['benchmark'], res['source']): res for res in previous}
+    regressions = []
+    print(f"{'benchmark':>10} {'source':<12} {'previous':>10} {'current':>10} {'ratio':>6}")
+    for res in current:
+        key = (res['benchmark'], res['source'])
+        if key not in reference:
+            continue
+        ratio = res['mean'] / reference[key]['mean']
+        flag = ' <-- regression' if ratio > threshold else ''
+        print(f"{key[0]:>10} {key[1]:<12} {reference[key]['mean']:>10.3f} {res['mean']:>10.3f} {ratio:>6.2f}{flag}")
+        if ratio > threshold:
+            regressions.append((*key, ratio))
+    return regressions
+
+
+def git_commit():
+    """Return the short hash of the current commit, if available"""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return 'unknown'
 
 
 if __name__ == '__main__':
 
     args = parse_arguments(sys.argv[1:])
     logger = log_configure(args.loglevel, 'benchmarker')
-    model = 'ICON'
-    exp = 'historical-1990'
-    source = 'hourly-hpz10-atm2d'
-
-    # create benchmarker object
-    Bench = Benchmarker(model = model, exp = exp, source = source,
-                        nproc = int(args.workers), loglevel = args.loglevel)
-    
-    # create a list of methods and their names
-    methods = [(Bench.benchmark_reader, 'Reader initialization'),
-               (Bench.benchmark_fldmean, 'Fldmean'),
-               (Bench.benchmark_regrid, 'Regrid')]
-
-    # loop over the methods
-    for method, name in methods:
-        Bench.set_dask()
-        time = method()
-        Bench.close_dask()
-        print(f"{name} took on average {time} seconds over {Bench.nrepeat} runs")
 
-    print('All benchmarks done')
+    workdir = args.workdir if args.workdir else tempfile.mkdtemp(prefix='aqua-benchmark-')
+    synthetic = SyntheticCatalog(workdir, grids=args.grids, nyears=args.nyears, loglevel=args.loglevel)
+    os.environ['AQUA_CONFIG'] = synthetic.create()
+    logger.info('Synthetic configuration created in %s', synthetic.configdir)
+
+    # create benchmarker object, the DROP outputs are written in the synthetic folder
+    Bench = Benchmarker(workdir=synthetic.basedir, nproc=int(args.workers),
+                        nrepeat=args.nrepeat, loglevel=args.loglevel)
 
+    # loop over the sources and the methods
+    for source in synthetic.sources:
+        for benchmark in args.benchmarks:
+            # DROP sets up its own dask cluster
+            if benchmark == 'drop':
+                Bench.benchmark_drop(source)
+                continue
+            Bench.set_dask()
+            getattr(Bench, f'benchmark_{benchmark}')(source)
+            Bench.close_dask()
+
+    commit = git_commit()
+    output = args.output if args.output else f'benchmark-{version}-{commit}.json'
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'aqua_version': version, 'commit': commit,
+                   'machine': platform.node(), 'python': platform.python_version(),
+                   'workers': Bench.nproc, 'nyears': args.nyears,
+                   'max_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                   'results': Bench.results}, f, indent=2)
+    print(f'Results stored in {output}')
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"Comparing with AQUA {previous['aqua_version']} commit {previous['commit']}")
+        if compare_results(Bench.results, previous['results'], threshold=args.threshold):
+            sys.exit(1)
+
+    print('All benchmarks done')
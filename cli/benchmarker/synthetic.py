@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+'''
+Synthetic AQUA configuration for the benchmarker.
+It creates a self-contained configuration folder with a 'benchmark' catalog
+hosting regular, HEALPix and curvilinear sources with 2D and 3D variables,
+so that benchmarks do not depend on any HPC data.
+'''
+
+import os
+import shutil
+import healpy as hp
+import numpy as np
+import pandas as pd
+import xarray as xr
+import aqua
+from aqua.core.util import dump_yaml, create_folder
+from aqua.core.logger import log_configure
+
+CATALOG = 'benchmark'
+MODEL = 'BENCH'
+EXP = 'synthetic'
+GRIDS = ['lonlat', 'healpix', 'curvilinear']
+CONFIG_DIRECTORIES = ['catgen', 'data_model', 'fixes', 'grids', 'styles']
+# the folder created inside the working directory, the only one ever removed
+SYNTHETIC_DIR = 'aqua-synthetic'
+# the file marking a folder created by SyntheticCatalog
+MARKER = '.aqua-synthetic'
+
+
+class SyntheticCatalog():
+    """
+    Build an AQUA configuration folder with synthetic sources.
+
+    Attributes:
+        basedir (str): The folder hosting configuration, data, areas and weights,
+                       a dedicated subfolder of the working directory.
+        configdir (str): The AQUA configuration folder, to be exported as AQUA_CONFIG.
+        sources (list): The names of the sources available in the catalog.
+    """
+
+    def __init__(self, workdir, grids=None, nyears=1, freq='6h', nlev=8,
+                 resolution=2., zoom=5, loglevel='WARNING'):
+        """
+        Initialize the SyntheticCatalog object.
+
+        Args:
+            workdir (str): The working directory, where the dedicated folder is created.
+            grids (list, optional): The grids to be generated, among 'lonlat', 'healpix' and 'curvilinear'.
+            nyears (int, optional): The number of years of data, one file per year.
+            freq (str, optional): The pandas frequency of the data.
+            nlev (int, optional): The number of pressure levels of the 3D variable.
+            resolution (float, optional): The resolution in degrees of the lonlat and curvilinear grids.
+            zoom (int, optional): The zoom of the HEALPix grid.
+            loglevel (str, optional): The log level for logging messages.
+        """
+        self.logger = log_configure(loglevel, 'SyntheticCatalog')
+        self.basedir = os.path.join(os.path.abspath(workdir), SYNTHETIC_DIR)
+        self.configdir = os.path.join(self.basedir, 'config')
+        self.grids = grids if grids else GRIDS
+        self.nyears = nyears
+        self.freq = freq
+        self.nlev = nlev
+        self.resolution = resolution
+        self.zoom = zoom
+        self.sources = list(self.grids)
+
+    def create(self):
+        """
+        Create configuration, grids, data and catalog.
+        A previous synthetic folder is replaced, any other existing folder is never removed.
+
+        Returns:
+            str: the configuration folder
+
+        Raises:
+            FileExistsError: if the folder exists and was not created by SyntheticCatalog
+        """
+        if os.path.exists(self.basedir):
+            if not os.path.isfile(os.path.join(self.basedir, MARKER)):
+                raise FileExistsError(f'{self.basedir} exists and was not created by the benchmarker, '
+                                      'please remove it or choose another working directory')
+            shutil.rmtree(self.basedir)
+        create_folder(self.basedir)
+        with open(os.path.join(self.basedir, MARKER), 'w', encoding='utf-8') as f:
+            f.write('Synthetic AQUA configuration created by the benchmarker\n')
+        self._create_config()
+        grids = {}
+        catalog = {}
+        for grid in self.grids:
+            self.logger.info('Generating synthetic %s data', grid)
+            datadir = os.path.join(self.basedir, 'data', grid)
+            create_folder(datadir)
+            field = getattr(self, f'_{grid}_field')()
+            for year in range(2000, 2000 + self.nyears):
+                self._make_dataset(field, year).to_netcdf(os.path.join(datadir, f'{grid}_{year}.nc'))
+            gridfile = os.path.join(self.basedir, 'data', f'{grid}_grid.nc')
+            field.to_dataset(name='grid').to_netcdf(gridfile)
+            grids[f'bench-{grid}'] = {'path': {'2d': gridfile}, 'space_coord': list(field.dims)}
+            if grid == 'healpix':
+                grids[f'bench-{grid}']['cdo_options'] = '--force'
+            catalog[grid] = {
+                'description': f'Synthetic {grid} source with 2D and 3D variables',
+                'driver': 'netcdf',
+                'args': {
+                    'urlpath': os.path.join(datadir, f'{grid}_*.nc'),
+                    'chunks': {'time': 'auto'},
+                    'xarray_kwargs': {'decode_times': True, 'combine': 'by_coords'}
+                },
+                'metadata': {'source_grid_name': f'bench-{grid}', 'fixer_name': False}
+            }
+
+        dump_yaml(os.path.join(self.configdir, 'grids', 'benchmark.yaml'), {'grids': grids})
+        self._create_catalog(catalog)
+        return self.configdir
+
+    def _create_config(self):
+        """Copy the AQUA core configuration and write the main configuration file"""
+        corepath = os.path.join(os.path.dirname(aqua.core.__file__), 'config')
+        for directory in CONFIG_DIRECTORIES:
+            shutil.copytree(os.path.join(corepath, directory), os.path.join(self.configdir, directory))
+
+        dump_yaml(os.path.join(self.configdir, 'config-aqua.yaml'), {
+            'catalog': [CATALOG],
+            'machine': CATALOG,
+            'reader': {
+                'catalog': '{{ configdir }}/catalogs/{{ catalog }}/catalog.yaml',
+                'machine': '{{ configdir }}/catalogs/{{ catalog }}/machine.yaml',
+                'fixer': '{{ configdir }}/fixes',
+                'regrid': '{{ configdir }}/grids'
+            },
+            'options': {'style': 'aqua'}
+        })
+
+    def _create_catalog(self, sources):
+        """Write the intake catalog files and the machine file"""
+        catdir = os.path.join(self.configdir, 'catalogs', CATALOG)
+        modeldir = os.path.join(catdir, 'catalog', MODEL)
+        create_folder(modeldir)
+
+        dump_yaml(os.path.join(catdir, 'catalog.yaml'), {'sources': {MODEL: {
+            'description': 'Synthetic benchmark model',
+            'driver': 'yaml_file_cat',
+            'args': {'path': f'{{{{CATALOG_DIR}}}}/catalog/{MODEL}/main.yaml'}}}})
+        dump_yaml(os.path.join(modeldir, 'main.yaml'), {'sources': {EXP: {
+            'description': 'Synthetic benchmark experiment',
+            'driver': 'yaml_file_cat',
+            'args': {'path': f'{{{{CATALOG_DIR}}}}/{EXP}.yaml'}}}})
+        dump_yaml(os.path.join(modeldir, f'{EXP}.yaml'), {'sources': sources})
+
+        paths = {key: os.path.join(self.basedir, key) for key in ['areas', 'weights', 'grids']}
+        for path in paths.values():
+            create_folder(path)
+        dump_yaml(os.path.join(catdir, 'machine.yaml'), {CATALOG: {'intake': {}, 'paths': paths}})
+
+    def _make_dataset(self, field, year):
+        """Create one year of data with a 2D and a 3D variable from a reference field"""
+        time = pd.date_range(f'{year}-01-01', f'{year + 1}-01-01', freq=self.freq, inclusive='left')
+        plev = np.linspace(100000, 10000, self.nlev)
+        rng = np.random.default_rng(seed=year)
+        cycle = xr.DataArray(10 * np.sin(2 * np.pi * time.dayofyear / 365.), coords={'time': time})
+
+        tas = (field + cycle).astype(np.float32)
+        tas = tas + rng.normal(scale=0.5, size=tas.shape).astype(np.float32)
+        tas.attrs = {'units': 'K', 'long_name': '2 metre temperature'}
+
+        lapse = xr.DataArray(np.log(plev / 100000.) * 30, coords={'plev': plev})
+        ta = (tas.expand_dims(plev=plev, axis=1) + lapse).astype(np.float32)
+        ta.attrs = {'units': 'K', 'long_name': 'Temperature'}
+        ta['plev'].attrs = {'units': 'Pa', 'standard_name': 'air_pressure', 'positive': 'down'}
+
+        data = xr.Dataset({'2t': tas, 't': ta})
+        return data.transpose('time', 'plev', ...)
+
+    @staticmethod
+    def _temperature(lat):
+        """A zonal temperature profile"""
+        return 250. + 50. * np.cos(np.radians(lat))
+
+    def _lonlat_field(self):
+        """Reference field on a regular grid"""
+        lon = np.arange(0, 360, self.resolution) + self.resolution / 2
+        lat = np.arange(-90, 90, self.resolution) + self.resolution / 2
+        field = xr.DataArray(self._temperature(lat)[:, None] * np.ones(lon.size),
+                             dims=('lat', 'lon'), coords={'lat': lat, 'lon': lon})
+        field['lon'].attrs = {'units': 'degrees_east', 'standard_name': 'longitude'}
+        field['lat'].attrs = {'units': 'degrees_north', 'standard_name': 'latitude'}
+        return field
+
+    def _curvilinear_field(self):
+        """Reference field on a curvilinear grid, a regular grid with distorted coordinates"""
+        x = np.arange(0, 360, self.resolution) + self.resolution / 2
+        y = np.arange(-80, 80, self.resolution) + self.resolution / 2
+        xx, yy = np.meshgrid(x, y)
+        lon = (xx + 5 * np.sin(np.radians(yy))) % 360
+        lat = yy + 2 * np.sin(np.radians(xx))
+        field = xr.DataArray(self._temperature(lat), dims=('y', 'x'),
+                             coords={'lon': (('y', 'x'), lon), 'lat': (('y', 'x'), lat)})
+        field['lon'].attrs = {'units': 'degrees_east', 'standard_name': 'longitude'}
+        field['lat'].attrs = {'units': 'degrees_north', 'standard_name': 'latitude'}
+        return field
+
+    def _healpix_field(self):
+        """Reference field on a nested HEALPix grid, at the latitude of the pixel centers"""
+        nside = 2**self.zoom
+        npix = 12 * nside**2
+        _, lat = hp.pix2ang(nside, np.arange(npix), nest=True, lonlat=True)
+        field = xr.DataArray(self._temperature(lat), dims=('cell',))
+        field.attrs = {'grid_mapping': 'crs'}
+        field = field.assign_coords(crs=xr.DataArray(np.int8(0), attrs={
+            'grid_mapping_name': 'healpix', 'healpix_nside': nside, 'healpix_order': 'nest'}))
+        return field
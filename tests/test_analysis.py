@@ -4,9 +4,10 @@ Test some utilities and functions in the aqua.analysis module.
 The more structured test of aqua analysis console command is
 in tests/test_console.py
 """
+import time
 import pytest
 from aqua.core.logger import log_configure
-from aqua.core.analysis import run_command, run_diagnostic_func
+from aqua.core.analysis import run_command, run_diagnostic_func, ToolScheduler, ToolTask, DiagnosticPool
 from aqua.core.analysis.analysis import _build_extra_args
 
 logger = log_configure("DEBUG", "test_analysis")
@@ -80,3 +81,114 @@ def test_build_extra_args_without_dates():
     assert '--catalog test_catalog' in result
     assert '--startdate' not in result
     assert '--enddate' not in result
+
+
+def test_tool_scheduler():
+    """Test the dependencies and the budget of the ToolScheduler."""
+    order = []
+    active = []
+    peak = []
+
+    def tool(name, code=0):
+        def func():
+            active.append(name)
+            peak.append(len(active))
+            time.sleep(0.05)
+            order.append(name)
+            active.remove(name)
+            return code
+        return func
+
+    scheduler = ToolScheduler(max_workers=2, loglevel='DEBUG')
+    scheduler.add(ToolTask('diag1', 'second', tool('second'), depends=['first']))
+    scheduler.add(ToolTask('diag1', 'first', tool('first')))
+    scheduler.add(ToolTask('diag2', 'other', tool('other', code=1)))
+    scheduler.add(ToolTask('diag3', 'after', tool('after'), depends=['diag1']))
+    scheduler.add(ToolTask('diag3', 'failed', tool('failed'), depends=['diag2.other']))
+    scheduler.add(ToolTask('diag4', 'big', tool('big'), nworkers=8))
+    tasks = {task.name: task for task in scheduler.run()}
+
+    assert order.index('first') < order.index('second') < order.index('after')
+    assert max(peak) <= 2
+    assert tasks['diag2-other'].status == 'failed'
+    assert tasks['diag3-failed'].status == 'skipped'
+    assert tasks['diag4-big'].status == 'done'
+    assert all(tasks[name].duration > 0 for name in ['diag1-first', 'diag1-second', 'diag3-after'])
+
+
+
+def test_tool_scheduler_chain():
+    """Test that a failure skips the whole chain of dependencies and that after only sets the order."""
+    order = []
+
+    def tool(name, code=0):
+        def func():
+            time.sleep(0.01)
+            order.append(name)
+            return code
+        return func
+
+    scheduler = ToolScheduler(max_workers=4, loglevel='DEBUG')
+    scheduler.add(ToolTask('d', 'c', tool('c'), depends=['b']))
+    scheduler.add(ToolTask('d', 'b', tool('b'), depends=['a']))
+    scheduler.add(ToolTask('d', 'a', tool('a', code=1)))
+    scheduler.add(ToolTask('e', 'second', tool('second'), after=['e-first']))
+    scheduler.add(ToolTask('e', 'first', tool('first', code=1)))
+    tasks = {task.name: task for task in scheduler.run()}
+
+    assert tasks['d-a'].status == 'failed'
+    assert tasks['d-b'].status == 'skipped'
+    assert tasks['d-c'].status == 'skipped'
+    assert tasks['e-second'].status == 'done'
+    assert order.index('first') < order.index('second')
+    assert 'b' not in order and 'c' not in order
+
+
+def test_diagnostic_pool(tmp_path):
+    """Test running scripts in the warm DiagnosticPool."""
+    script = tmp_path / 'tool.py'
+    # the tool changes the environment and the logging, which must not leak to the next tool
+    script.write_text("import os, sys, logging\nprint('args', sys.argv[1:])\nprint('pid', os.getpid())\n"
+                      "print('leaked', 'AQUA_TOOL_TEST' in os.environ, len(logging.getLogger().handlers))\n"
+                      "os.environ['AQUA_TOOL_TEST'] = '1'\nlogging.getLogger().addHandler(logging.NullHandler())\n"
+                      "sys.exit(int(sys.argv[2]))\n")
+
+    class Recorder():
+        """Logger recording the debug messages"""
+        def __init__(self):
+            self.lines = []
+
+        def debug(self, msg, *args):
+            self.lines.append(msg % args)
+
+        def info(self, msg, *args):
+            pass
+
+        error = info
+
+    pids = []
+    with DiagnosticPool(processes=1, modules=[], loglevel='DEBUG') as pool:
+        for code in [0, 3]:
+            logfile = tmp_path / f'tool-{code}.log'
+            recorder = Recorder()
+            res = pool.run(diagnostic='tool', script_path=str(script), extra_args=f'--code {code}',
+                           loglevel='INFO', logger=recorder, logfile=str(logfile))
+            assert res == code
+            assert f"args ['--code', '{code}', '-l', 'INFO']" in logfile.read_text()
+            # the output is streamed to the logger as by run_diagnostic
+            assert f"[tool] args ['--code', '{code}', '-l', 'INFO']" in recorder.lines
+            pids.extend(line.split()[-1] for line in recorder.lines if line.startswith('[tool] pid'))
+            assert '[tool] leaked False 0' in recorder.lines
+
+    # by default the worker is kept warm for the next tool
+    assert len(set(pids)) == 1
+
+    # with tasks_per_process=1 each tool runs in a fresh worker
+    pids = []
+    with DiagnosticPool(processes=1, modules=[], tasks_per_process=1, loglevel='DEBUG') as pool:
+        for code in [0, 3]:
+            recorder = Recorder()
+            pool.run(diagnostic='tool', script_path=str(script), extra_args=f'--code {code}',
+                     loglevel='INFO', logger=recorder, logfile=str(tmp_path / f'fresh-{code}.log'))
+            pids.extend(line.split()[-1] for line in recorder.lines if line.startswith('[tool] pid'))
+    assert len(set(pids)) == 2
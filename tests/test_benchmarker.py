@@ -0,0 +1,61 @@
+"""Smoke test for the benchmarker and its synthetic catalog"""
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'cli', 'benchmarker'))
+from synthetic import SyntheticCatalog, SYNTHETIC_DIR  # noqa: E402
+from cli_benchmarker import Benchmarker, compare_results  # noqa: E402
+
+pytestmark = pytest.mark.aqua
+
+
+def test_synthetic_catalog_keeps_workdir(tmp_path):
+    """The synthetic folder is created inside the working directory, whose files are never removed"""
+    userfile = tmp_path / 'precious.txt'
+    userfile.write_text('user data')
+
+    synthetic = SyntheticCatalog(str(tmp_path), grids=['lonlat'], freq='1D', nlev=2, resolution=30.)
+    assert synthetic.basedir == os.path.join(str(tmp_path), SYNTHETIC_DIR)
+    synthetic.create()
+    synthetic.create()  # a previous synthetic folder is replaced
+    assert userfile.read_text() == 'user data'
+    assert os.path.exists(os.path.join(synthetic.configdir, 'config-aqua.yaml'))
+
+    # an existing folder not created by the benchmarker is not removed
+    other = tmp_path / 'other'
+    (other / SYNTHETIC_DIR).mkdir(parents=True)
+    with pytest.raises(FileExistsError):
+        SyntheticCatalog(str(other), grids=['lonlat']).create()
+
+
+def test_benchmarker_smoke(tmp_path, monkeypatch):
+    """Run a couple of benchmarks on a small synthetic source and compare the results"""
+    synthetic = SyntheticCatalog(str(tmp_path), grids=['lonlat'], freq='1D', nlev=2, resolution=30.)
+    monkeypatch.setenv('AQUA_CONFIG', synthetic.create())
+
+    bench = Benchmarker(workdir=synthetic.basedir, nrepeat=1)
+    bench.set_dask()
+    bench.benchmark_retrieve('lonlat')
+    bench.benchmark_timmean('lonlat')
+    bench.close_dask()
+
+    assert [res['benchmark'] for res in bench.results] == ['retrieve', 'timmean']
+    assert all(res['mean'] > 0 and res['peak_memory_mib'] > 0 for res in bench.results)
+
+    slower = [dict(res, mean=res['mean'] * 10) for res in bench.results]
+    assert compare_results(bench.results, bench.results) == []
+    assert len(compare_results(slower, bench.results)) == 2
+
+
+def test_synthetic_healpix_nested(tmp_path):
+    """The HEALPix reference field follows the nested ordering declared in its crs"""
+    import healpy as hp
+    import numpy as np
+
+    synthetic = SyntheticCatalog(str(tmp_path), grids=['healpix'], zoom=2)
+    field = synthetic._healpix_field()
+    assert field['crs'].attrs['healpix_order'] == 'nest'
+    _, lat = hp.pix2ang(4, np.arange(field.size), nest=True, lonlat=True)
+    np.testing.assert_allclose(field.values, synthetic._temperature(lat))
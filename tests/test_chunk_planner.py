@@ -0,0 +1,75 @@
+"""Tests for the automatic chunk planner"""
+
+import pytest
+import numpy as np
+import pandas as pd
+import xarray as xr
+from aqua import Reader
+from aqua.core.reader.chunk_planner import plan_chunks
+from conftest import LOGLEVEL
+
+
+def _dataset(ntime=240, nlev=10, ncell=1000, freq='h'):
+    """A lazy dataset with a 2D and a 3D variable"""
+    time = pd.date_range('2020-01-01', periods=ntime, freq=freq)
+    plev = xr.DataArray(np.linspace(1000, 100, nlev), dims='plev', attrs={'units': 'hPa'})
+    return xr.Dataset({
+        'tas': (('time', 'cell'), np.zeros((ntime, ncell), dtype=np.float32)),
+        'ta': (('time', 'plev', 'cell'), np.zeros((ntime, nlev, ncell), dtype=np.float32))
+    }, coords={'time': time, 'plev': plev})
+
+
+@pytest.mark.aqua
+class TestChunkPlanner:
+    """Tests for the chunk planner"""
+
+    def test_time_chunking(self):
+        """The 3D field fits the target: only time is chunked"""
+        plan = plan_chunks(_dataset(), target_bytes=40000 * 24, loglevel=LOGLEVEL)
+        assert plan.time == 24
+        assert plan.vertical is None
+        assert plan.xarray_chunks == {'time': 24, 'plev': -1}
+        assert plan.gsv_chunks is None
+        assert plan.chunk_bytes == 40000 * 24
+        assert plan.nchunks == 2 * 10
+
+    def test_vertical_chunking(self):
+        """A single 3D field exceeds the target: levels are chunked"""
+        plan = plan_chunks(_dataset(), target_bytes='16KiB', gsv=True, loglevel=LOGLEVEL)
+        assert plan.time == 1
+        assert plan.vertical == 4
+        assert plan.gsv_chunks == {'time': 'h', 'vertical': 4}
+        assert plan.nchunks == 2 * 240 * 3
+
+    def test_whole_dataset(self):
+        """A small dataset is a single chunk"""
+        plan = plan_chunks(_dataset(ntime=10, freq='D'), target_bytes='1GiB', loglevel=LOGLEVEL)
+        assert plan.time == 10
+        assert plan.nchunks == 2
+
+    def test_gsv_chunking(self):
+        """For GSV the time chunk is the one of the GSV chunking"""
+        plan = plan_chunks(_dataset(ntime=10, freq='D'), target_bytes='1GiB', gsv=True, loglevel=LOGLEVEL)
+        assert plan.gsv_chunks == {'time': 'W'}
+        assert plan.time == 7
+        assert plan.nchunks == 2 * 2
+
+        plan = plan_chunks(_dataset(), target_bytes=40000 * 30, gsv=True, loglevel=LOGLEVEL)
+        assert plan.gsv_chunks == {'time': 'D'}
+        assert plan.time == 24
+
+    def test_no_time(self):
+        """Planning requires a time dimension"""
+        with pytest.raises(ValueError):
+            plan_chunks(_dataset().isel(time=0), loglevel=LOGLEVEL)
+
+    def test_reader_auto(self):
+        """The Reader applies the plan with chunks='auto'"""
+        reader = Reader(model="FESOM", exp="test-pi", source="original_2d",
+                        fix=False, chunks='auto', loglevel=LOGLEVEL)
+        assert reader.plan_chunks().time == 2
+        data = reader.retrieve(var='a_ice')
+        assert data['a_ice'].chunks[0] == (2,)
+        # the data are opened with the planned chunks, not rechunked
+        assert reader.kwargs['chunks'] == reader.chunks
+        assert not any('rechunk' in name for name in data['a_ice'].data.dask.layers)
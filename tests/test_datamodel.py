@@ -3,7 +3,8 @@ import xarray as xr
 import numpy as np
 import pytest
 from aqua import Reader
-from aqua.core.data_model import CoordTransformer, CoordIdentifier
+from aqua.core.data_model import CoordTransformer, CoordIdentifier, DataModel, apply_pending_flip
+from aqua.core.data_model.coordtransformer import counter_reverse_coordinate
 
 @pytest.mark.aqua
 class TestDataModel():
@@ -82,6 +83,43 @@ class TestDataModel():
         assert "Y" == new['lat'].attrs["axis"]
         assert "degrees_north" == new['lat'].attrs["units"]
 
+    def test_datamodel_cache(self):
+        """Coordinates are identified once for consecutive chunks of the same source"""
+
+        reader = Reader(model="IFS", exp="test-tco79", source="long", fix=False)
+        data = reader.retrieve(var='2t')
+        datamodel = DataModel(loglevel='debug')
+
+        first = datamodel.apply(data.isel(time=slice(0, 10)))
+        second = datamodel.apply(data.isel(time=slice(10, 20)))
+        assert len(datamodel._plans) == 1
+        assert first['lat'].equals(second['lat'])
+        assert second['lat'].attrs == CoordTransformer(data, loglevel='debug').transform_coords()['lat'].attrs
+
+    def test_lazy_flip(self):
+        """A lazy flip keeps the native order until applied, giving the same result of an eager one"""
+
+        data = xr.Dataset(
+            {"tas": (["lat", "lon"], np.random.rand(3, 4))},
+            coords={"lat": ("lat", [30., 20., 10.], {"units": "degrees_north"}),
+                    "lon": ("lon", [0., 90., 180., 270.], {"units": "degrees_east"})},
+        )
+        eager = DataModel(loglevel='debug').apply(data)
+        lazy = DataModel(loglevel='debug').apply(data, flip_coords='lazy')
+
+        assert lazy['lat'].attrs['flip_pending'] == 1
+        assert np.array_equal(lazy['tas'].values, data['tas'].values)
+        flipped = apply_pending_flip(lazy)
+        assert flipped['lat'].values.tolist() == [10., 20., 30.]
+        assert flipped['tas'].equals(eager['tas'])
+        assert 'flip_pending' not in flipped['lat'].attrs
+
+        # the native order is kept without copying the data nor altering the input
+        native = counter_reverse_coordinate(lazy)
+        assert 'flip_pending' not in native['lat'].attrs
+        assert lazy['lat'].attrs['flip_pending'] == 1
+        assert np.shares_memory(native['tas'].values, lazy['tas'].values)
+
     def test_bounds(self):
         """Test for bounds fixing and unit conversion."""
 
@@ -211,6 +211,34 @@ class TestDROP:
         test.check_integrity(varname=drop_arguments["var"])
         shutil.rmtree(os.path.join(drop_arguments["outdir"]))
 
+    def test_healpix_pyramid(self, tmp_path):
+        """Test DROP with the HEALPix pyramid."""
+        outdir = str(tmp_path / 'drop_pyramid')
+        test = Drop(
+            catalog='ci', model='ERA5', exp='era5-hpz3', source='monthly', var='2t',
+            outdir=outdir, tmpdir=str(tmp_path), frequency='monthly',
+            definitive=True, loglevel=LOGLEVEL, pyramid=[2, 1]
+        )
+
+        test.retrieve()
+        test.data = test.data.isel(time=[0])
+        test.drop_generator()
+
+        year = int(test.data.time.dt.year[0])
+        month = int(test.data.time.dt.month[0])
+        native = xr.open_dataset(test.get_filename('2t', year=year, month=month))['2t']
+        for level in test.pyramid:
+            filename = test.get_filename('2t', year=year, month=month, level=level)
+            assert f'/hpz{level.zoom}/' in filename
+            field = xr.open_dataset(filename)['2t']
+            assert field.size == 12 * 4**level.zoom
+            assert float(field.mean()) == pytest.approx(float(native.mean()))
+
+        with pytest.raises(ValueError):
+            Drop(catalog='ci', model='ERA5', exp='era5-hpz3', source='monthly', var='2t',
+                 outdir=outdir, tmpdir=str(tmp_path), pyramid=[1],
+                 region={'name': 'europe', 'lon': [-10, 30], 'lat': [35, 70]})
+
     def test_concat_var_year(self, drop_arguments, tmp_path):
         """Test concatenation of monthly files into a single yearly file."""
         resolution = 'r100'
@@ -1,6 +1,11 @@
 import os
 import pytest
+import numpy as np
+import pandas as pd
+import xarray as xr
 from aqua.core.drop import drop_util
+from aqua.core.drop.compact import compact_files
+from aqua.core.drop.drop import TIME_ENCODING, VAR_ENCODING
 from aqua.core.util import replace_intake_vars
 
 @pytest.fixture
@@ -63,4 +68,52 @@ def test_move_tmp_files(tmp_directory, output_directory):
 def test_replace_intake_vars():
 
     path = './AQUA_tests/models/paperino/pluto'
-    assert replace_intake_vars(path, catalog='ci') == '{{ TEST_PATH }}/paperino/pluto'
\ No newline at end of file
+    assert replace_intake_vars(path, catalog='ci') == '{{ TEST_PATH }}/paperino/pluto'
+
+
+@pytest.mark.aqua
+@pytest.mark.parametrize("chunksizes, expected_method", [
+    ((1, 4, 5), 'chunk-copy'),
+    (None, 'chunk-copy'),
+    ('mixed', 'xarray'),  # different chunking across the months, copying the chunks is not possible
+])
+def test_compact_files(tmp_directory, chunksizes, expected_method):
+    """Test the compaction of monthly files with the chunk copy and the xarray fallback"""
+    infiles = []
+    for month in range(1, 13):
+        data = xr.DataArray(np.random.rand(1, 4, 5), dims=("time", "lat", "lon"),
+                            coords={"time": [pd.Timestamp(f"2022-{month:02d}-01")]}, name="2t")
+        if chunksizes == 'mixed':
+            encoding = dict(VAR_ENCODING, chunksizes=(1, 4, 5) if month % 2 else (1, 2, 5))
+        else:
+            encoding = dict(VAR_ENCODING, chunksizes=chunksizes) if chunksizes else VAR_ENCODING
+        filename = os.path.join(tmp_directory, f"2t_2022{month:02d}.nc")
+        data.to_dataset().to_netcdf(filename, encoding={"time": TIME_ENCODING, "2t": encoding})
+        infiles.append(filename)
+    expected = xr.open_mfdataset(infiles, combine='by_coords').load()
+
+    outfile = os.path.join(tmp_directory, "2t_2022.nc")
+    stats = compact_files(infiles, outfile, os.path.join(tmp_directory, "2t_2022_tmp.nc"),
+                          time_encoding=TIME_ENCODING, var_encoding=VAR_ENCODING)
+
+    assert stats['method'] == expected_method
+    assert stats['nbytes'] > 0
+    assert not any(os.path.exists(f) for f in infiles)
+    result = xr.open_dataset(outfile)
+    assert len(result.time) == 12
+    xr.testing.assert_allclose(result['2t'], expected['2t'])
+
+
+@pytest.mark.aqua
+def test_compact_files_failure(tmp_directory):
+    """The monthly files are kept if the compaction fails"""
+    infiles = [os.path.join(tmp_directory, f"2t_2022{month:02d}.nc") for month in range(1, 13)]
+    for filename in infiles:
+        with open(filename, 'w') as f:
+            f.write('not a netcdf file')
+
+    with pytest.raises(Exception):
+        compact_files(infiles, os.path.join(tmp_directory, "2t_2022.nc"),
+                      os.path.join(tmp_directory, "2t_2022_tmp.nc"))
+    assert all(os.path.exists(f) for f in infiles)
+    assert not os.path.exists(os.path.join(tmp_directory, "2t_2022.nc"))
@@ -1,9 +1,16 @@
 """Test fixer functionality for Reader"""
 
+import os
 import pytest
 import numpy as np
+import pandas as pd
+import xarray as xr
 from aqua import Reader
 from aqua.core.fixer import EvaluateFormula
+from aqua.core.fixer.evaluate_formula import compile_formula
+from aqua.core.fixer.fixer_operator import FixerOperator
+from aqua.core.fixer.decumulation import DecumulationState, get_decumulation_state
+from aqua.core.reader.streaming import Streaming
 
 LOGLEVEL = 'DEBUG'
 
@@ -160,6 +167,148 @@ def test_fixer_deltat():
     assert reader2.fixer.deltat == 3600
 
 
+@pytest.mark.aqua
+def test_fixer_plan_cache():
+    """Repeated retrievals reuse the fix plan and give the same result"""
+
+    reader = Reader(model='IFS', exp='test-tco79', source='long', loglevel=LOGLEVEL)
+    data1 = reader.retrieve(var='tnlwrf')
+    nplans = len(reader.fixer._plans)
+    data2 = reader.retrieve(var='tnlwrf')
+    assert len(reader.fixer._plans) == nplans
+    assert data2['tnlwrf'].attrs['units'] == data1['tnlwrf'].attrs['units']
+    assert data1['tnlwrf'].isel(time=5).equals(data2['tnlwrf'].isel(time=5))
+
+
+@pytest.mark.aqua
+def test_fixer_deferred_units(reader_ifs_tco79_long):
+    """Unit fixes deferred after the field and time means match the eager ones"""
+
+    reader = Reader(model='IFS', exp='test-tco79', source='long', deferred_units=True, loglevel=LOGLEVEL)
+    data = reader.retrieve(var='mtntrf')
+    assert 'tgt_units' in data['mtntrf'].attrs
+    assert reader.fixer.operator.pending_unit_fix(data)
+
+    eager = reader_ifs_tco79_long.retrieve(var='mtntrf')['mtntrf']
+    deferred = reader.fldmean(data['mtntrf'])
+    assert deferred.attrs['units'] == 'W m**-2'
+    assert 'tgt_units' not in deferred.attrs
+    assert np.allclose(deferred.values, reader_ifs_tco79_long.fldmean(eager).values)
+
+    deferred = reader.timmean(data['mtntrf'], freq='daily')
+    assert np.allclose(deferred.values, reader_ifs_tco79_long.timmean(eager, freq='daily').values)
+    assert reader.apply_unit_fix(data)['mtntrf'].attrs['units_fixed'] == 1
+
+    # histogram and detrend do not commute with the unit fix, which is applied before them
+    hist = reader.histogram(data['mtntrf'], bins=5, range=(-400, 0), weighted=False)
+    expected = reader_ifs_tco79_long.histogram(eager, bins=5, range=(-400, 0), weighted=False)
+    assert np.array_equal(hist.values, expected.values)
+    assert hist.center_of_bin.attrs['units'] == 'W m**-2'
+    detrended = reader.detrend(data['mtntrf'].isel(time=slice(0, 10)))
+    assert detrended.attrs['units'] == 'W m**-2'
+    assert np.allclose(detrended.values, reader_ifs_tco79_long.detrend(eager.isel(time=slice(0, 10))).values)
+
+
+@pytest.mark.aqua
+def test_decumulation_state(tmp_path):
+    """Decumulation of consecutive pieces with a state matches the decumulation of the full series"""
+
+    time = pd.date_range('2020-01-01', periods=12, freq='6h')
+    rng = np.random.default_rng(seed=42)
+    cumulated = xr.DataArray(np.cumsum(rng.random((12, 5)), axis=0), dims=('time', 'cell'),
+                             coords={'time': time}, name='tp').to_dataset().chunk({'time': 3})
+    fixes = {'tp': {'decumulate': True}}
+    varlist = {'tp': 'tp'}
+    operator = FixerOperator({}, loglevel=LOGLEVEL)
+    full = operator.wrapper_decumulate(cumulated.copy(), 3600, fixes, varlist, None)
+
+    # without a file the state is kept lazily
+    state = DecumulationState(loglevel=LOGLEVEL)
+    state.update(operator.wrapper_decumulate(cumulated.isel(time=slice(0, 5)), 3600, fixes, varlist, None, state=state))
+    assert state.fields['tp'].chunks is not None
+
+    # with a file the state is shared per file and written at each update
+    statefile = str(tmp_path / 'state.nc')
+    state = get_decumulation_state(filename=statefile, loglevel=LOGLEVEL)
+    assert get_decumulation_state(filename=statefile, loglevel=LOGLEVEL) is state
+    first = operator.wrapper_decumulate(cumulated.isel(time=slice(0, 5)), 3600, fixes, varlist, None, state=state)
+    state.update(first)
+    assert os.path.exists(statefile)
+    # the second piece is decumulated by a new process, reading the persisted state
+    state = DecumulationState(filename=statefile, loglevel=LOGLEVEL)
+    second = operator.wrapper_decumulate(cumulated.isel(time=slice(5, None)), 3600, fixes, varlist, None, state=state)
+    state.update(second)
+    pieces = xr.concat([first['tp'], second['tp']], dim='time')
+    assert np.allclose(pieces.values, full['tp'].values)
+
+    # a non contiguous piece falls back on keeping the first step
+    third = operator.wrapper_decumulate(cumulated.isel(time=slice(2, 6)), 3600, fixes, varlist, None, state=state)
+    assert np.allclose(third['tp'].isel(time=0).values, cumulated['tp'].isel(time=2).values)
+
+
+@pytest.mark.aqua
+def test_decumulation_state_streaming():
+    """Streamed pieces decumulated with a state match a one-shot decumulation"""
+
+    time = pd.date_range('2020-01-01', periods=12, freq='6h')
+    rng = np.random.default_rng(seed=24)
+    cumulated = xr.DataArray(np.cumsum(rng.random((12, 5)), axis=0), dims=('time', 'cell'),
+                             coords={'time': time}, name='tp').to_dataset()
+    fixes = {'tp': {'decumulate': True}}
+    varlist = {'tp': 'tp'}
+    operator = FixerOperator({}, loglevel=LOGLEVEL)
+    full = operator.wrapper_decumulate(cumulated.copy(), 3600, fixes, varlist, None)
+
+    # pieces retrieved one by one, as from FDB: the state is updated with the piece returned
+    state = DecumulationState(loglevel=LOGLEVEL)
+    streamer = Streaming(aggregation='6S')
+    pieces = []
+    while (piece := streamer.stream(cumulated)) is not None:
+        piece = operator.wrapper_decumulate(piece.copy(), 3600, fixes, varlist, None, state=state)
+        state.update(piece)
+        pieces.append(piece['tp'])
+    assert len(pieces) == 2
+    assert np.allclose(xr.concat(pieces, dim='time').values, full['tp'].values)
+    assert state.fields['tp']['time'].values == time[-1]
+
+    # the whole record decumulated and then streamed, as from files: the state does not alter the pieces
+    streamer.reset()
+    pieces = []
+    for _ in range(2):
+        record = operator.wrapper_decumulate(cumulated.copy(), 3600, fixes, varlist, None, state=state)
+        piece = streamer.stream(record)
+        state.update(piece)
+        pieces.append(piece['tp'])
+        assert state.fields['tp']['time'].values == piece['time'].values[-1]
+    assert np.allclose(xr.concat(pieces, dim='time').values, full['tp'].values)
+
+
+@pytest.mark.aqua
+def test_nanfirst():
+    """First steps of each month are set to NaN, also when data start in the middle of a month"""
+
+    time = pd.date_range('2020-01-31', '2020-03-02', freq='6h')
+    data = xr.DataArray(np.ones((time.size, 3)), dims=('time', 'cell'), coords={'time': time})
+    operator = FixerOperator({}, loglevel=LOGLEVEL)
+
+    fixed = operator.nanfirst(data, enddate='2020-12-31')
+    nans = fixed.time[fixed.isnull().all('cell')].values
+    np.testing.assert_array_equal(nans, np.array(['2020-02-01', '2020-03-01'], dtype='datetime64[ns]'))
+
+    # a piece starting in the middle of the month keeps its first step
+    piece = operator.nanfirst(data.isel(time=slice(10, 20)), enddate='2020-12-31')
+    assert not piece.isnull().any()
+    piece = operator.nanfirst(data.isel(time=slice(4, 20)), startdate='2020-01-01', enddate='2020-12-31')
+    assert piece.isnull().all('cell').sum() == 1
+
+    # cftime calendars are supported
+    time = xr.date_range('2020-01-31', '2020-03-02', freq='6h', calendar='noleap', use_cftime=True)
+    data = xr.DataArray(np.ones((time.size, 3)), dims=('time', 'cell'), coords={'time': time})
+    fixed = FixerOperator({}, loglevel=LOGLEVEL).nanfirst(data, startdate='2020-02-15', enddate='2020-12-31')
+    nans = fixed.time[fixed.isnull().all('cell')]
+    assert [(date.month, date.day, date.hour) for date in nans.values] == [(3, 1, 0)]
+
+
 @pytest.fixture
 def data_2t_tp(era5_hpz3_monthly_data):
     return era5_hpz3_monthly_data
@@ -214,6 +363,22 @@ class TestEvaluateFormula:
         expected_values = convert.isel(time=0).mean()
         assert np.allclose(original_values.values, expected_values.values)
 
+    def test_fused_formula(self):
+        """Test that the formula is compiled once and evaluated as a single dask layer"""
+        data = xr.Dataset({'a': (('time', 'x'), np.arange(12.).reshape(3, 4)),
+                           'b': (('time', 'x'), np.ones((3, 4)))}).chunk({'time': 1})
+        formula = "(a - b) * 2 - a^2 / b"
+        assert compile_formula('(a-b)*2-a^2/b') is EvaluateFormula(data=data, formula=formula).compiled
+        convert = EvaluateFormula(data=data, formula=formula).evaluate()
+        expected = (data['a'] - data['b']) * 2 - data['a']**2 / data['b']
+        assert np.allclose(convert.values, expected.values)
+        # the operators are fused in the CompiledFormula kernel: the graph does not grow with the formula
+        layers = list(convert.data.__dask_graph__().layers)
+        single = EvaluateFormula(data=data, formula='a - b').evaluate()
+        assert len(layers) == len(single.data.__dask_graph__().layers)
+        assert any('CompiledFormula' in name for name in layers)
+        assert not any(name.split('-')[0] in ['sub', 'mul', 'pow', 'truediv'] for name in layers)
+
     def test_wrong_formula(self, data_2t_tp):
         """Test wrong parentheses handling"""
         formula = "(2t - 273.15)) + (tprate / 1000"
@@ -1,7 +1,12 @@
 """Testing if fldmean method works"""
 
 import pytest
+import numpy as np
+import healpy as hp
+import xarray as xr
 from aqua import Reader, FldStat
+from aqua.core.fldstat import AreaSelection, healpix_aggregate
+from aqua.core.fldstat.healpix import healpix_cell_area
 from conftest import LOGLEVEL
 
 # Aliases with module scope for fixtures
@@ -297,4 +302,80 @@ class TestFldStatWrappers():
         
         # Test logical relationships
         assert (reader_ifs.fldmin(data_var) <= reader_ifs.fldmean(data_var)).all()
-        assert (reader_ifs.fldmean(data_var) <= reader_ifs.fldmax(data_var)).all()
\ No newline at end of file
+        assert (reader_ifs.fldmean(data_var) <= reader_ifs.fldmax(data_var)).all()
+
+@pytest.mark.aqua
+class TestFldStatHealpix():
+    """Test class for the HEALPix native field statistics"""
+
+    @pytest.fixture(scope='class')
+    def readers(self):
+        """Readers of a HEALPix source with the generic and the native field statistics"""
+        kwargs = dict(model='ERA5', exp='era5-hpz3', source='monthly', areas=True, loglevel=LOGLEVEL)
+        return Reader(**kwargs), Reader(healpix_native=True, **kwargs)
+
+    def test_fldstat_healpix_native(self, readers):
+        """Equal-area statistics match the ones with the area files"""
+        generic, native = readers
+        data = native.retrieve(var='2t')['2t'].isel(time=slice(0, 2))
+        for stat in ['mean', 'std', 'integral', 'areasum']:
+            expected = generic.fldstat(data, stat=stat).values
+            np.testing.assert_allclose(native.fldstat(data, stat=stat).values, expected, rtol=1e-3)
+
+        selection = dict(lon_limits=[-30, 50], lat_limits=[-30, 30])
+        np.testing.assert_allclose(native.fldmean(data, **selection).values,
+                                   generic.fldmean(data, **selection).values, rtol=1e-3)
+
+    def test_select_area_healpix_native(self, readers):
+        """Pixel selections match the coordinate ones"""
+        data = readers[0].retrieve(var='2t')['2t'].isel(time=0)
+        for lon, lat in [([-30, 50], [-30, 30]), ([100, 200], [20, 90])]:
+            expected = AreaSelection(loglevel=LOGLEVEL).select_area(data, lon=lon, lat=lat)
+            native = AreaSelection(loglevel=LOGLEVEL, healpix_native=True)
+            selected = native.select_area(data, lon=lon, lat=lat)
+            np.testing.assert_array_equal(selected.notnull().values, expected.notnull().values)
+            dropped = native.select_area(data, lon=lon, lat=lat, drop=True)
+            assert dropped.size == int(expected.notnull().sum())
+
+    def test_healpix_aggregate(self, readers):
+        """Aggregation to a coarser zoom keeps the global mean"""
+        data = readers[0].retrieve(var='2t')['2t'].isel(time=0)
+        coarse = healpix_aggregate(data, zoom=1)
+        assert coarse.size == hp.nside2npix(2)
+        assert float(coarse.mean()) == pytest.approx(float(data.mean()))
+        lon, lat = hp.pix2ang(2, np.arange(coarse.size), nest=True, lonlat=True)
+        np.testing.assert_allclose(coarse['lat'].values, lat)
+        with pytest.raises(ValueError):
+            healpix_aggregate(data, zoom=5)
+
+    def test_fldstat_healpix_masked(self):
+        """Equal-area sums exclude the cells of the masked grid only, and the grid must be declared as HEALPix"""
+        npix = hp.nside2npix(2)
+        valid = np.arange(npix) % 3 != 0
+        area = xr.DataArray(np.where(valid, healpix_cell_area(2), np.nan), dims=['cell'], name='cell_area',
+                            attrs={'units': 'm2'})
+        data = xr.DataArray(np.where(np.arange(npix) % 2 == 0, 1., np.nan), dims=['cell'], name='tos',
+                            attrs={'units': 'K'})
+
+        generic = FldStat(area, horizontal_dims=['cell'], grid_name='hpz1-nested', loglevel=LOGLEVEL)
+        native = FldStat(area, horizontal_dims=['cell'], grid_name='hpz1-nested', healpix_native=True,
+                         mask=xr.DataArray(valid, dims=['cell']), loglevel=LOGLEVEL)
+        assert native._is_healpix(data, ['cell'])
+        expected = float(area.where(valid & data.notnull()).sum())
+        for stat in ['areasum', 'integral']:
+            assert float(native.fldstat(data, stat=stat)) == pytest.approx(expected)
+        assert float(generic.fldstat(data, stat='integral')) == pytest.approx(expected)
+        # the generic areasum expects the data masked beforehand
+        assert float(generic.fldstat(data.notnull(), stat='areasum')) == pytest.approx(expected)
+
+        # without a masked grid the area is not read, all the valid data count
+        unmasked = FldStat(area * 0, horizontal_dims=['cell'], grid_name='hpz1-nested', healpix_native=True,
+                           loglevel=LOGLEVEL)
+        assert float(unmasked.fldstat(data, stat='areasum')) == pytest.approx(
+            healpix_cell_area(2) * int(data.notnull().sum()))
+
+        # the size alone does not make a HEALPix grid
+        other = FldStat(area, horizontal_dims=['cell'], grid_name='unstructured', healpix_native=True, loglevel=LOGLEVEL)
+        assert not other._is_healpix(data, ['cell'])
+        assert other._is_healpix(data.assign_coords(crs=xr.DataArray(0, attrs={'grid_mapping_name': 'healpix',
+                                                                               'healpix_nside': 2})), ['cell'])
@@ -2,6 +2,7 @@ import pytest
 import xarray as xr
 import numpy as np
 import healpy as hp
+import cartopy.crs as ccrs
 from scipy.interpolate import griddata
 from pypdf import PdfReader
 
@@ -9,6 +10,8 @@ from aqua import Reader
 from aqua.core.util.graphics import add_cyclic_lon, plot_box, minmax_maps
 from aqua.core.util import cbar_get_label, evaluate_colorbar_limits, add_pdf_metadata
 from aqua.core.util import get_nside, get_npix, healpix_resample
+from aqua.core.util.graphics import HealpixResamplePlan, get_resample_plan
+from aqua.core.util import display_pixels, coarsen_for_display, coarsen_map_for_display, healpix_coarsen
 from aqua.core.util import coord_names, set_map_title
 from aqua.core.graphics import plot_single_map
 from conftest import DPI, LOGLEVEL
@@ -233,6 +236,56 @@ class TestHealpixResample:
         assert result.ndim == 2
         assert result.shape == (10, 10)
 
+    def test_healpix_resample_plan(self, healpix_data, tmp_path):
+        data, xlims, ylims = healpix_data
+        result = healpix_resample(data, xlims=xlims, ylims=ylims, nx=10, ny=10, method="linear")
+
+        # the linear plan gives the same result of griddata
+        lons, lats = hp.pix2ang(nside=8, ipix=np.arange(data.size), nest=True, lonlat=True)
+        lons = (lons + 180) % 360 - 180
+        xvals, yvals = np.meshgrid(result.lon.values, result.lat.values)
+        valid_src = ((lons > xvals.min()) & (lons < xvals.max())) | ((lats > yvals.min()) & (lats < yvals.max()))
+        expected = griddata(points=np.asarray([lons[valid_src], lats[valid_src]]).T, values=data.values[valid_src],
+                            xi=(xvals, yvals), method="linear", fill_value=np.nan, rescale=True)
+        np.testing.assert_allclose(result.values, expected, equal_nan=True)
+
+        # plans are reused, and can be stored to file
+        for method in ["nearest", "linear"]:
+            plan = get_resample_plan(8, xlims, ylims, 12, 12, ccrs.Geodetic(), method=method, plan_dir=tmp_path)
+            assert get_resample_plan(8, xlims, ylims, 12, 12, ccrs.Geodetic(), method=method) is plan
+            loaded = HealpixResamplePlan.load(next(tmp_path.glob(f"healpix_plan_8_{method}_*.npz")))
+            np.testing.assert_array_equal(loaded.apply(data).values, plan.apply(data).values)
+
+    def test_healpix_coarsen(self):
+        nside = 16
+        var = xr.DataArray(np.arange(hp.nside2npix(nside), dtype=float), dims=["cell"])
+        result = healpix_coarsen(var, 4)
+        assert result.size == hp.nside2npix(4)
+        # the mean of the children of each parent pixel
+        np.testing.assert_allclose(result.values, var.values.reshape(-1, 16).mean(axis=1))
+        assert healpix_coarsen(var, 32) is var
+
+    def test_coarsen_map_for_display(self):
+        var = xr.DataArray(np.random.rand(hp.nside2npix(256)), dims=["cell"])
+        # 2 x 40 points along the equator need 4 * 32 pixels
+        assert get_nside(coarsen_map_for_display(var, 40, 20)) == 32
+        # the regional map keeps more points
+        assert get_nside(coarsen_map_for_display(var, 40, 20, extent=[0, 90, 0, 45])) == 128
+        # the map is never refined
+        assert coarsen_map_for_display(var, 1000, 500) is var
+
+        lon = np.linspace(0, 359.75, 1440)
+        lat = np.linspace(-90, 90, 721)
+        grid = xr.DataArray(np.random.rand(721, 1440), dims=["lat", "lon"], coords={"lon": lon, "lat": lat})
+        width, height = display_pixels((2, 1), 100)
+        assert (width, height) == (200, 100)
+        # 1440 // (2 * 200) and 721 // (2 * 100) points are averaged, the last latitude block is padded
+        result = coarsen_map_for_display(grid, width, height)
+        assert result.sizes["lon"] == 480 and result.sizes["lat"] == 241
+        np.testing.assert_allclose(result.isel(lat=0, lon=0), grid.isel(lat=slice(0, 3), lon=slice(0, 3)).mean())
+        # less pixels than points, nothing to do
+        assert coarsen_for_display(grid, {"lon": 1000, "lat": 1000}) is grid
+
     def test_healpix_resample_default_grid_size(self, healpix_data):
         data, _, _ = healpix_data
         result = healpix_resample(data, method="nearest")
@@ -11,6 +11,7 @@ from aqua.core.graphics import plot_timeseries, plot_seasonalcycle
 from aqua.core.graphics import plot_maps, plot_maps_diff, plot_hovmoller
 from aqua.core.graphics import plot_vertical_lines, plot_histogram
 from aqua.core.graphics import plot_lat_lon_profiles, plot_seasonal_lat_lon_profiles
+from aqua.core.graphics import BatchMapRenderer
 from conftest import DPI, LOGLEVEL
 
 loglevel = LOGLEVEL
@@ -84,6 +85,12 @@ class TestMaps:
         fig.savefig(tmp_path / 'test_plot_single_map.png')
         assert os.path.exists(tmp_path / 'test_plot_single_map.png')
 
+        # the preview draws the map averaged to the figure resolution
+        fig, ax = plot_single_map(data=plot_data, figsize=(2, 1), preview=True, preview_dpi=20,
+                                  contour=False, cyclic_lon=False, return_fig=True, loglevel=loglevel)
+        mesh = ax.collections[0]
+        assert mesh.get_array().size < plot_data.size
+
     def test_plot_single_map_diff(self, tmp_path, fesom_r200_fixFalse_reader, fesom_r200_fixFalse_data):
         """
         Test the plot_single_map_diff function
@@ -171,6 +178,53 @@ class TestMaps:
         fig2.savefig(tmp_path / 'test_plot_maps_diff.png', dpi=DPI)
         assert os.path.exists(tmp_path / 'test_plot_maps_diff.png')
 
+    def test_batch_maps(self, tmp_path, fesom_r200_fixFalse_reader, fesom_r200_fixFalse_data):
+        """
+        Test the BatchMapRenderer, in the current process and with a pool
+        """
+        data_regrid = fesom_r200_fixFalse_reader.regrid(fesom_r200_fixFalse_data)
+        plot_data = data_regrid["sst"].isel(time=0)
+
+        for processes in [1, 2]:
+            renderer = BatchMapRenderer(formats=['png', 'pdf'], dpi=DPI, processes=processes, loglevel=loglevel)
+            for i, proj in enumerate([ccrs.PlateCarree(), ccrs.Robinson(), ccrs.PlateCarree()]):
+                renderer.add(plot_data, str(tmp_path / f'map-{processes}-{i}'), metadata={'test': str(i)},
+                             proj=proj, contour=False, title=f'Map {i}')
+            files = renderer.render()
+
+            assert files == [str(tmp_path / f'map-{processes}-{i}.{fmt}') for i in range(3) for fmt in ['png', 'pdf']]
+            assert all(os.path.exists(filename) for filename in files)
+            assert renderer.frames == []
+
+        with pytest.raises(ValueError):
+            BatchMapRenderer(formats=['jpg'])
+
+    def test_batch_maps_colorbar(self, tmp_path):
+        """
+        Test that the colorbar of a map is removed with the map from the template
+        """
+        from aqua.core.graphics.batch_maps import MapFrame, _render_frames, _get_template, _close_templates
+
+        lon = np.arange(0, 360, 10.)
+        lat = np.arange(-85, 90, 10.)
+        frames = []
+        for i in range(2):
+            data = xr.DataArray(np.random.default_rng(i).random((lat.size, lon.size)) * (i + 1),
+                                coords={'lat': lat, 'lon': lon}, dims=['lat', 'lon'], name='field')
+            frames.append(MapFrame(data, str(tmp_path / f'field-{i}'),
+                                   kwargs={'proj': ccrs.PlateCarree(), 'coastlines': False,
+                                           'cbar': True, 'contour': False}))
+
+        try:
+            files = _render_frames(frames, ['png'], DPI, loglevel)
+            template = _get_template(frames[0].template)
+            assert files == [str(tmp_path / f'field-{i}.png') for i in range(2)]
+            # only the map axes are left, with no map still attached to a colorbar
+            assert template.fig.axes == [template.ax]
+            assert not any(getattr(artist, 'colorbar', None) for artist in template.ax.get_children())
+        finally:
+            _close_templates()
+
     def test_maps_error(self):
         """Test plot_maps function with error"""
         with pytest.raises(ValueError):
@@ -375,6 +429,11 @@ class TestHovmoller:
 
         assert os.path.exists(tmp_path / 'test_hovmoller3.png')
 
+        fig, ax = plot_hovmoller(data=self.data, return_fig=True, figsize=(2, 2),
+                                 preview=True, preview_dpi=10, loglevel=loglevel)
+        assert fig is not None
+        assert len(ax.collections) > 0
+
     def test_plot_hovmoller_error(self):
 
         with pytest.raises(TypeError):
@@ -2,7 +2,9 @@ import numpy as np
 import xarray as xr
 import pytest
 import dask.array as da
+import pandas as pd
 from aqua import histogram
+from aqua.core.timstat import TimStat
 
 @pytest.fixture
 def sample_data():
@@ -114,3 +116,69 @@ def test_histogram_weighted_no_lat():
     data.attrs['long_name'] = 'Test Data'
     with pytest.raises(ValueError):
         histogram(data, weighted=True)
+
+@pytest.mark.aqua
+def test_histogram_bin_edges(sample_data):
+    """
+    Test the histogram function with fixed bin edges.
+    """
+    edges = [0, 0.1, 0.5, 1]
+    hist = histogram(sample_data, bins=edges, weighted=False)
+    expected, _ = np.histogram(sample_data.values, bins=edges)
+    np.testing.assert_array_equal(hist.values, expected)
+    np.testing.assert_allclose(hist.width.values, np.diff(edges))
+    with pytest.raises(ValueError):
+        histogram(sample_data, bins=[0, 1, 0.5])
+
+@pytest.mark.aqua
+def test_histogram_dask_weighted(sample_data, sample_dask_data):
+    """
+    Test that the chunked histogram matches the numpy one, with weights.
+    """
+    hist_numpy = histogram(sample_data, bins=5, range=(0, 1))
+    hist_dask = histogram(sample_dask_data, bins=5, range=(0, 1))
+    assert isinstance(hist_dask.data, da.Array)
+    weights = np.cos(np.radians(sample_data.lat)).broadcast_like(sample_data)
+    expected, _ = np.histogram(sample_data.values, bins=5, range=(0, 1), weights=weights.values)
+    np.testing.assert_allclose(hist_numpy.values, expected)
+    np.testing.assert_allclose(hist_dask.values, expected)
+
+@pytest.mark.aqua
+def test_histogram_multiple_variables(sample_dataset):
+    """
+    Test the histogram of several variables, sharing the same bins.
+    """
+    hist = histogram(sample_dataset, var=['test_data', 'second_var'], bins=5, weighted=False)
+    assert isinstance(hist, xr.Dataset)
+    assert set(hist.data_vars) == {'test_data', 'second_var'}
+    for name in hist.data_vars:
+        assert int(hist[name].sum()) == sample_dataset[name].size
+
+@pytest.mark.aqua
+def test_histogram_dim(sample_dask_data):
+    """
+    Test the histogram over a subset of the dimensions.
+    """
+    hist = histogram(sample_dask_data, dim='lon', bins=5, range=(0, 1), weighted=False)
+    assert hist.dims == ('lat', 'center_of_bin')
+    np.testing.assert_array_equal(hist.sum('center_of_bin').values, np.full(10, 10))
+    first, _ = np.histogram(sample_dask_data.isel(lat=0).values, bins=5, range=(0, 1))
+    np.testing.assert_array_equal(hist.isel(lat=0).values, first)
+
+@pytest.mark.aqua
+def test_timstat_histogram_windows():
+    """
+    Test that the resampled histogram matches the histogram of each window.
+    """
+    time = pd.date_range('2020-01-01', periods=60, freq='D')
+    data = xr.DataArray(np.random.rand(60, 4, 3), coords=[('time', time), ('lat', [-60, -20, 20, 60]), ('lon', [0, 120, 240])],
+                        name='test_data', attrs={'units': 'm'}).chunk({'time': 7, 'lat': 2})
+    hist = TimStat().timstat(data, stat='histogram', freq='monthly', bins=5, range=(0, 1))
+    assert hist.sizes['time'] == 2
+    for month in [1, 2]:
+        window = data.sel(time=data.time.dt.month == month)
+        expected = histogram(window, bins=5, range=(0, 1))
+        np.testing.assert_allclose(hist.sel(time=hist.time.dt.month == month).squeeze('time').values, expected.values)
+    pdf = TimStat().timstat(data, stat='histogram', freq='monthly', bins=5, range=(0, 1), density=True)
+    assert pdf.name == 'pdf'
+    np.testing.assert_allclose((pdf * pdf.width).sum('center_of_bin').values, 1)
@@ -0,0 +1,97 @@
+import numpy as np
+import pandas as pd
+import xarray as xr
+import pytest
+from aqua.core.histogram import HistogramSketch, QuantileSketch
+from aqua.core.timstat import TimStat
+from conftest import LOGLEVEL
+
+pytestmark = pytest.mark.aqua
+
+
+@pytest.fixture
+def sample_data():
+    """Positive data with a time dimension, chunked in time"""
+    rng = np.random.default_rng(42)
+    time = pd.date_range('2020-01-01', periods=120, freq='D')
+    values = rng.lognormal(mean=0, sigma=1, size=(120, 3, 4))
+    data = xr.DataArray(values, coords=[('time', time), ('lat', [-45, 0, 45]), ('lon', [0, 90, 180, 270])],
+                        name='tprate', attrs={'units': 'mm'})
+    return data.chunk({'time': 30})
+
+
+def test_histogram_sketch_merge(sample_data):
+    """Merging the sketches of two periods is the same as the sketch of the whole record"""
+    first = HistogramSketch(bins=10, range=(0, 5), loglevel=LOGLEVEL).add(sample_data.isel(time=slice(0, 60)))
+    second = HistogramSketch(bins=10, range=(0, 5), loglevel=LOGLEVEL).add(sample_data.isel(time=slice(60, None)))
+    whole = HistogramSketch(bins=10, range=(0, 5), loglevel=LOGLEVEL).add(sample_data)
+
+    merged = first + second
+    np.testing.assert_array_equal(merged.counts.values, whole.counts.values)
+    assert int(merged.counts.sum()) == sample_data.size
+    # the overflow bin collects the data above the range
+    assert int(merged.counts.isel(bin=-1)) == int((sample_data >= 5).sum())
+
+    expected, _ = np.histogram(sample_data.values, bins=10, range=(0, 5))
+    hist = merged.to_histogram()
+    np.testing.assert_array_equal(hist.values[:-1], expected[:-1])
+
+    with pytest.raises(ValueError):
+        first.merge(HistogramSketch(bins=5, range=(0, 5)))
+    with pytest.raises(ValueError):
+        HistogramSketch(bins=10)
+
+
+def test_quantile_sketch_accuracy(sample_data):
+    """The quantiles of the sketch are within the relative accuracy"""
+    sketch = QuantileSketch(relative_accuracy=0.01, min_value=1e-3, max_value=1e3, loglevel=LOGLEVEL)
+    sketch.add(sample_data, dim='time')
+    quantiles = sketch.quantile([0.1, 0.5, 0.99]).compute()
+    assert quantiles.dims == ('lat', 'lon', 'quantile')
+
+    expected = np.quantile(sample_data.values, [0.1, 0.5, 0.99], axis=0, method='inverted_cdf')
+    np.testing.assert_allclose(quantiles.transpose('quantile', ...).values, expected, rtol=0.011)
+
+    median = sketch.quantile(0.5)
+    assert 'quantile' not in median.dims
+
+
+def test_sketch_save_load(sample_data, tmp_path):
+    """A stored sketch can be read and merged"""
+    sketch = QuantileSketch(relative_accuracy=0.02, min_value=1e-2, max_value=1e2, signed=False, loglevel=LOGLEVEL)
+    sketch.add(sample_data, dim='time').compute()
+
+    filename = str(tmp_path / 'sketch.nc')
+    sketch.save(filename)
+    loaded = HistogramSketch.load(filename, loglevel=LOGLEVEL)
+
+    assert isinstance(loaded, QuantileSketch)
+    assert loaded.params == sketch.params
+    np.testing.assert_array_equal(loaded.counts.values, sketch.counts.values)
+    merged = loaded + sketch
+    np.testing.assert_allclose(merged.quantile(0.5).values, sketch.quantile(0.5).values)
+
+
+def test_timstat_quantile(sample_data):
+    """Quantiles and sketches of each time window through TimStat"""
+    timstat = TimStat(loglevel=LOGLEVEL)
+    kwargs = {'relative_accuracy': 0.01, 'min_value': 1e-3, 'max_value': 1e3}
+    out = timstat.timstat(sample_data, stat='quantile', freq='monthly', q=[0.5, 0.9], **kwargs)
+    assert out.sizes['time'] == 4
+    assert out.sizes['quantile'] == 2
+
+    january = sample_data.sel(time=sample_data.time.dt.month == 1)
+    expected = QuantileSketch(**kwargs).add(january, dim='time').quantile([0.5, 0.9])
+    np.testing.assert_allclose(out.isel(time=0).values, expected.values)
+
+    counts = timstat.timstat(sample_data, stat='sketch', freq='monthly', **kwargs)
+    assert int(counts.isel(time=0).sum()) == january.size
+    np.testing.assert_array_equal(counts['time'].values, out['time'].values)
+
+    # a missing month is not a window, and the defaults keep the sketch small
+    gap = sample_data.isel(time=list(range(20)) + list(range(70, 120)))
+    out = timstat.timstat(gap, stat='quantile', freq='monthly', q=0.5)
+    assert list(out['time'].dt.month.values) == [1, 3, 4]
+    expected = QuantileSketch().add(gap.sel(time=gap.time.dt.month == 3), dim='time').quantile(0.5)
+    np.testing.assert_allclose(out.isel(time=1).values, expected.values)
+    assert QuantileSketch().counts is None and QuantileSketch().edges.size < 1000
@@ -71,4 +71,46 @@ class TestAquaStreaming:
         # Test if reset_stream works
         reader.reset_stream()
         data = reader.retrieve()
-        assert data.time.values[0] == start_date
\ No newline at end of file
+        assert data.time.values[0] == start_date
+
+@pytest.mark.aqua
+def test_iter_chunks(tmp_path):
+    """Iterate over daily windows with prefetch, resuming from a checkpoint"""
+
+    reader = Reader(model="IFS", exp="test-tco79", source="long", fix=False, loglevel=loglevel)
+    full = reader.retrieve(var='2t', startdate='2020-05-01', enddate='2020-05-03T23:00')
+
+    chunks = reader.iter_chunks(var='2t', aggregation='daily', startdate='2020-05-01',
+                                enddate='2020-05-03T23:00', prefetch=2)
+    assert len(chunks) == 3
+    days = list(chunks)
+    assert [chunk.sizes['time'] for chunk in days] == [24, 24, 24]
+    assert days[1]['2t'].equals(full['2t'].sel(time='2020-05-02'))
+
+    # the second window is interrupted and then resumed from the checkpoint
+    checkpoint = str(tmp_path / 'checkpoint.json')
+    chunks = reader.iter_chunks(var='2t', aggregation='daily', startdate='2020-05-01',
+                                enddate='2020-05-03T23:00', checkpoint=checkpoint)
+    next(chunks)
+    next(chunks)
+    chunks.close()
+    chunks = reader.iter_chunks(var='2t', aggregation='daily', startdate='2020-05-01',
+                                enddate='2020-05-03T23:00', checkpoint=checkpoint)
+    assert chunks.position == 1
+    assert [chunk.time.values[0] for chunk in chunks] == [days[1].time.values[0], days[2].time.values[0]]
+
+
+@pytest.mark.aqua
+def test_iter_chunks_async():
+    """The chunk iterator can be used as an async iterator"""
+    import asyncio
+
+    reader = Reader(model="IFS", exp="test-tco79", source="long", fix=False, loglevel=loglevel)
+
+    async def collect():
+        return [chunk async for chunk in reader.iter_chunks(var='2t', aggregation='24S',
+                                                            startdate='2020-05-01', enddate='2020-05-02T23:00')]
+
+    chunks = asyncio.run(collect())
+    assert len(chunks) == 2
+    assert chunks[0].sizes['time'] == 24
@@ -1,6 +1,11 @@
 """Test for timmean method"""
 import pytest
+import os
 import numpy as np
+import pandas as pd
+import xarray as xr
+from aqua.core import Reader
+from aqua.core.reader.product_cache import data_token, graph_names, unmodified
 from aqua.core.histogram import histogram
 
 @pytest.fixture(scope='module')
@@ -186,4 +191,53 @@ class TestTimmean():
             aligned = resampled.sel(time=avg_with_mask.time)
             assert len(aligned) == len(avg_with_mask)
         except KeyError as e:
-            pytest.fail(f"Coordinate alignment failed: {e}")
\ No newline at end of file
+            pytest.fail(f"Coordinate alignment failed: {e}")
+
+
+@pytest.mark.aqua
+def test_product_cache(tmp_path):
+    """Test that time and field statistics are shared through the product cache"""
+    readers = [Reader(model="IFS", exp="test-tco79", source="long", fix=False,
+                      product_cache=str(tmp_path)) for _ in range(2)]
+    first, second = [reader.retrieve(var='2t')['2t'] for reader in readers]
+
+    avg = readers[0].timmean(first, freq='monthly')
+    # the product is stored when it is computed
+    assert not os.listdir(tmp_path)
+    avg = avg.compute()
+    assert len(os.listdir(tmp_path)) == 1
+    cached = readers[1].timmean(second, freq='monthly')
+    assert len(os.listdir(tmp_path)) == 1
+    np.testing.assert_allclose(cached.values, avg.values)
+    assert cached.name == '2t'
+
+    # the key does not depend on the chunks
+    readers[1].timmean(second.chunk({'time': 7}), freq='monthly').compute()
+    assert len(os.listdir(tmp_path)) == 1
+
+    # a different operation or a different time range give a new product
+    readers[1].timmean(second, freq='daily').compute()
+    readers[1].timmean(second.isel(time=slice(0, 48)), freq='monthly').compute()
+    readers[1].fldmean(second).compute()
+    assert len(os.listdir(tmp_path)) == 4
+
+    # modified data are not cached, neither read from the cache
+    anomaly = readers[1].timmean(second - second.mean('time'), freq='monthly')
+    assert len(os.listdir(tmp_path)) == 4
+    assert not np.allclose(anomaly.values, avg.values)
+    assert len(os.listdir(tmp_path)) == 4
+
+
+@pytest.mark.aqua
+def test_product_cache_unmodified():
+    """Only selected or rechunked data are recognised as unmodified, and values in memory are in the token"""
+    data = xr.DataArray(np.arange(40.).reshape(10, 4), dims=('time', 'x'), name='tas',
+                        coords={'time': pd.date_range('2000-01-01', periods=10)}).chunk({'time': 3})
+    names = graph_names(data)
+    assert unmodified(data.to_dataset(), names)
+    assert unmodified(data.isel(time=slice(0, 4)).chunk({'time': 2}), names)
+    assert not unmodified(data - data.mean('time'), names)
+    assert not unmodified(data * 0 + 5, names)
+    loaded = data.compute()
+    assert unmodified(loaded * 0 + 5, names)
+    assert data_token(loaded * 0 + 5) != data_token(loaded)
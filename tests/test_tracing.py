@@ -0,0 +1,140 @@
+"""Tests for the performance tracing"""
+
+import json
+import pytest
+import numpy as np
+import xarray as xr
+from aqua.core.tracing import Tracer, trace_span, get_tracer, enable_tracing, disable_tracing
+from aqua.core.tracing import configure_tracing, data_info, NULL_SPAN
+
+
+@pytest.fixture
+def tracer():
+    """Enable in-memory tracing for a single test"""
+    tracer = get_tracer()
+    tracer.reset()
+    enable_tracing()
+    yield tracer
+    disable_tracing()
+    tracer.output = None
+    tracer.reset()
+
+
+@pytest.mark.aqua
+def test_disabled():
+    """When disabled the shared null span is returned and nothing is recorded"""
+    disable_tracing()
+    nspans = len(get_tracer().spans)
+    with trace_span('regrid', grid='r100') as span:
+        span.set(nbytes=10)
+    assert span is NULL_SPAN
+    assert len(get_tracer().spans) == nspans
+
+
+@pytest.mark.aqua
+def test_spans_and_summary(tracer):
+    """Spans are recorded with data info and aggregated by name"""
+    data = xr.DataArray(np.zeros((4, 10)), dims=('time', 'x')).chunk({'time': 1})
+    for _ in range(2):
+        with trace_span('fldstat', stat='mean') as span:
+            span.set(data)
+    with trace_span('write') as span:
+        span.set(nbytes=100)
+
+    assert [span.name for span in tracer.spans] == ['fldstat', 'fldstat', 'write']
+    assert tracer.spans[0].args['stat'] == 'mean'
+    assert tracer.spans[0].args['nbytes'] == 320
+    assert tracer.spans[0].args['phase'] == 'graph'
+    # tasks are counted only at DEBUG level
+    assert 'ntasks' not in tracer.spans[0].args
+
+    summary = tracer.summary()
+    assert summary['fldstat:graph']['count'] == 2
+    assert summary['fldstat:graph']['nbytes'] == 640
+    assert summary['write']['nbytes'] == 100
+    assert summary['write']['mean'] >= 0
+
+
+@pytest.mark.aqua
+def test_compute_phase_and_tasks(tracer):
+    """Computed data are in the compute phase, tasks are counted at DEBUG level"""
+    enable_tracing(loglevel='DEBUG')
+    data = xr.DataArray(np.zeros((4, 10)), dims=('time', 'x')).chunk({'time': 1})
+    with trace_span('fldstat') as span:
+        span.set(data)
+    with trace_span('compute') as span:
+        span.set(data.compute())
+
+    assert tracer.spans[0].args['ntasks'] == 4
+    assert tracer.spans[1].args['phase'] == 'compute'
+    assert set(tracer.summary()) == {'fldstat:graph', 'compute'}
+
+
+
+@pytest.mark.aqua
+def test_drop_compute_span(tracer):
+    """The DROP compute span is recorded in the compute phase"""
+    from aqua.core.drop import Drop
+    from aqua.core.logger import log_configure
+
+    drop = Drop.__new__(Drop)
+    drop.logger = log_configure('WARNING', 'Drop')
+    drop.nproc = 1
+    data = xr.DataArray(np.zeros((4, 10)), dims=('time', 'x'), name='2t').chunk({'time': 1})
+    drop._compute_chunk(data)
+
+    assert tracer.spans[-1].name == 'compute'
+    assert tracer.spans[-1].args['phase'] == 'compute'
+    assert 'compute' in tracer.summary()
+
+
+@pytest.mark.aqua
+def test_exception_recorded(tracer):
+    """A span is closed also when the block fails"""
+    with pytest.raises(ValueError):
+        with trace_span('fixer'):
+            raise ValueError('failure')
+    assert tracer.spans[-1].name == 'fixer'
+    assert tracer.spans[-1].dur is not None
+
+
+@pytest.mark.aqua
+def test_outputs(tmp_path):
+    """JSON lines are streamed and Chrome trace is exported"""
+    tracer = Tracer()
+    jsonl = tmp_path / 'trace.jsonl'
+    tracer.enable(str(jsonl))
+    assert tracer.fmt == 'jsonl'
+    from aqua.core.tracing import Span
+    span = Span('catalog', source='test')
+    span.dur = 1.
+    tracer.record(span)
+    lines = jsonl.read_text().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0])['args']['source'] == 'test'
+
+    chrome = tmp_path / 'trace.json'
+    tracer.export(str(chrome), fmt='chrome')
+    events = json.loads(chrome.read_text())['traceEvents']
+    assert events[0]['ph'] == 'X'
+    assert events[0]['name'] == 'catalog'
+
+    with pytest.raises(ValueError):
+        tracer.export(str(chrome), fmt='xml')
+
+
+@pytest.mark.aqua
+def test_configure_and_data_info():
+    """Configuration values and data info of plain objects"""
+    disable_tracing()
+    configure_tracing('false')
+    assert not get_tracer().enabled
+    configure_tracing(None)
+    assert not get_tracer().enabled
+    configure_tracing('true')
+    assert get_tracer().enabled
+    assert get_tracer().output is None
+    disable_tracing()
+
+    assert data_info(np.zeros(3)) == {'nbytes': 24, 'phase': 'compute'}
+    assert data_info('nothing') == {}
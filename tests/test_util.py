@@ -1,5 +1,6 @@
 """Test for some of the utils"""
 
+import os
 import pytest
 import xarray as xr
 import numpy as np
@@ -8,7 +9,9 @@ from aqua import Reader
 from aqua.core.util import extract_literal_and_numeric, file_is_complete, to_list, convert_data_units
 from aqua.core.util import format_realization, extract_attrs, time_to_string
 from aqua.core.util.string import strlist_to_phrase, lat_to_phrase
-from aqua.core.util.units import multiply_units
+import aqua.core.util.eccodes as eccodes_module
+from aqua.core.util.eccodes import EccodesTable, get_eccodes_attr, get_eccodes_table
+from aqua.core.util.units import multiply_units, convert_units, normalize_units, warm_units_cache, _conversion
 from conftest import LOGLEVEL
 
 @pytest.fixture
@@ -51,6 +54,74 @@ def test_convert_data_units():
     assert f"Converting units of tprate: from {initial_units} to mm/day" not in data_test.attrs['history']
 
 
+@pytest.mark.aqua
+def test_convert_units_cache():
+    """Conversions are computed once per units pair and returned as independent copies"""
+    warm_units_cache()
+    hits = _conversion.cache_info().hits
+    conversion = convert_units('K', 'degC')
+    assert _conversion.cache_info().hits == hits + 1
+    assert conversion == {'offset': -273.15}
+    conversion['offset'] = 0
+    assert convert_units('K', 'degC') == {'offset': -273.15}
+
+    # normalized units share the same entry
+    assert normalize_units('Celsius') == 'degC'
+    assert convert_units('Celsius', 'K') == convert_units('degC', 'K')
+    assert convert_units('J m**-2', 'W m-2', deltat=3600)['factor'] == pytest.approx(1 / 3600)
+
+
+@pytest.fixture
+def eccodes_configdir(tmp_path, monkeypatch):
+    """Point the eccodes table to a temporary configuration folder"""
+
+    class Locator:
+        configdir = str(tmp_path)
+
+    monkeypatch.setattr(eccodes_module, 'ConfigLocator', Locator)
+    monkeypatch.delenv('ECCODES_DEFINITION_PATH', raising=False)
+    monkeypatch.delenv('ECCODES_EXTRA_DEFINITION_PATH', raising=False)
+    caches = [get_eccodes_table, eccodes_module._get_attrs_from_shortname, eccodes_module._get_shortname_from_paramid]
+    for cache in caches:
+        cache.cache_clear()
+    yield tmp_path
+    for cache in caches:
+        cache.cache_clear()
+
+
+@pytest.mark.aqua
+def test_eccodes_table(eccodes_configdir, monkeypatch):
+    """Eccodes lookups are stored in a persistent table, merged with the entries of other processes"""
+    attrs = get_eccodes_attr('2t', loglevel=loglevel)
+    assert attrs['paramId'] == '167'
+    table = get_eccodes_table()
+    assert table.attrs['2t/GRIB2/0'] == attrs
+    assert os.path.dirname(table.filename) == str(eccodes_configdir / 'cache')
+    # new entries are written in batches
+    assert table.pending == 1
+    assert not os.path.exists(table.filename)
+    table.save_pending()
+    assert os.path.exists(table.filename)
+
+    filename = str(eccodes_configdir / 'eccodes.json')
+    table = EccodesTable(filename)
+    table.attrs['2t/GRIB2/0'] = attrs
+    table.save()
+    other = EccodesTable(filename)
+    other.shortnames['167'] = '2t'
+    table.save()
+    other.save()
+    reloaded = EccodesTable(filename)
+    assert reloaded.attrs['2t/GRIB2/0'] == attrs
+    assert reloaded.shortnames == {'167': '2t'}
+
+    # custom definitions have their own table
+    monkeypatch.setenv('ECCODES_DEFINITION_PATH', str(eccodes_configdir / 'definitions'))
+    get_eccodes_table.cache_clear()
+    assert get_eccodes_table().filename != table.filename
+    assert get_eccodes_table().attrs == {}
+
+
 # Define a fixture to create a sample netCDF file for testing
 @pytest.mark.aqua
 class TestFileIsComplete:
@@ -135,6 +206,32 @@ class TestFileIsComplete:
         result = file_is_complete(valid_with_nan_file)
         assert result is True
 
+    @pytest.mark.parametrize("mode", ["metadata", "sampled", "full"])
+    def test_file_is_complete_modes(self, sample_netcdf, mode):
+        assert file_is_complete(sample_netcdf, mode=mode) is True
+        assert file_is_complete(sample_netcdf, mode=mode, ntime=3) is True
+        assert file_is_complete(sample_netcdf, mode=mode, ntime=4) is False
+
+    def test_file_is_complete_sampled_missing_time(self, tmp_path):
+        filename = tmp_path / "sampled_missing_time.nc"
+        data = xr.DataArray(np.random.rand(3, 4, 5), dims=("time", "lat", "lon"))
+        data[1,:,:] = np.nan
+        data.to_netcdf(filename)
+        assert file_is_complete(filename, mode='metadata') is True
+        assert file_is_complete(filename, mode='sampled', nsamples=1) is False
+
+    def test_file_is_complete_full_skips_header(self, tmp_path):
+        filename = tmp_path / "numeric_time.nc"
+        data = xr.DataArray(np.random.rand(3, 4, 5), dims=("time", "lat", "lon"),
+                            coords={"time": [0, 1, 2]})
+        data.to_netcdf(filename)
+        assert file_is_complete(filename, mode='metadata') is False
+        assert file_is_complete(filename, mode='full') is True
+
+    def test_file_is_complete_invalid_mode(self, sample_netcdf):
+        with pytest.raises(ValueError):
+            file_is_complete(sample_netcdf, mode='quick')
+
 @pytest.mark.parametrize("arg, expected", [
     (None, []),                        # Test None
     ([1, 2, 3], [1, 2, 3]),              # Test list (unchanged)